@@ -0,0 +1,170 @@
+"""
+Utilidades de la API JSON (/api/v1)
+- Campos dispersos: ?fields=id,name,price
+- Validación condicional: ETag fuerte (hash del cuerpo) y Last-Modified,
+  con respuesta 304 para If-None-Match / If-Modified-Since
+- Compresión gzip o brotli (si está instalado) de las respuestas de texto
+- Errores siempre en JSON: {"error": "..."}
+"""
+
+import gzip
+import hashlib
+import json
+from datetime import datetime, timezone
+from functools import wraps
+from flask import current_app, request, jsonify
+from flask_login import current_user
+from werkzeug.exceptions import HTTPException
+
+try:
+    import brotli
+except ImportError:  # Opcional: sin brotli se usa gzip
+    brotli = None
+
+PREFIX = '/api/v1'
+COMPRESS_MIN_SIZE = 500
+COMPRESS_MIMETYPES = {
+    'application/json', 'text/html', 'text/css', 'text/plain', 'text/csv',
+    'application/javascript', 'text/javascript', 'image/svg+xml',
+}
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def init_app(app):
+    app.config.setdefault('COMPRESS_LEVEL', 6)
+    app.register_error_handler(ApiError, _api_error)
+    app.register_error_handler(HTTPException, _http_error)
+    app.after_request(compress)
+
+
+def _api_error(error):
+    return jsonify({'error': error.message}), error.status
+
+
+def _http_error(error):
+    """Errores HTTP en JSON dentro de la API; fuera de ella, la página de siempre"""
+    if not request.path.startswith(PREFIX):
+        return error
+    return jsonify({'error': error.description}), error.code
+
+
+def login_required(view):
+    """Como flask_login.login_required, pero responde 401 en JSON"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not current_user.is_authenticated:
+            raise ApiError('Debes iniciar sesión', 401)
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def requested_fields(allowed):
+    """Conjunto de campos pedidos en ?fields= (None = todos)"""
+    value = request.args.get('fields')
+    if not value:
+        return None
+    fields = {name.strip() for name in value.split(',') if name.strip()}
+    unknown = fields - set(allowed)
+    if unknown:
+        raise ApiError(f"Campos desconocidos: {', '.join(sorted(unknown))}")
+    return fields
+
+
+def pick(item, fields):
+    return item if fields is None else {key: value for key, value in item.items() if key in fields}
+
+
+def _default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f'No serializable: {type(value).__name__}')
+
+
+def matching_etag(etag):
+    """La variante de `etag` que el cliente manda en If-None-Match, o None
+
+    compress() añade -gzip o -br al ETag de la respuesta comprimida, así que
+    el cliente puede devolver cualquiera de las tres.
+    """
+    for variant in (etag, f'{etag}-gzip', f'{etag}-br'):
+        if request.if_none_match.contains(variant):
+            return variant
+    return None
+
+
+def conditional_json(payload, last_modified=None, max_age=60, private=False):
+    """Respuesta JSON con ETag fuerte y Last-Modified, o 304 si el cliente ya la tiene
+
+    El cuerpo se serializa de forma determinista, así el mismo contenido
+    produce siempre el mismo ETag.
+    """
+    body = json.dumps(payload, default=_default, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    body = body.encode('utf-8')
+    etag = hashlib.sha256(body).hexdigest()[:32]
+    if last_modified is not None:
+        last_modified = last_modified.replace(microsecond=0, tzinfo=timezone.utc)
+
+    # If-None-Match manda; If-Modified-Since solo se mira si no viene ETag
+    if request.if_none_match:
+        not_modified = matching_etag(etag) is not None
+    else:
+        not_modified = (
+            last_modified is not None and request.if_modified_since is not None
+            and last_modified <= request.if_modified_since
+        )
+
+    response = current_app.response_class(
+        b'' if not_modified else body, status=304 if not_modified else 200, mimetype='application/json'
+    )
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.cache_control.max_age = max_age
+    if private:
+        response.cache_control.private = True
+        response.vary.add('Cookie')
+    else:
+        response.cache_control.public = True
+    return response
+
+
+def _encoding():
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+
+def compress(response):
+    """after_request: comprimir respuestas de texto si el cliente lo acepta"""
+    if (response.status_code not in (200, 201) or response.direct_passthrough or response.is_streamed
+            or response.mimetype not in COMPRESS_MIMETYPES or 'Content-Encoding' in response.headers):
+        return response
+    response.vary.add('Accept-Encoding')
+
+    data = response.get_data()
+    encoding = _encoding()
+    if encoding is None or len(data) < COMPRESS_MIN_SIZE:
+        return response
+
+    level = current_app.config['COMPRESS_LEVEL']
+    if encoding == 'br':
+        data = brotli.compress(data, quality=min(level, 11))
+    else:
+        data = gzip.compress(data, compresslevel=level, mtime=0)
+    response.set_data(data)
+    response.headers['Content-Encoding'] = encoding
+
+    # Cada representación tiene su propio ETag fuerte
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(f'{etag}-{encoding}')
+    return response
@@ -1,38 +1,124 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify
+from flask import Flask, current_app, render_template, request, redirect, url_for, flash, session, jsonify, abort, send_from_directory
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import select, insert, update, and_, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload, selectinload
+from markupsafe import Markup
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
-from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
 import os
-from datetime import datetime
+import hmac
 import json
+import time
+import uuid
+from collections import namedtuple
+from datetime import datetime, timedelta
+import search
+import pagination
+import query_budget
+import migrations
+import uploads
+import images
+import pricelist
+import stats
+import facets
+import api
+import config
+import metrics
+import mail
+import exports
+import passwords
+import carts
+from cache import Cache
+from carts import CartStore
+from pagecache import PageCache
+from tasks import TaskQueue
+from jobs import JobQueue
 
-app = Flask(__name__)
-app.config['SECRET_KEY'] = 'tu_clave_secreta_aqui'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///tienda.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['UPLOAD_FOLDER'] = 'static/uploads'
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
-
-# Crear directorio de uploads si no existe
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-os.makedirs(os.path.join(app.config['UPLOAD_FOLDER'], 'products'), exist_ok=True)
-os.makedirs(os.path.join(app.config['UPLOAD_FOLDER'], 'prices'), exist_ok=True)
-
-db = SQLAlchemy(app)
+db = SQLAlchemy()
 login_manager = LoginManager()
-login_manager.init_app(app)
 login_manager.login_view = 'login'
 login_manager.login_message = 'Por favor inicia sesión para acceder a esta página.'
+cache = Cache()
+tasks = TaskQueue()
+page_cache = PageCache()
+jobs = JobQueue()
+cart_store = CartStore()
+
+class Routes:
+    """Vistas y globales de plantilla que create_app registra en cada aplicación
+
+    Como un blueprint, pero sin prefijo: los endpoints se siguen llamando
+    'index', 'cart'... y url_for no cambia.
+    """
+    
+    def __init__(self):
+        self.rules = []  # (regla, endpoint, vista, opciones)
+        self.template_globals = []
+    
+    def route(self, rule, **options):
+        def decorator(view):
+            endpoint = options.pop('endpoint', view.__name__)
+            self.rules.append((rule, endpoint, view, options))
+            return view
+        return decorator
+    
+    def template_global(self, name=None):
+        def decorator(func):
+            self.template_globals.append((func, name))
+            return func
+        return decorator
+    
+    def register(self, app):
+        for rule, endpoint, view, options in self.rules:
+            app.add_url_rule(rule, endpoint, view, **options)
+        for func, name in self.template_globals:
+            app.add_template_global(func, name)
+
+routes = Routes()
+
+def create_app(overrides=None):
+    """Crear la aplicación con la configuración del entorno (ver config.py)
+
+    Las vistas se definen más abajo en este módulo; create_app las registra
+    todas, así cada llamada (pruebas, otra configuración) da una aplicación
+    completa. `app` es la del entorno, creada al final del módulo.
+    """
+    app = Flask(__name__, instance_relative_config=True)
+    config.load(app, overrides)
+    # Las carpetas de uploads se crean al guardar el primer archivo (uploads.upload_dir)
+    
+    db.init_app(app)
+    with app.app_context():
+        config.configure_engine(db.engine, app.config)
+    login_manager.init_app(app)
+    app.add_template_global(pagination.page_url)
+    query_budget.init_app(app, db)
+    cache.init_app(app)
+    tasks.init_app(app)
+    page_cache.init_app(app, cache, tasks)
+    jobs.init_app(app, db)
+    cart_store.init_app(app)
+    api.init_app(app)
+    metrics.init_app(app, db)
+    routes.register(app)
+    return app
+
+ADMIN_PER_PAGE = 50
 
 # Modelos de base de datos
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
-    password_hash = db.Column(db.String(120), nullable=False)
+    password_hash = db.Column(db.String(255), nullable=False)  # scrypt ocupa más de 120
     is_admin = db.Column(db.Boolean, default=False)
+    auth_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # Sube al cambiar permisos
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('ix_user_created', 'created_at', 'id'),  # /admin/users
+    )
 
 class Product(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -42,8 +128,19 @@ class Product(db.Model):
     stock = db.Column(db.Integer, default=0)
     image = db.Column(db.String(200))
     category = db.Column(db.String(50))
+    sku = db.Column(db.String(64))  # Código para las listas de precios
     is_active = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # Last-Modified de la API
+    
+    __table_args__ = (
+        db.Index('ix_product_active_created', 'is_active', 'created_at', 'id'),  # /, /products
+        db.Index('ix_product_active_category_created', 'is_active', 'category', 'created_at', 'id'),  # /products?category=
+        db.Index('ix_product_category', 'category'),  # lista de categorías
+        db.Index('ix_product_sku', 'sku', unique=True),  # importación de precios
+        db.Index('ix_product_name', 'name'),  # importación de precios sin SKU
+        db.Index('ix_product_active_price', 'is_active', 'price', 'id'),  # /products?sort=price_*
+    )
 
 class CartItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -51,6 +148,14 @@ class CartItem(db.Model):
     product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
     quantity = db.Column(db.Integer, default=1)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'product_id', name='uq_cart_item_user_product'),  # líneas del pago
+        db.Index('ix_cart_item_created', 'created_at'),  # limpieza de carritos abandonados
+    )
+    
+    # Relación con Product
+    product = db.relationship('Product')
 
 class Order(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -58,7 +163,80 @@ class Order(db.Model):
     total = db.Column(db.Float, nullable=False)
     status = db.Column(db.String(20), default='pending')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    items = db.Column(db.Text)  # JSON string
+    items = db.Column(db.Text)  # JSON heredado; las líneas viven en OrderItem
+    
+    __table_args__ = (
+        db.Index('ix_order_user_created', 'user_id', 'created_at'),  # /orders
+        db.Index('ix_order_created', 'created_at', 'id'),  # /admin/orders, pedidos recientes
+        db.Index('ix_order_status', 'status'),  # pedidos pendientes
+    )
+    
+    # Relación con User
+    user = db.relationship('User', backref='orders')
+    order_items = db.relationship('OrderItem', backref='order', order_by='OrderItem.id')
+
+class OrderItem(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False, index=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), index=True)
+    product_name = db.Column(db.String(100), nullable=False)  # Nombre al momento de la compra
+    unit_price = db.Column(db.Float, nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+
+class CheckoutRequest(db.Model):
+    # Clave de idempotencia: un POST de pago repetido devuelve el mismo pedido
+    key = db.Column(db.String(64), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    order_id = db.Column(db.Integer, db.ForeignKey('order.id'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+# Estadísticas precalculadas del panel (ver stats.py)
+class StatCounter(db.Model):
+    name = db.Column(db.String(50), primary_key=True)  # 'orders', 'orders:pending', ...
+    value = db.Column(db.BigInteger, nullable=False, default=0)
+
+class DailySales(db.Model):
+    day = db.Column(db.Date, primary_key=True)
+    orders = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0)
+
+class ProductSales(db.Model):
+    product_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    product_name = db.Column(db.String(100), nullable=False)
+    units = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0)
+    
+    __table_args__ = (
+        db.Index('ix_product_sales_units', 'units'),  # más vendidos
+    )
+
+# Conteos de la navegación por facetas (ver facets.py)
+class ProductFacet(db.Model):
+    category = db.Column(db.String(50), primary_key=True)  # '' = sin categoría
+    price_band = db.Column(db.String(20), primary_key=True)
+    in_stock = db.Column(db.Boolean, primary_key=True)
+    products = db.Column(db.Integer, nullable=False, default=0)
+
+# Cola de trabajos en segundo plano (ver jobs.py)
+class Job(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    payload = db.Column(db.Text)  # Argumentos en JSON
+    dedupe_key = db.Column(db.String(100), unique=True)  # Solo mientras está pendiente
+    status = db.Column(db.String(20), nullable=False, default='queued')  # 'queued', 'running', 'done', 'failed'
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=3)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    locked_by = db.Column(db.String(100))
+    locked_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+    
+    __table_args__ = (
+        db.Index('ix_job_status_run', 'status', 'run_at', 'id'),  # reclamar los vencidos
+        db.Index('ix_job_status_finished', 'status', 'finished_at'),  # purga de terminados
+    )
 
 class FileUpload(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -67,29 +245,394 @@ class FileUpload(db.Model):
     file_type = db.Column(db.String(50), nullable=False)  # 'product_image', 'price_list'
     uploaded_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     uploaded_at = db.Column(db.DateTime, default=datetime.utcnow)
+    status = db.Column(db.String(20), nullable=False, default='ready', server_default='ready')  # 'uploading', 'processing', 'ready', 'failed'
+    content_hash = db.Column(db.String(64), index=True)  # sha256, para deduplicar
+    size = db.Column(db.BigInteger)
+    
+    __table_args__ = (
+        db.Index('ix_file_upload_uploaded', 'uploaded_at', 'id'),  # /admin/files
+    )
     
     # Relación con User
     uploader = db.relationship('User', backref='uploaded_files')
+    
+    @property
+    def path(self):
+        """Ruta dentro de UPLOAD_FOLDER"""
+        return f"{uploads.subdir(self.file_type)}/{self.filename}"
+
+# Orden estable de los listados para la paginación por cursor
+PRODUCT_ORDER = [(Product.created_at, False), (Product.id, False)]
+ORDER_ORDER = [(Order.created_at, True), (Order.id, True)]
+USER_ORDER = [(User.created_at, False), (User.id, False)]
+CATALOG_ORDERS = {
+    '': PRODUCT_ORDER,
+    'newest': [(Product.created_at, True), (Product.id, True)],
+    'price_asc': [(Product.price, False), (Product.id, False)],
+    'price_desc': [(Product.price, True), (Product.id, True)],
+}
+FILE_ORDER = [(FileUpload.uploaded_at, True), (FileUpload.id, True)]
+
+FEATURED_LIMIT = 8
+ORDER_STATUSES = ('pending', 'processing', 'shipped', 'completed', 'cancelled')
+BULK_MAX_IDS = 10000
+
+# Catálogo en caché: las vistas públicas leen de aquí y las rutas de
+# administración invalidan solo las claves del producto modificado.
+def product_snapshot(product):
+    """Copia del producto sin sesión, apta para guardar en caché"""
+    return {
+        'id': product.id,
+        'name': product.name,
+        'description': product.description,
+        'price': product.price,
+        'stock': product.stock,
+        'image': product.image,
+        'category': product.category,
+        'sku': product.sku,
+        'is_active': product.is_active,
+        'updated_at': product.updated_at,
+    }
+
+def get_product(product_id):
+    def load():
+        product = db.session.get(Product, product_id)
+        return product_snapshot(product) if product else None
+    return cache.get_or_set(f'product:{product_id}', load)
+
+def get_facets():
+    """Celdas de product_facet; una lectura pequeña, en caché hasta el próximo cambio"""
+    return cache.get_or_set('facets', lambda: facets.read(db.session, db.metadata))
+
+def get_categories():
+    return sorted({category for category, band, in_stock, count in get_facets() if category})
+
+def product_facet(product):
+    return facets.cell(product.category, product.price, product.stock, product.is_active)
+
+def get_featured_products():
+    return cache.get_or_set('featured', lambda: [
+        product_snapshot(product)
+        for product in Product.query.filter_by(is_active=True)
+        .order_by(Product.created_at, Product.id).limit(FEATURED_LIMIT)
+    ])
+
+def catalog_filters():
+    """Filtros del listado en la URL: ?category=A&category=B&price=25-50&in_stock=1&sort=newest"""
+    prices = set(request.args.getlist('price'))
+    sort = request.args.get('sort', '')
+    return {
+        'categories': sorted({category for category in request.args.getlist('category') if category}),
+        'prices': [key for key, low, high in facets.PRICE_RANGES if key in prices],
+        'in_stock': request.args.get('in_stock') == '1',
+        'sort': sort if sort in CATALOG_ORDERS else '',
+    }
+
+def get_listing(filters, total=None):
+    """Página del listado con el HTML de la grilla ya renderizado
+    
+    `total` viene de los conteos de facetas, así el listado no hace COUNT.
+    """
+    categories = filters['categories']
+    generation = max(cache.generation(f'listing:{category}') for category in categories or [''])
+    key = 'listing:{}:{}:{}:{}:{}:{}:{}'.format(
+        generation, '|'.join(categories), '|'.join(filters['prices']), int(filters['in_stock']),
+        filters['sort'], request.args.get('page', ''), request.args.get('cursor', '')
+    )
+    listing = cache.get(key)
+    if listing is None:
+        query = Product.query.filter_by(is_active=True)
+        if categories:
+            query = query.filter(Product.category.in_(categories))
+        if filters['prices']:
+            query = query.filter(db.or_(*facets.price_filter(Product.price, filters['prices'])))
+        if filters['in_stock']:
+            query = query.filter(Product.stock > 0)
+        
+        page = pagination.paginate(query, CATALOG_ORDERS[filters['sort']], per_page=12, total=total)
+        page.items = [product_snapshot(product) for product in page.items]
+        listing = {'page': page, 'grid': render_template('product_grid.html', products=page.items),
+                   'generation': generation}
+        cache.set(key, listing)
+    return listing
+
+def invalidate_product(product, old_category=None):
+    """Borrar de la caché lo que depende de `product` tras crearlo o editarlo"""
+    cache.delete(f'product:{product.id}')
+    
+    featured = cache.get('featured')
+    if featured is None or len(featured) < FEATURED_LIMIT or product.id in {p['id'] for p in featured}:
+        cache.delete('featured', 'fragment:featured')
+    
+    cache.delete('facets')
+    cache.bump('listing:', f'listing:{product.category}')
+    if old_category is not None and old_category != product.category:
+        cache.bump(f'listing:{old_category}')
+    page_cache.invalidate()
+
+def invalidate_catalog(product_ids=()):
+    """Invalidar de una vez los listados tras un cambio masivo de productos"""
+    cache.delete(*[f'product:{product_id}' for product_id in product_ids])
+    categories = get_categories()
+    cache.delete('featured', 'fragment:featured', 'facets')
+    cache.bump('listing:', *[f'listing:{category}' for category in categories])
+    page_cache.invalidate()
+
+# Imágenes responsive
+@routes.template_global()
+def responsive_image(image, alt, sizes='100vw', class_=None):
+    """<picture> con srcset de los derivados; la imagen original si aún no existen"""
+    manifest = cache.get_or_set(
+        f'image:{image}', lambda: images.load_manifest(current_app.config['UPLOAD_FOLDER'], image) or {}
+    )
+    return images.picture(
+        manifest,
+        lambda name: url_for('image_variant', filename=name),
+        url_for('static', filename='uploads/' + image),
+        alt, sizes, class_
+    )
+
+def schedule_image_variants(image):
+    """Encolar la generación de derivados (si Pillow está instalado) en la transacción en curso"""
+    if image and images.available():
+        jobs.enqueue(db.session, 'build_image_variants', {'image': image}, key=f'image:{image}')
+
+def refresh_images(image_names):
+    """Tras generar derivados en bloque (images.py backfill): olvidar los manifiestos
+    guardados y dar nueva versión a los productos que muestran esas imágenes"""
+    cache.delete(*[f'image:{image}' for image in image_names])
+    product_ids = []
+    now = datetime.utcnow()
+    for start in range(0, len(image_names), 500):
+        ids = db.session.scalars(select(Product.id).where(Product.image.in_(image_names[start:start + 500]))).all()
+        if ids:
+            db.session.execute(update(Product).where(Product.id.in_(ids)).values(updated_at=now))
+            product_ids += ids
+    db.session.commit()
+    if product_ids:
+        invalidate_catalog(product_ids)
+
+@jobs.job('build_image_variants')
+def build_image_variants(image):
+    """Trabajo en segundo plano: generar los derivados y refrescar lo que muestra la imagen"""
+    images.generate(current_app.config['UPLOAD_FOLDER'], image)
+    cache.delete(f'image:{image}')
+    products = Product.query.filter_by(image=image).all()
+    for product in products:
+        product.updated_at = datetime.utcnow()  # Nueva versión para la caché de fragmentos y la API
+    db.session.commit()
+    for product in products:
+        invalidate_product(product)
+
+# Pago
+class CheckoutError(Exception):
+    """No se pudo completar el pedido; el mensaje se muestra al usuario"""
+    category = 'error'
+
+class EmptyCartError(CheckoutError):
+    category = 'warning'
+
+def place_order(user_id, idempotency_key):
+    """Convertir el carrito en un pedido dentro de una única transacción
+    
+    Las líneas se sacan del almacén de carritos de una vez (un pago
+    simultáneo con otra clave encuentra el carrito vacío) y pasan a
+    cart_item dentro de la transacción; si el pedido falla vuelven al
+    carrito. El stock se descuenta con un UPDATE condicional (stock >=
+    cantidad) por línea, así dos pagos simultáneos nunca venden la misma
+    unidad. En MySQL
+    además se bloquean las filas de producto con SELECT ... FOR UPDATE.
+    Devuelve (pedido, creado); si la clave ya se usó, devuelve el pedido
+    existente con creado=False.
+    """
+    # Reservar la clave primero: en SQLite esta escritura toma el bloqueo
+    # de escritura antes de leer el carrito, y en MySQL un duplicado
+    # concurrente espera a que esta transacción termine.
+    claim = CheckoutRequest(key=idempotency_key, user_id=user_id)
+    db.session.add(claim)
+    try:
+        db.session.flush()
+    except IntegrityError:
+        db.session.rollback()
+        existing = db.session.get(CheckoutRequest, idempotency_key)
+        if existing is None or existing.user_id != user_id or existing.order_id is None:
+            raise CheckoutError('Solicitud de pago inválida')
+        return db.session.get(Order, existing.order_id), False
+    
+    cart = carts.user_cart(user_id)
+    lines = cart_store.take(cart)
+    try:
+        CartItem.query.filter_by(user_id=user_id).delete()  # Restos de un carrito anterior al almacén
+        if lines:
+            db.session.execute(insert(CartItem), [
+                {'user_id': user_id, 'product_id': product_id, 'quantity': quantity, 'created_at': datetime.utcnow()}
+                for _, product_id, quantity in lines
+            ])
+        cart_items = (
+            CartItem.query.options(joinedload(CartItem.product))
+            .filter_by(user_id=user_id)
+            .order_by(CartItem.product_id)
+            .all()
+        )
+        if not cart_items:
+            raise EmptyCartError('Tu carrito está vacío')
+        
+        if db.engine.dialect.name == 'mysql':
+            # Bloqueo en orden de id para evitar interbloqueos entre pagos
+            Product.query.filter(Product.id.in_([item.product_id for item in cart_items])) \
+                .order_by(Product.id).with_for_update().populate_existing().all()
+        
+        for item in cart_items:
+            result = db.session.execute(
+                update(Product)
+                .where(Product.id == item.product_id, Product.stock >= item.quantity)
+                .values(stock=Product.stock - item.quantity)
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount != 1:
+                raise CheckoutError(f'No hay stock suficiente de {item.product.name}')
+        
+        # Los productos que se agotan pasan a la celda sin stock de las facetas
+        # (el stock leído es el de antes del UPDATE, ya con la fila bloqueada)
+        sold_out = [item.product for item in cart_items if item.product.stock == item.quantity]
+        facets.move(db.session, db.metadata, *[
+            (product_facet(product), facets.cell(product.category, product.price, 0, product.is_active))
+            for product in sold_out
+        ])
+        
+        order = Order(
+            user_id=user_id,
+            total=sum(item.product.price * item.quantity for item in cart_items)
+        )
+        for item in cart_items:
+            order.order_items.append(OrderItem(
+                product_id=item.product_id,
+                product_name=item.product.name,
+                unit_price=item.product.price,
+                quantity=item.quantity
+            ))
+        db.session.add(order)
+        db.session.flush()
+        claim.order_id = order.id
+        stats.record_order(db.session, db.metadata, order, [
+            (item.product_id, item.product_name, item.quantity, item.unit_price)
+            for item in order.order_items
+        ])
+        jobs.enqueue(db.session, 'send_order_confirmation', {'order_id': order.id})
+        
+        # Limpiar carrito
+        CartItem.query.filter_by(user_id=user_id).delete()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        if lines:
+            cart_store.restore(cart, lines)  # Devolver las líneas al carrito, con sus ids
+        raise
+    
+    cache.delete(*[f'product:{item.product_id}' for item in cart_items])
+    if sold_out:
+        cache.delete('facets')
+        cache.bump('listing:', *{f'listing:{product.category}' for product in sold_out})
+        page_cache.invalidate()
+    return order, True
+
+# Carritos: viven en el almacén de carritos (carts.py), no en la base principal
+CartLine = namedtuple('CartLine', 'id product quantity')  # id: el de la línea en el almacén
+
+def current_cart(create=False):
+    """Clave del carrito del visitante: el del usuario o el de invitado de la sesión"""
+    if current_user.is_authenticated:
+        return carts.user_cart(current_user.id)
+    token = session.get('cart_id')
+    if token is None and create:
+        token = session['cart_id'] = uuid.uuid4().hex
+    return carts.guest_cart(token) if token else None
+
+def get_products(product_ids):
+    """Varios productos: los de la caché y los que falten con una sola consulta"""
+    products = {product_id: cache.get(f'product:{product_id}') for product_id in product_ids}
+    missing = [product_id for product_id, product in products.items() if product is None]
+    if missing:
+        for product in Product.query.filter(Product.id.in_(missing)):
+            products[product.id] = product_snapshot(product)
+            cache.set(f'product:{product.id}', products[product.id])
+    return products
+
+def cart_lines(cart):
+    """(líneas, importe total, unidades) del carrito, con los productos de la caché"""
+    lines = cart_store.items(cart)
+    products = get_products([product_id for _, product_id, _ in lines])
+    items = [CartLine(line_id, products[product_id], quantity)
+             for line_id, product_id, quantity in lines if products.get(product_id)]
+    total = sum(item.product['price'] * item.quantity for item in items)
+    return items, total, sum(item.quantity for item in items)
+
+# Sesiones: el usuario autenticado se resuelve desde la caché, sin SELECT
+PRINCIPAL_TTL = 300
+
+class UserPrincipal(UserMixin):
+    """Datos mínimos del usuario autenticado (id, nombre, permisos y su versión)"""
+    
+    def __init__(self, id, username, is_admin, version=0):
+        self.id = id
+        self.username = username
+        self.is_admin = is_admin
+        self.version = version
+
+def cache_principal(user):
+    """Guardar el usuario en caché; un dict para que el backend en disco no dependa de la clase"""
+    data = {'id': user.id, 'username': user.username, 'is_admin': bool(user.is_admin), 'version': user.auth_version}
+    cache.set(f'principal:{user.id}', data, timeout=PRINCIPAL_TTL)
+    return data
+
+def invalidate_principal(user_id):
+    """Olvidar el usuario en caché tras cambiar sus datos o permisos"""
+    cache.delete(f'principal:{user_id}')
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    data = cache.get(f'principal:{user_id}')
+    if data is not None and data['is_admin'] and not cache.shared:
+        # Con la caché de cada proceso, invalidate_principal no llega a los demás
+        # workers ni a los cambios de manage_users.py: los permisos de
+        # administrador se confirman con la versión (una columna por clave primaria)
+        version = db.session.execute(select(User.auth_version).where(User.id == int(user_id))).scalar()
+        if version != data.get('version'):
+            data = None
+    if data is None:
+        user = db.session.get(User, int(user_id))
+        if user is None:
+            return None
+        data = cache_principal(user)
+    return UserPrincipal(**data)
 
 # Rutas principales
-@app.route('/')
+@routes.route('/')
+@page_cache.cached
 def index():
-    products = Product.query.filter_by(is_active=True).limit(8).all()
-    return render_template('index.html', products=products)
+    products = get_featured_products()
+    grid = cache.get_or_set('fragment:featured', lambda: render_template('product_grid.html', products=products))
+    return render_template('index.html', products=products, grid=Markup(grid))
 
-@app.route('/login', methods=['GET', 'POST'])
+@routes.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
         username = request.form['username']
         password = request.form['password']
         user = User.query.filter_by(username=username).first()
         
-        if user and check_password_hash(user.password_hash, password):
+        if user and passwords.verify(user.password_hash, password):
+            method = current_app.config['PASSWORD_HASH_METHOD']
+            if passwords.needs_rehash(user.password_hash, method):
+                # Hash de un método o coste anterior: recalcularlo ahora que tenemos la contraseña
+                user.password_hash = passwords.hash_password(password, method)
+                db.session.commit()
+            guest_cart = session.pop('cart_id', None)
             login_user(user)
+            cache_principal(user)
+            if guest_cart:
+                # Lo que el invitado agregó se suma a su carrito
+                cart_store.merge(carts.guest_cart(guest_cart), carts.user_cart(user.id))
             next_page = request.args.get('next')
             # Si es admin, redirigir al panel de administración
             if user.is_admin and not next_page:
@@ -100,7 +643,7 @@ def login():
     
     return render_template('login.html')
 
-@app.route('/register', methods=['GET', 'POST'])
+@routes.route('/register', methods=['GET', 'POST'])
 def register():
     if request.method == 'POST':
         username = request.form['username']
@@ -118,9 +661,10 @@ def register():
         user = User(
             username=username,
             email=email,
-            password_hash=generate_password_hash(password)
+            password_hash=passwords.hash_password(password, current_app.config['PASSWORD_HASH_METHOD'])
         )
         db.session.add(user)
+        stats.incr(db.session, db.metadata, 'users')
         db.session.commit()
         
         flash('Registro exitoso. Por favor inicia sesión.', 'success')
@@ -128,137 +672,155 @@ def register():
     
     return render_template('register.html')
 
-@app.route('/logout')
+@routes.route('/logout')
 @login_required
 def logout():
     logout_user()
     return redirect(url_for('index'))
 
-@app.route('/products')
+@routes.route('/products')
+@page_cache.cached
 def products():
-    page = request.args.get('page', 1, type=int)
-    category = request.args.get('category', '')
-    
-    query = Product.query.filter_by(is_active=True)
-    if category:
-        query = query.filter_by(category=category)
-    
-    products = query.paginate(page=page, per_page=12, error_out=False)
-    categories = db.session.query(Product.category).distinct().all()
+    filters = catalog_filters()
+    counts = facets.counts(get_facets(), filters['categories'], filters['prices'], filters['in_stock'])
+    listing = get_listing(filters, counts['total'])
     
-    return render_template('products.html', products=products, categories=categories)
+    return render_template('products.html', products=listing['page'], grid=Markup(listing['grid']),
+                           facets=counts, filters=filters, sorts=facets.SORTS)
 
-@app.route('/product/<int:product_id>')
+@routes.route('/product/<int:product_id>')
+@page_cache.cached
 def product_detail(product_id):
-    product = Product.query.get_or_404(product_id)
+    product = get_product(product_id)
+    if product is None:
+        abort(404)
     return render_template('product_detail.html', product=product)
 
-@app.route('/add_to_cart', methods=['POST'])
-@login_required
+@routes.route('/add_to_cart', methods=['POST'])
 def add_to_cart():
-    product_id = request.form['product_id']
-    quantity = int(request.form['quantity'])
-    
-    # Verificar si el producto ya está en el carrito
-    cart_item = CartItem.query.filter_by(user_id=current_user.id, product_id=product_id).first()
-    
-    if cart_item:
-        cart_item.quantity += quantity
-    else:
-        cart_item = CartItem(user_id=current_user.id, product_id=product_id, quantity=quantity)
-        db.session.add(cart_item)
+    product_id = request.form.get('product_id', type=int)
+    quantity = request.form.get('quantity', 1, type=int)
+    product = get_product(product_id) if product_id is not None else None
+    if product is None or not product['is_active'] or quantity < 1:
+        abort(400)
     
-    db.session.commit()
+    cart_store.add(current_cart(create=True), {product_id: quantity})
     flash('Producto agregado al carrito', 'success')
     return redirect(url_for('cart'))
 
-@app.route('/cart')
-@login_required
+@routes.route('/cart')
 def cart():
-    cart_items = CartItem.query.filter_by(user_id=current_user.id).all()
-    total = sum(item.product.price * item.quantity for item in cart_items)
-    return render_template('cart.html', cart_items=cart_items, total=total)
+    cart_items, total, units = cart_lines(current_cart())
+    return render_template('cart.html', cart_items=cart_items, total=total, checkout_key=uuid.uuid4().hex)
 
-@app.route('/remove_from_cart/<int:item_id>')
-@login_required
+@routes.route('/remove_from_cart/<int:item_id>')
 def remove_from_cart(item_id):
-    cart_item = CartItem.query.get_or_404(item_id)
-    if cart_item.user_id == current_user.id:
-        db.session.delete(cart_item)
-        db.session.commit()
+    if cart_store.remove(current_cart(), [item_id]):
         flash('Producto eliminado del carrito', 'success')
     return redirect(url_for('cart'))
 
-@app.route('/checkout')
+@routes.route('/checkout', methods=['GET', 'POST'])
 @login_required
+@query_budget.query_budget(30)  # 10 fijas + un UPDATE de stock por línea del carrito
 def checkout():
-    cart_items = CartItem.query.filter_by(user_id=current_user.id).all()
-    if not cart_items:
-        flash('Tu carrito está vacío', 'warning')
+    if request.method == 'GET':
         return redirect(url_for('cart'))
     
-    total = sum(item.product.price * item.quantity for item in cart_items)
-    
-    # Crear pedido
-    order_items = []
-    for item in cart_items:
-        order_items.append({
-            'product_id': item.product_id,
-            'product_name': item.product.name,
-            'quantity': item.quantity,
-            'price': item.product.price
-        })
-    
-    order = Order(
-        user_id=current_user.id,
-        total=total,
-        items=json.dumps(order_items)
-    )
-    db.session.add(order)
+    key = request.headers.get('Idempotency-Key') or request.form.get('idempotency_key') or uuid.uuid4().hex
+    if len(key) > 64:
+        abort(400)
     
-    # Limpiar carrito
-    CartItem.query.filter_by(user_id=current_user.id).delete()
+    try:
+        order, created = place_order(current_user.id, key)
+    except CheckoutError as e:
+        flash(str(e), e.category)
+        return redirect(url_for('cart'))
     
-    db.session.commit()
-    flash('Pedido realizado exitosamente', 'success')
+    if created:
+        flash('Pedido realizado exitosamente', 'success')
     return redirect(url_for('orders'))
 
-@app.route('/orders')
+@routes.route('/orders')
 @login_required
 def orders():
-    orders = Order.query.filter_by(user_id=current_user.id).order_by(Order.created_at.desc()).all()
+    orders = Order.query.options(selectinload(Order.order_items)).filter_by(user_id=current_user.id).order_by(Order.created_at.desc()).all()
     return render_template('orders.html', orders=orders)
 
 # Rutas de administración - URL secreta para mayor seguridad
-@app.route('/admin-secret-panel')
-@app.route('/admin')  # Mantener compatibilidad
+@routes.route('/admin-secret-panel')
+@routes.route('/admin')  # Mantener compatibilidad
 @login_required
 def admin_dashboard():
     if not current_user.is_admin:
         flash('No tienes permisos para acceder a esta página', 'error')
         return redirect(url_for('index'))
     
-    stats = {
-        'total_products': Product.query.count(),
-        'total_orders': Order.query.count(),
-        'total_users': User.query.count(),
-        'pending_orders': Order.query.filter_by(status='pending').count()
-    }
+    # Contadores precalculados: lecturas por clave, sin recorrer pedidos
+    dashboard = stats.read(db.session, db.metadata)
+    if time.time() - dashboard['refreshed_at'] > current_app.config['STATS_REFRESH_INTERVAL'] and not cache.get('stats:refreshing'):
+        cache.set('stats:refreshing', True, timeout=300)
+        jobs.enqueue(db.session, 'refresh_stats', key='every:refresh_stats')  # Adelanta el periódico
+        db.session.commit()
+    
+    recent_orders = Order.query.options(joinedload(Order.user)).order_by(Order.created_at.desc()).limit(5).all()
+    max_revenue = max((day.revenue for day in dashboard['revenue_by_day']), default=0)
+    
+    return render_template('admin/dashboard.html', stats=dashboard, recent_orders=recent_orders,
+                           top_products=dashboard['top_products'], max_revenue=max_revenue)
+
+# Trabajos en segundo plano (ver jobs.py)
+@jobs.job('refresh_stats', every='STATS_REFRESH_INTERVAL')
+def refresh_stats():
+    """Trabajo periódico: recalcular las estadísticas y corregir desvíos"""
+    stats.refresh(db.engine, db.metadata)
+    cache.delete('stats:refreshing')
+
+@jobs.job('cleanup_carts', every='CART_CLEANUP_INTERVAL')
+def cleanup_carts():
+    """Trabajo periódico: borrar de una vez los carritos abandonados"""
+    expired = cart_store.expire(current_app.config['CART_MAX_AGE_DAYS'] * 86400)
     
-    recent_orders = Order.query.order_by(Order.created_at.desc()).limit(5).all()
-    return render_template('admin/dashboard.html', stats=stats, recent_orders=recent_orders)
+    # cart_item solo tiene filas durante un pago; las que queden son carritos
+    # de antes del almacén: los recientes se mueven a él (con su id, que es el
+    # id de línea de la API) y los viejos se borran
+    cutoff = datetime.utcnow() - timedelta(days=current_app.config['CART_MAX_AGE_DAYS'])
+    CartItem.query.filter(CartItem.created_at < cutoff).delete(synchronize_session=False)
+    legacy = {}
+    for item_id, user_id, product_id, quantity in db.session.execute(
+        select(CartItem.id, CartItem.user_id, CartItem.product_id, CartItem.quantity)
+    ):
+        legacy.setdefault(user_id, []).append((item_id, product_id, quantity))
+    for user_id, lines in legacy.items():
+        cart_store.restore(carts.user_cart(user_id), lines)
+    CartItem.query.filter(CartItem.user_id.in_(list(legacy))).delete(synchronize_session=False)
+    db.session.commit()
+    current_app.logger.info('Carritos abandonados: %s borrados; %s movidos al almacén', expired, len(legacy))
+
+@jobs.job('send_order_confirmation', max_attempts=5)
+def send_order_confirmation(order_id):
+    """Correo de confirmación de un pedido; se reintenta si falla el SMTP"""
+    order = Order.query.options(joinedload(Order.user), selectinload(Order.order_items)).filter_by(id=order_id).first()
+    if order is None:
+        return
+    lines = [
+        f'- {item.quantity} x {item.product_name}: ${item.unit_price * item.quantity:.2f}'
+        for item in order.order_items
+    ]
+    mail.send(current_app._get_current_object(), order.user.email, f'Pedido #{order.id} confirmado', '\n'.join([
+        f'Hola {order.user.username},', '', 'Recibimos tu pedido:', *lines, '', f'Total: ${order.total:.2f}',
+    ]))
 
-@app.route('/admin/products')
+@routes.route('/admin/products')
 @login_required
 def admin_products():
     if not current_user.is_admin:
         flash('No tienes permisos para acceder a esta página', 'error')
         return redirect(url_for('index'))
     
-    products = Product.query.all()
+    products = pagination.paginate(Product.query, PRODUCT_ORDER, per_page=ADMIN_PER_PAGE, count_key=('admin_products',))
     return render_template('admin/products.html', products=products)
 
-@app.route('/admin/products/add', methods=['GET', 'POST'])
+@routes.route('/admin/products/add', methods=['GET', 'POST'])
 @login_required
 def admin_add_product():
     if not current_user.is_admin:
@@ -271,16 +833,18 @@ def admin_add_product():
         price = float(request.form['price'])
         stock = int(request.form['stock'])
         category = request.form['category']
+        sku = request.form.get('sku', '').strip() or None
+        
+        if sku and Product.query.filter_by(sku=sku).first():
+            flash('Ya existe un producto con ese SKU', 'error')
+            return render_template('admin/add_product.html')
         
         # Manejar imagen
         image = None
         if 'image' in request.files:
             file = request.files['image']
             if file and file.filename:
-                filename = secure_filename(file.filename)
-                filename = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{filename}"
-                file.save(os.path.join(app.config['UPLOAD_FOLDER'], 'products', filename))
-                image = f"products/{filename}"
+                image = save_product_image(file)
         
         product = Product(
             name=name,
@@ -288,18 +852,23 @@ def admin_add_product():
             price=price,
             stock=stock,
             category=category,
+            sku=sku,
             image=image
         )
         
         db.session.add(product)
+        stats.incr(db.session, db.metadata, 'products')
+        facets.move(db.session, db.metadata, (None, facets.cell(category, price, stock)))
+        schedule_image_variants(image)
         db.session.commit()
+        invalidate_product(product)
         
         flash('Producto agregado exitosamente', 'success')
         return redirect(url_for('admin_products'))
     
     return render_template('admin/add_product.html')
 
-@app.route('/admin/products/edit/<int:product_id>', methods=['GET', 'POST'])
+@routes.route('/admin/products/edit/<int:product_id>', methods=['GET', 'POST'])
 @login_required
 def admin_edit_product(product_id):
     if not current_user.is_admin:
@@ -309,60 +878,189 @@ def admin_edit_product(product_id):
     product = Product.query.get_or_404(product_id)
     
     if request.method == 'POST':
+        old_category = product.category
+        old_facet = product_facet(product)
         product.name = request.form['name']
         product.description = request.form['description']
         product.price = float(request.form['price'])
         product.stock = int(request.form['stock'])
         product.category = request.form['category']
+        product.sku = request.form.get('sku', '').strip() or None
+        
+        if product.sku and Product.query.filter(Product.sku == product.sku, Product.id != product.id).first():
+            db.session.rollback()
+            flash('Ya existe un producto con ese SKU', 'error')
+            return render_template('admin/edit_product.html', product=product)
         
         # Manejar nueva imagen
+        new_image = None
         if 'image' in request.files:
             file = request.files['image']
             if file and file.filename:
-                filename = secure_filename(file.filename)
-                filename = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{filename}"
-                file.save(os.path.join(app.config['UPLOAD_FOLDER'], 'products', filename))
-                product.image = f"products/{filename}"
+                new_image = product.image = save_product_image(file)
         
+        facets.move(db.session, db.metadata, (old_facet, product_facet(product)))
+        schedule_image_variants(new_image)
         db.session.commit()
+        invalidate_product(product, old_category)
         flash('Producto actualizado exitosamente', 'success')
         return redirect(url_for('admin_products'))
     
     return render_template('admin/edit_product.html', product=product)
 
-@app.route('/admin/orders')
+@routes.route('/admin/orders')
 @login_required
 def admin_orders():
     if not current_user.is_admin:
         flash('No tienes permisos para acceder a esta página', 'error')
         return redirect(url_for('index'))
     
-    orders = Order.query.order_by(Order.created_at.desc()).all()
+    orders = pagination.paginate(Order.query.options(selectinload(Order.user), selectinload(Order.order_items)), ORDER_ORDER, per_page=ADMIN_PER_PAGE, count_key=('admin_orders',))
     return render_template('admin/orders.html', orders=orders)
 
-@app.route('/admin/orders/<int:order_id>/status', methods=['POST'])
+@routes.route('/admin/orders/<int:order_id>/status', methods=['POST'])
 @login_required
 def admin_update_order_status(order_id):
     if not current_user.is_admin:
         return jsonify({'error': 'No autorizado'}), 403
     
+    data = request.get_json(silent=True) or {}
+    new_status = data.get('status')
+    if new_status not in ORDER_STATUSES:
+        raise api.ApiError(f"Estado inválido; usa {', '.join(ORDER_STATUSES)}")
+    
     order = Order.query.get_or_404(order_id)
-    order.status = request.json['status']
+    old_status = order.status
+    
+    # UPDATE condicional: dos cambios simultáneos no descuentan dos veces el contador
+    changed = db.session.execute(
+        update(Order).where(Order.id == order.id, Order.status == old_status).values(status=new_status)
+    ).rowcount
+    if changed:
+        stats.record_status_change(db.session, db.metadata, old_status, new_status)
     db.session.commit()
     
     return jsonify({'success': True})
 
-@app.route('/admin/users')
+# Operaciones masivas: {"ids": [1, 2, 3]} o {"filter": {...}}, y un solo UPDATE por lote
+def _values(value):
+    return value if isinstance(value, list) else [value]
+
+ORDER_BULK_FILTERS = {
+    'status': lambda value: Order.status.in_(_values(value)),
+    'since': lambda value: Order.created_at >= exports.parse_date(value),
+    'until': lambda value: Order.created_at < exports.parse_date(value),
+    'user_id': lambda value: Order.user_id == int(value),
+}
+PRODUCT_BULK_FILTERS = {
+    'category': lambda value: Product.category.in_(_values(value)),
+    'is_active': lambda value: Product.is_active.is_(bool(value)),
+    'in_stock': lambda value: Product.stock > 0 if value else Product.stock <= 0,
+    'price_min': lambda value: Product.price >= float(value),
+    'price_max': lambda value: Product.price < float(value),
+}
+
+def bulk_selection(data, model, filters):
+    """Condición WHERE de una operación masiva y los ids pedidos (None si es por filtro)"""
+    ids, criteria = data.get('ids'), data.get('filter')
+    if ids is not None:
+        if not isinstance(ids, list) or not ids or not all(isinstance(id_, int) for id_ in ids):
+            raise api.ApiError('"ids" debe ser una lista de enteros')
+        if len(ids) > BULK_MAX_IDS:
+            raise api.ApiError(f'Máximo {BULK_MAX_IDS} ids por lote; usa un filtro')
+        return model.id.in_(ids), ids
+    if not isinstance(criteria, dict) or not criteria:
+        raise api.ApiError('Indica "ids" o un "filter" no vacío')
+    unknown = set(criteria) - set(filters)
+    if unknown:
+        raise api.ApiError(f"Filtros desconocidos: {', '.join(sorted(unknown))}")
+    try:
+        conditions = [filters[name](value) for name, value in criteria.items() if value not in (None, '')]
+    except (TypeError, ValueError) as error:
+        raise api.ApiError(f'Filtro inválido: {error}')
+    if not conditions:
+        raise api.ApiError('Indica "ids" o un "filter" no vacío')
+    return and_(*conditions), None
+
+@routes.route('/admin/orders/bulk-status', methods=['POST'])
+@login_required
+@query_budget.query_budget(20)  # una consulta de estados + un UPDATE por estado de origen
+def admin_bulk_order_status():
+    if not current_user.is_admin:
+        return jsonify({'error': 'No autorizado'}), 403
+    
+    data = request.get_json(silent=True) or {}
+    new_status = data.get('status')
+    if new_status not in ORDER_STATUSES:
+        raise api.ApiError(f"Estado inválido; usa {', '.join(ORDER_STATUSES)}")
+    condition, ids = bulk_selection(data, Order, ORDER_BULK_FILTERS)
+    
+    # Un UPDATE condicional por estado de origen (son pocos): los conteos son
+    # exactos para las estadísticas aunque otro admin cambie pedidos a la vez
+    old_statuses = db.session.execute(
+        select(Order.status).where(condition, Order.status != new_status).group_by(Order.status)
+    ).scalars().all()
+    changed = {}
+    for old_status in old_statuses:
+        count = db.session.execute(
+            update(Order).where(condition, Order.status == old_status).values(status=new_status)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if count:
+            changed[old_status] = count
+    stats.record_status_changes(db.session, db.metadata, changed, new_status)
+    db.session.commit()
+    
+    return jsonify({'updated': sum(changed.values()), 'from': changed})
+
+@routes.route('/admin/products/bulk', methods=['POST'])
+@login_required
+@query_budget.query_budget(20)  # UPDATE, recálculo de facetas e invalidación
+def admin_bulk_products():
+    """{"action": "activate" | "deactivate" | "price", "percent": -10, "ids" | "filter"}"""
+    if not current_user.is_admin:
+        return jsonify({'error': 'No autorizado'}), 403
+    
+    data = request.get_json(silent=True) or {}
+    action = data.get('action')
+    condition, ids = bulk_selection(data, Product, PRODUCT_BULK_FILTERS)
+    if action in ('activate', 'deactivate'):
+        active = action == 'activate'
+        condition = and_(condition, Product.is_active.is_not(active))  # Solo los que cambian
+        values = {'is_active': active}
+    elif action == 'price':
+        percent = data.get('percent')
+        if isinstance(percent, bool) or not isinstance(percent, (int, float)) or not -100 < percent <= 1000 or not percent:
+            raise api.ApiError('"percent" debe ser un número entre -100 y 1000, distinto de 0')
+        values = {'price': func.round(Product.price * (1 + percent / 100), 2)}
+    else:
+        raise api.ApiError('"action" debe ser activate, deactivate o price')
+    
+    if ids is None:
+        ids = db.session.execute(select(Product.id).where(condition)).scalars().all()
+    updated = db.session.execute(
+        update(Product).where(condition).values(**values, updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    
+    if updated:
+        # Una sola vez por lote: facetas desde cero y caché del catálogo
+        facets.refresh(db.engine, db.metadata)
+        invalidate_catalog(ids)
+    return jsonify({'updated': updated})
+
+@routes.route('/admin/users')
 @login_required
 def admin_users():
     if not current_user.is_admin:
         flash('No tienes permisos para acceder a esta página', 'error')
         return redirect(url_for('index'))
     
-    users = User.query.all()
+    users = pagination.paginate(User.query, USER_ORDER, per_page=ADMIN_PER_PAGE, count_key=('admin_users',))
     return render_template('admin/users.html', users=users)
 
-@app.route('/admin/users/toggle-admin/<int:user_id>')
+@routes.route('/admin/users/toggle-admin/<int:user_id>')
 @login_required
 def admin_toggle_admin(user_id):
     if not current_user.is_admin:
@@ -375,23 +1073,138 @@ def admin_toggle_admin(user_id):
         return redirect(url_for('admin_users'))
     
     user.is_admin = not user.is_admin
+    user.auth_version += 1
     db.session.commit()
+    invalidate_principal(user.id)
     
     status = 'administrador' if user.is_admin else 'usuario normal'
     flash(f'{user.username} ahora es {status}', 'success')
     return redirect(url_for('admin_users'))
 
-@app.route('/admin/files')
+def save_product_image(file):
+    """Guardar la imagen por bloques con nombre por contenido; devuelve la ruta relativa"""
+    directory = uploads.upload_dir(current_app.config['UPLOAD_FOLDER'], 'product_image')
+    filename, _ = uploads.store_file(file.stream, directory, secure_filename(file.filename))
+    return f"products/{filename}"
+
+def enqueue_upload(upload):
+    """Encolar process_upload en la transacción en curso; una sola vez por subida"""
+    jobs.enqueue(db.session, 'process_upload', {'upload_id': upload.id}, key=f'upload:{upload.id}')
+
+@jobs.job('process_upload')
+def process_upload(upload_id):
+    """Trabajo en segundo plano: calcular el hash, deduplicar y mover el archivo a su carpeta"""
+    upload = db.session.get(FileUpload, upload_id)
+    if upload is None or upload.status != 'processing':
+        return
+    
+    path = uploads.partial_path(current_app.config['UPLOAD_FOLDER'], upload.id)
+    target = os.path.join(uploads.upload_dir(current_app.config['UPLOAD_FOLDER'], upload.file_type), upload.filename)
+    if not os.path.exists(path) and os.path.exists(target):
+        path = target  # Un intento anterior lo movió y se cortó antes de confirmar
+    try:
+        upload.size = os.path.getsize(path)
+        upload.content_hash = uploads.file_sha256(path)
+        
+        # Si ya existe el mismo contenido, apuntar a ese archivo en vez de guardar otra copia
+        duplicate = FileUpload.query.filter(
+            FileUpload.content_hash == upload.content_hash,
+            FileUpload.file_type == upload.file_type,
+            FileUpload.status == 'ready',
+            FileUpload.id != upload.id
+        ).first()
+        if duplicate:
+            os.remove(path)
+            upload.filename = duplicate.filename
+        elif path != target:
+            os.replace(path, target)
+        upload.status = 'ready'
+    except OSError:
+        current_app.logger.exception('No se pudo procesar la subida %s', upload.id)
+        upload.status = 'failed'
+    
+    if upload.status == 'ready' and upload.file_type == 'product_image':
+        schedule_image_variants(upload.path)
+    db.session.commit()
+
+@jobs.job('requeue_uploads', every=3600)
+def requeue_uploads():
+    """Trabajo periódico: volver a encolar las subidas que siguen en 'processing'
+
+    Quedan así las de antes de la cola de trabajos o si process_upload agotó
+    sus intentos; las que llevan más de un día se dan por fallidas.
+    """
+    now = datetime.utcnow()
+    stale = FileUpload.query.filter(
+        FileUpload.status == 'processing',
+        FileUpload.uploaded_at < now - timedelta(seconds=current_app.config['JOBS_TIMEOUT'])
+    ).all()
+    for upload in stale:
+        if upload.uploaded_at < now - timedelta(days=1):
+            upload.status = 'failed'
+        else:
+            enqueue_upload(upload)
+    db.session.commit()
+    if stale:
+        current_app.logger.info('Subidas sin procesar: %s revisadas', len(stale))
+
+@routes.route('/media/<path:filename>')
+def image_variant(filename):
+    """Derivados de imágenes: el nombre depende del contenido, así que la caché es inmutable"""
+    response = send_from_directory(
+        images.derived_dir(current_app.config['UPLOAD_FOLDER']), filename, max_age=images.MAX_AGE
+    )
+    response.cache_control.immutable = True
+    response.cache_control.public = True
+    return response
+
+def price_import_report_path(upload_id, ext):
+    directory = os.path.join(current_app.instance_path, 'price_imports')
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f'{upload_id}.{ext}')
+
+@jobs.job('run_price_import')
+def run_price_import(upload_id, dry_run):
+    """Trabajo en segundo plano: aplicar (o simular) una lista de precios subida"""
+    upload = db.session.get(FileUpload, upload_id)
+    if upload is None:
+        # Borrado antes de que corriera el trabajo: no hay nada que importar
+        current_app.logger.warning('Importación de precios: el archivo %s ya no existe', upload_id)
+        return None
+    path = os.path.join(current_app.config['UPLOAD_FOLDER'], upload.path)
+    
+    with open(price_import_report_path(upload.id, 'csv'), 'w', newline='', encoding='utf-8') as diff:
+        try:
+            report = pricelist.import_price_list(
+                db.engine, Product.__table__, path, dry_run=dry_run, diff=diff,
+                on_batch=lambda ids: cache.delete(*[f'product:{product_id}' for product_id in ids])
+            )
+            summary = report.as_dict()
+        except (pricelist.PriceListError, OSError) as e:
+            # Con el informe parcial: los lotes anteriores al error ya se aplicaron
+            report = getattr(e, 'report', None)
+            summary = {**(report.as_dict() if report else {'dry_run': dry_run}), 'error': str(e)}
+    
+    if not dry_run and summary.get('updated'):
+        facets.refresh(db.engine, db.metadata)
+        invalidate_catalog()
+    
+    summary['finished_at'] = datetime.utcnow().isoformat()
+    with open(price_import_report_path(upload.id, 'json'), 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False)
+    return summary
+
+@routes.route('/admin/files')
 @login_required
 def admin_files():
     if not current_user.is_admin:
         flash('No tienes permisos para acceder a esta página', 'error')
         return redirect(url_for('index'))
     
-    files = FileUpload.query.order_by(FileUpload.uploaded_at.desc()).all()
+    files = pagination.paginate(FileUpload.query.options(selectinload(FileUpload.uploader)), FILE_ORDER, per_page=ADMIN_PER_PAGE, count_key=('admin_files',))
     return render_template('admin/files.html', files=files)
 
-@app.route('/admin/files/upload', methods=['POST'])
+@routes.route('/admin/files/upload', methods=['POST'])
 @login_required
 def admin_upload_file():
     if not current_user.is_admin:
@@ -407,63 +1220,400 @@ def admin_upload_file():
         filename = secure_filename(file.filename)
         filename = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{filename}"
         
-        # Determinar directorio según tipo
-        if file_type == 'price_list':
-            upload_dir = os.path.join(app.config['UPLOAD_FOLDER'], 'prices')
-        elif file_type == 'product_image':
-            upload_dir = os.path.join(app.config['UPLOAD_FOLDER'], 'products')
-        else:
-            upload_dir = os.path.join(app.config['UPLOAD_FOLDER'], 'other')
-        
-        os.makedirs(upload_dir, exist_ok=True)
-        file.save(os.path.join(upload_dir, filename))
-        
         # Guardar registro en base de datos
         file_upload = FileUpload(
             filename=filename,
             original_filename=file.filename,
             file_type=file_type,
-            uploaded_by=current_user.id
+            uploaded_by=current_user.id,
+            status='processing'
         )
         db.session.add(file_upload)
+        db.session.flush()
+        
+        # Copiar por bloques al temporal; el hash y la deduplicación van en segundo plano
+        with open(uploads.partial_path(current_app.config['UPLOAD_FOLDER'], file_upload.id), 'wb') as f:
+            uploads.copy_stream(file.stream, f)
+        enqueue_upload(file_upload)
         db.session.commit()
         
-        return jsonify({'success': True, 'filename': filename})
+        return jsonify({'success': True, 'filename': filename, 'id': file_upload.id, 'status': file_upload.status})
     
     return jsonify({'error': 'Archivo inválido'}), 400
 
-# Ruta para actualizar cantidad en el carrito
-@app.route('/update_cart/<int:item_id>/<int:quantity>')
+@routes.route('/admin/uploads', methods=['POST'])
+@login_required
+def admin_upload_start():
+    """Iniciar una subida por partes: {filename, file_type, size} -> {id, offset, chunk_size}"""
+    if not current_user.is_admin:
+        return jsonify({'error': 'No autorizado'}), 403
+    
+    data = request.get_json(silent=True) or {}
+    original = str(data.get('filename', ''))
+    filename = secure_filename(original)
+    try:
+        size = int(data.get('size', 0))
+    except (TypeError, ValueError):
+        size = 0
+    
+    if not filename or size <= 0:
+        return jsonify({'error': 'Archivo inválido'}), 400
+    if size > current_app.config['UPLOAD_MAX_SIZE']:
+        return jsonify({'error': 'El archivo supera el tamaño permitido'}), 413
+    
+    upload = FileUpload(
+        filename=f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{filename}",
+        original_filename=original,
+        file_type=data.get('file_type') or 'other',
+        uploaded_by=current_user.id,
+        size=size,
+        status='uploading'
+    )
+    db.session.add(upload)
+    db.session.commit()
+    
+    return jsonify({'id': upload.id, 'offset': 0, 'chunk_size': current_app.config['UPLOAD_CHUNK_SIZE']}), 201
+
+@routes.route('/admin/uploads/<int:upload_id>', methods=['GET', 'PUT'])
+@login_required
+def admin_upload_chunk(upload_id):
+    """GET: estado y offset para reanudar. PUT ?offset=N: cuerpo crudo con la siguiente parte"""
+    if not current_user.is_admin:
+        return jsonify({'error': 'No autorizado'}), 403
+    
+    upload = db.get_or_404(FileUpload, upload_id)
+    path = uploads.partial_path(current_app.config['UPLOAD_FOLDER'], upload.id)
+    
+    if request.method == 'GET':
+        offset = upload.size if upload.status != 'uploading' else uploads.received_bytes(path)
+        return jsonify({'id': upload.id, 'status': upload.status, 'offset': offset, 'size': upload.size})
+    
+    if upload.status != 'uploading':
+        return jsonify({'error': 'La subida ya se completó', 'status': upload.status}), 409
+    
+    offset = request.args.get('offset', type=int)
+    try:
+        received = uploads.write_chunk(request.stream, path, offset, upload.size)
+    except uploads.UploadError as e:
+        return jsonify({'error': str(e), 'offset': uploads.received_bytes(path)}), 409
+    
+    return jsonify({'id': upload.id, 'offset': received})
+
+@routes.route('/admin/uploads/<int:upload_id>/complete', methods=['POST'])
+@login_required
+def admin_upload_complete(upload_id):
+    """Cerrar la subida y encolar el procesamiento; responde sin esperar"""
+    if not current_user.is_admin:
+        return jsonify({'error': 'No autorizado'}), 403
+    
+    upload = db.get_or_404(FileUpload, upload_id)
+    if upload.status != 'uploading':
+        return jsonify({'id': upload.id, 'status': upload.status})
+    
+    received = uploads.received_bytes(uploads.partial_path(current_app.config['UPLOAD_FOLDER'], upload.id))
+    if received != upload.size:
+        return jsonify({'error': 'Faltan partes por subir', 'offset': received}), 409
+    
+    # UPDATE condicional: si llegan dos "complete" a la vez, solo uno encola el trabajo
+    claimed = db.session.execute(
+        update(FileUpload)
+        .where(FileUpload.id == upload.id, FileUpload.status == 'uploading')
+        .values(status='processing')
+    ).rowcount
+    if claimed:
+        enqueue_upload(upload)
+    db.session.commit()
+    
+    return jsonify({'id': upload.id, 'status': 'processing'}), 202
+
+@routes.route('/admin/files/<int:file_id>/import', methods=['GET', 'POST'])
 @login_required
+def admin_import_prices(file_id):
+    """POST: encolar la importación (dry_run=1 para simular). GET: resumen de la última"""
+    if not current_user.is_admin:
+        flash('No tienes permisos para acceder a esta página', 'error')
+        return redirect(url_for('index'))
+    
+    upload = db.get_or_404(FileUpload, file_id)
+    
+    if request.method == 'GET':
+        try:
+            with open(price_import_report_path(upload.id, 'json'), encoding='utf-8') as f:
+                return jsonify(json.load(f))
+        except FileNotFoundError:
+            return jsonify({'error': 'Este archivo aún no se importó'}), 404
+    
+    if upload.file_type != 'price_list' or upload.status != 'ready':
+        flash('Solo se pueden importar listas de precios ya procesadas', 'error')
+        return redirect(url_for('admin_files'))
+    
+    dry_run = request.form.get('dry_run') == '1'
+    jobs.enqueue(db.session, 'run_price_import', {'upload_id': upload.id, 'dry_run': dry_run},
+                 key=f"price_import:{upload.id}:{'dry' if dry_run else 'apply'}")
+    db.session.commit()
+    action = 'Simulación' if dry_run else 'Importación'
+    flash(f'{action} en curso; consulta el informe en unos momentos', 'success')
+    return redirect(url_for('admin_files'))
+
+@routes.route('/admin/files/<int:file_id>/import/diff')
+@login_required
+def admin_import_diff(file_id):
+    """Descargar el detalle fila a fila de la última importación"""
+    if not current_user.is_admin:
+        flash('No tienes permisos para acceder a esta página', 'error')
+        return redirect(url_for('index'))
+    
+    path = price_import_report_path(file_id, 'csv')
+    return send_from_directory(os.path.dirname(path), os.path.basename(path), as_attachment=True,
+                               download_name=f'importacion_{file_id}.csv', mimetype='text/csv')
+
+@routes.route('/admin/export')
+@login_required
+def admin_export():
+    """Descarga en streaming: ?dataset=orders&since=2024-01-01&until=2024-02-01&status=pending,completed&format=csv&gzip=1"""
+    if not current_user.is_admin:
+        flash('No tienes permisos para acceder a esta página', 'error')
+        return redirect(url_for('index'))
+    
+    dataset = request.args.get('dataset', 'orders')
+    fmt = request.args.get('format', 'csv')
+    compress = request.args.get('gzip') == '1'
+    try:
+        since = exports.parse_date(request.args.get('since'))
+        until = exports.parse_date(request.args.get('until'))
+        chunks = exports.export(db.engine, db.metadata, dataset, fmt, compress, since, until,
+                                exports.parse_statuses(*request.args.getlist('status')))
+    except ValueError as error:
+        abort(400, str(error))
+    
+    return current_app.response_class(chunks, mimetype=exports.mimetype(fmt, compress), headers={
+        'Content-Disposition': f'attachment; filename={exports.filename(dataset, fmt, compress, since, until)}',
+        'X-Accel-Buffering': 'no',  # Que nginx no acumule la respuesta entera
+    })
+
+@routes.route('/admin/cache/stats')
+@login_required
+def admin_cache_stats():
+    if not current_user.is_admin:
+        return jsonify({'error': 'No autorizado'}), 403
+    
+    return jsonify(cache.stats())
+
+# Ruta para actualizar cantidad en el carrito
+@routes.route('/update_cart/<int:item_id>/<int:quantity>')
 def update_cart(item_id, quantity):
-    cart_item = CartItem.query.get_or_404(item_id)
-    if cart_item.user_id == current_user.id:
-        if quantity <= 0:
-            db.session.delete(cart_item)
-        else:
-            cart_item.quantity = quantity
-        db.session.commit()
+    cart = current_cart()
+    if cart:
+        cart_store.update(cart, {item_id: quantity})
     return redirect(url_for('cart'))
 
 # Ruta para buscar productos
-@app.route('/search')
+@routes.route('/search')
+@page_cache.cached
 def search_products():
     query = request.args.get('q', '')
-    page = request.args.get('page', 1, type=int)
     
     if query:
-        products = Product.query.filter(
-            Product.name.contains(query) | 
-            Product.description.contains(query)
-        ).filter_by(is_active=True).paginate(page=page, per_page=12, error_out=False)
+        results, order = search.apply_search(Product.query.filter_by(is_active=True), Product, query)
     else:
-        products = Product.query.filter_by(is_active=True).paginate(page=page, per_page=12, error_out=False)
+        results, order = Product.query.filter_by(is_active=True), PRODUCT_ORDER
     
-    return render_template('products.html', products=products, search_query=query)
+    products = pagination.paginate(results, order, per_page=12, count_key=('search', query))
+    grid = render_template('product_grid.html', products=products.items)
+    
+    return render_template('products.html', products=products, grid=Markup(grid), search_query=query)
+
+# API JSON v1: mismas consultas y caché que las páginas HTML
+PRODUCT_FIELDS = ('id', 'name', 'description', 'price', 'stock', 'image', 'category', 'sku', 'updated_at')
+ORDER_FIELDS = ('id', 'total', 'status', 'created_at', 'items')
+
+def api_product(product, fields=None):
+    """Producto (snapshot o modelo) en el formato de la API"""
+    if not isinstance(product, dict):
+        product = product_snapshot(product)
+    return api.pick({key: product.get(key) for key in PRODUCT_FIELDS}, fields)
+
+def api_page(page, items):
+    return {
+        'items': items,
+        'total': page.total,
+        'next': page.next_args() if page.has_next else None,
+        'prev': page.prev_args() if page.has_prev else None,
+    }
+
+def api_order(order, fields=None):
+    data = {
+        'id': order.id,
+        'total': order.total,
+        'status': order.status,
+        'created_at': order.created_at,
+    }
+    if fields is None or 'items' in fields:
+        data['items'] = [{
+            'product_id': item.product_id,
+            'name': item.product_name,
+            'unit_price': item.unit_price,
+            'quantity': item.quantity,
+        } for item in order.order_items]
+    return api.pick(data, fields)
+
+@routes.route('/api/v1/products')
+def api_products():
+    fields = api.requested_fields(PRODUCT_FIELDS)
+    filters = catalog_filters()
+    counts = facets.counts(get_facets(), filters['categories'], filters['prices'], filters['in_stock'])
+    listing = get_listing(filters, counts['total'])
+    page = listing['page']
+    
+    # La generación del listado cambia con cada invalidación: nunca es anterior al último cambio
+    return api.conditional_json(
+        api_page(page, [api_product(product, fields) for product in page.items]),
+        last_modified=datetime.utcfromtimestamp(listing['generation'] / 1e9)
+    )
+
+@routes.route('/api/v1/products/<int:product_id>')
+def api_product_detail(product_id):
+    fields = api.requested_fields(PRODUCT_FIELDS)
+    product = get_product(product_id)
+    if product is None or not product['is_active']:
+        raise api.ApiError('Producto no encontrado', 404)
+    return api.conditional_json(api_product(product, fields), last_modified=product['updated_at'])
+
+@routes.route('/api/v1/categories')
+def api_categories():
+    return api.conditional_json({'items': get_categories()}, max_age=300)
+
+@routes.route('/api/v1/search')
+def api_search():
+    fields = api.requested_fields(PRODUCT_FIELDS)
+    query = request.args.get('q', '').strip()
+    if not query:
+        raise api.ApiError('Falta el parámetro q')
+    
+    results, order = search.apply_search(Product.query.filter_by(is_active=True), Product, query)
+    page = pagination.paginate(results, order, per_page=12, count_key=('search', query))
+    return api.conditional_json(api_page(page, [api_product(product, fields) for product in page.items]))
+
+def api_cart_line(item):
+    return {
+        'id': item.id,
+        'product': api_product(item.product, {'id', 'name', 'price', 'image', 'stock'}),
+        'quantity': item.quantity,
+        'subtotal': item.product['price'] * item.quantity,
+    }
+
+def api_cart_changes(item_ids, removed=()):
+    """Líneas modificadas y totales del carrito tras una mutación"""
+    items, total, units = cart_lines(current_cart())
+    item_ids = set(item_ids)
+    return jsonify({
+        'items': [api_cart_line(item) for item in items if item.id in item_ids],
+        'removed': sorted(removed),
+        'total': total,
+        'units': units,
+    })
+
+def api_quantity(value):
+    if isinstance(value, bool) or not isinstance(value, int) or not 0 <= value <= 1000:
+        raise api.ApiError('Cantidad inválida')
+    return value
+
+# El carrito no exige sesión: los invitados usan el de su cookie de sesión
+@routes.route('/api/v1/cart')
+def api_cart():
+    cart_items, total, units = cart_lines(current_cart())
+    return api.conditional_json({
+        'items': [api_cart_line(item) for item in cart_items],
+        'total': total,
+        'units': units,
+    }, max_age=0, private=True)
+
+@routes.route('/api/v1/cart/items', methods=['POST'])
+def api_cart_add():
+    """Sumar unidades de un producto: {product_id, quantity}"""
+    data = request.get_json(silent=True) or {}
+    product = get_product(data.get('product_id')) if isinstance(data.get('product_id'), int) else None
+    if product is None or not product['is_active']:
+        raise api.ApiError('Producto no encontrado', 404)
+    quantity = api_quantity(data.get('quantity', 1))
+    if quantity == 0:
+        raise api.ApiError('Cantidad inválida')
+    
+    cart = current_cart(create=True)
+    cart_store.add(cart, {product['id']: quantity})
+    line_id = next(line_id for line_id, product_id, _ in cart_store.items(cart) if product_id == product['id'])
+    return api_cart_changes([line_id])
+
+@routes.route('/api/v1/cart/items', methods=['PATCH'])
+def api_cart_update():
+    """Cambiar varias líneas a la vez: {items: [{id, quantity}, ...]}; cantidad 0 = eliminar"""
+    data = request.get_json(silent=True) or {}
+    lines = data.get('items')
+    if not isinstance(lines, list) or not lines:
+        raise api.ApiError('Falta la lista de líneas')
+    
+    quantities = {}
+    for line in lines:
+        if not isinstance(line, dict) or not isinstance(line.get('id'), int):
+            raise api.ApiError('Línea inválida')
+        quantities[line['id']] = api_quantity(line.get('quantity'))
+    
+    # Una sola transacción en el almacén; solo cambian las líneas que ya están en el carrito
+    removed = cart_store.update(current_cart(), quantities)
+    return api_cart_changes([item_id for item_id, quantity in quantities.items() if quantity], removed)
+
+@routes.route('/api/v1/cart/items/<int:item_id>', methods=['DELETE'])
+def api_cart_remove(item_id):
+    if not cart_store.remove(current_cart(), [item_id]):
+        raise api.ApiError('Línea no encontrada', 404)
+    return api_cart_changes([], [item_id])
+
+@routes.route('/api/v1/orders')
+@api.login_required
+def api_orders():
+    fields = api.requested_fields(ORDER_FIELDS)
+    query = Order.query.filter_by(user_id=current_user.id)
+    if fields is None or 'items' in fields:
+        query = query.options(selectinload(Order.order_items))
+    page = pagination.paginate(query, ORDER_ORDER, per_page=20)
+    return api.conditional_json(api_page(page, [api_order(order, fields) for order in page.items]),
+                                max_age=0, private=True)
+
+@routes.route('/api/v1/orders/<int:order_id>')
+@api.login_required
+def api_order_detail(order_id):
+    fields = api.requested_fields(ORDER_FIELDS)
+    order = Order.query.options(selectinload(Order.order_items)).filter_by(id=order_id, user_id=current_user.id).first()
+    if order is None:
+        raise api.ApiError('Pedido no encontrado', 404)
+    return api.conditional_json(api_order(order, fields), max_age=0, private=True)
+
+# Métricas de Prometheus (por proceso); se piden con METRICS_TOKEN como Bearer.
+# Sin token solo responde en DEBUG o TESTING: detrás del proxy inverso todas
+# las peticiones llegan desde 127.0.0.1, así que la dirección no sirve de filtro
+@routes.route('/metrics')
+def metrics_endpoint():
+    token = current_app.config['METRICS_TOKEN']
+    if token:
+        if not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            abort(403)
+    elif not (current_app.debug or current_app.testing):
+        abort(404)
+    
+    cache_stats = cache.backend.stats
+    body = metrics.exposition({
+        'cache_hits_total': ('counter', 'Aciertos de la caché', cache_stats.hits),
+        'cache_misses_total': ('counter', 'Fallos de la caché', cache_stats.misses),
+        'cache_evictions_total': ('counter', 'Entradas desalojadas de la caché', cache_stats.evictions),
+    })
+    return current_app.response_class(body, mimetype='text/plain; version=0.0.4')
+
+# La aplicación del entorno; al final, con todas las vistas ya definidas
+app = create_app()
 
 if __name__ == '__main__':
     with app.app_context():
-        db.create_all()
+        migrations.upgrade(db.engine, db.metadata)
         
         # Crear usuario administrador por defecto
         admin = User.query.filter_by(username='admin').first()
@@ -471,11 +1621,13 @@ if __name__ == '__main__':
             admin = User(
                 username='admin',
                 email='admin@tienda.com',
-                password_hash=generate_password_hash('admin123'),
+                password_hash=passwords.hash_password('admin123', app.config['PASSWORD_HASH_METHOD']),
                 is_admin=True
             )
             db.session.add(admin)
+            stats.incr(db.session, db.metadata, 'users')
             db.session.commit()
             print("Usuario administrador creado: admin / admin123")
     
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    # Servidor de desarrollo; en producción: python serve.py
+    app.run(debug=app.debug, host='0.0.0.0', port=int(os.environ.get('PORT', 5000)))
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la API JSON frente a las páginas HTML
+Crea una base SQLite temporal con productos sintéticos y compara, con el
+cliente de pruebas de Flask, el tiempo por petición y los bytes enviados
+(sin comprimir, gzip y brotli) de cada ruta HTML y su equivalente en la API,
+además de la revalidación con If-None-Match (304).
+
+Uso: python bench_api.py [productos] [repeticiones]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+tmp = None
+if 'DATABASE_URL' not in os.environ:
+    tmp = tempfile.TemporaryDirectory()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp.name, 'bench.db')}"
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import insert
+from app import app, db, Product
+import migrations
+
+ROUTES = [
+    ('Listado', '/products', '/api/v1/products'),
+    ('Listado (campos)', '/products', '/api/v1/products?fields=id,name,price'),
+    ('Detalle', '/product/1', '/api/v1/products/1'),
+    ('Búsqueda', '/search?q=producto', '/api/v1/search?q=producto'),
+]
+
+
+def populate(count):
+    with app.app_context():
+        migrations.upgrade(db.engine, db.metadata)
+        rows = [{
+            'name': f'Producto {i}',
+            'description': f'Descripción del producto {i} ' * 8,
+            'price': 10 + i % 500,
+            'stock': i % 50,
+            'category': f'Categoría {i % 10}',
+            'is_active': True,
+        } for i in range(count)]
+        db.session.execute(insert(Product), rows)
+        db.session.commit()
+
+
+def measure(client, url, repeat, headers=None):
+    """ms por petición y tamaño del cuerpo de la última respuesta"""
+    client.get(url, headers=headers)  # calentar la caché
+    start = time.perf_counter()
+    for _ in range(repeat):
+        response = client.get(url, headers=headers)
+    return (time.perf_counter() - start) * 1000 / repeat, response
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    print(f"📦 Generando {count} productos...")
+    populate(count)
+    client = app.test_client()
+
+    print("-" * 78)
+    print(f"{'Ruta':<18} {'Tipo':<6} {'ms/pet':>8} {'bytes':>8} {'gzip':>8} {'br':>8} {'304 ms':>8}")
+    print("-" * 78)
+    for name, html_url, api_url in ROUTES:
+        for kind, url in (('HTML', html_url), ('API', api_url)):
+            ms, response = measure(client, url, repeat)
+            size = len(response.data)
+            gz = len(client.get(url, headers={'Accept-Encoding': 'gzip'}).data)
+            br = len(client.get(url, headers={'Accept-Encoding': 'br'}).data)
+
+            revalidate = '-'
+            etag = response.headers.get('ETag')
+            if etag:
+                ms_304, cached = measure(client, url, repeat, headers={'If-None-Match': etag})
+                revalidate = f'{ms_304:.2f}' if cached.status_code == 304 else '-'
+            print(f"{name:<18} {kind:<6} {ms:>8.2f} {size:>8} {gz:>8} {br:>8} {revalidate:>8}")
+    print("-" * 78)
+
+    if tmp is not None:
+        tmp.cleanup()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la importación de listas de precios
+Crea una base SQLite temporal con productos sintéticos y una lista CSV con
+filas que cambian precio y stock (por SKU y por nombre), repetidas, sin
+cambios o inexistentes. Mide filas/seg de la simulación y de la importación
+real, y el pico de memoria del proceso.
+
+Uso: python bench_pricelist.py [filas] [productos] [tamaño de lote]
+"""
+
+import csv
+import os
+import random
+import resource
+import sys
+import tempfile
+from sqlalchemy import create_engine, insert
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import Product
+import pricelist
+
+
+def populate(engine, count):
+    """Insertar productos con SKU en bloques"""
+    Product.__table__.create(engine)
+    rng = random.Random(42)
+    batch = []
+    with engine.begin() as conn:
+        for i in range(count):
+            batch.append({
+                'name': f'Producto {i:07d}',
+                'description': '',
+                'sku': f'SKU-{i:07d}',
+                'price': round(rng.uniform(1, 2000), 2),
+                'stock': rng.randint(0, 100),
+                'category': 'Bench',
+                'is_active': True,
+            })
+            if len(batch) == 5000:
+                conn.execute(insert(Product.__table__), batch)
+                batch = []
+        if batch:
+            conn.execute(insert(Product.__table__), batch)
+
+
+def write_price_list(path, rows, products):
+    """Lista de precios sintética, escrita fila a fila"""
+    rng = random.Random(7)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f, delimiter=';')
+        writer.writerow(['SKU', 'Nombre', 'Precio', 'Stock'])
+        for _ in range(rows):
+            i = rng.randrange(products)
+            kind = rng.random()
+            if kind < 0.02:
+                writer.writerow([f'NO-EXISTE-{i}', '', '10,00', 1])
+            elif kind < 0.10:
+                writer.writerow(['', f'Producto {i:07d}', f'{rng.uniform(1, 2000):.2f}'.replace('.', ','), ''])
+            else:
+                writer.writerow([f'SKU-{i:07d}', '', f'{rng.uniform(1, 2000):.2f}'.replace('.', ','), rng.randint(0, 100)])
+
+
+def peak_memory_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    products = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+    batch_size = int(sys.argv[3]) if len(sys.argv) > 3 else pricelist.BATCH_SIZE
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        print(f"📦 Generando {products} productos y una lista de {rows} filas...")
+        populate(engine, products)
+        path = os.path.join(tmp, 'precios.csv')
+        write_price_list(path, rows, products)
+        size_mb = os.path.getsize(path) / 1024 / 1024
+        memory_before = peak_memory_mb()
+
+        results = []
+        for dry_run in (True, False):
+            with open(os.devnull, 'w', newline='') as diff:
+                report = pricelist.import_price_list(
+                    engine, Product.__table__, path, dry_run=dry_run, batch_size=batch_size, diff=diff
+                )
+            results.append(('Simulación' if dry_run else 'Importación', report))
+
+        print("-" * 50)
+        print(f"{'Modo':<15} {'filas/s':>12} {'segundos':>10} {'cambios':>10}")
+        print("-" * 50)
+        for name, report in results:
+            print(f"{name:<15} {report.rows_per_second:>12.0f} {report.elapsed:>10.2f} {report.counts['updated']:>10}")
+        print("-" * 50)
+        summary = results[-1][1].as_dict()
+        print(f"Archivo: {size_mb:.1f} MB, lote de {batch_size} filas")
+        print(f"No encontradas: {summary['not_found']}, sin cambios: {summary['unchanged']}")
+        print(f"Pico de memoria: {memory_before:.0f} MB antes, {peak_memory_mb():.0f} MB después")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Benchmark de las rutas principales con línea base
+Recorre las rutas reales con el cliente de pruebas de Flask, en proceso y
+sobre la base configurada (llénala antes con datagen.py), o contra un
+servidor en marcha (--url). Por ruta: calentamiento, N peticiones repartidas
+entre varios hilos, y p50/p95/p99, peticiones/seg y, si hay cabecera
+Server-Timing, sentencias SQL y tiempo en la base por petición.
+
+Los resultados se guardan en JSON (--save) y se comparan con una línea base
+anterior (--compare): cualquier ruta que empeore más del umbral en p95 o en
+peticiones/seg se marca y el script termina con código 1.
+
+En modo --url se inicia sesión con los usuarios de datagen.py
+(admin / admin123 y cliente<N> / cliente123).
+
+Uso: python bench_routes.py [peticiones] [--url http://127.0.0.1:8000]
+         [--concurrency N] [--save base.json] [--compare base.json] [--threshold 10]
+"""
+
+import http.client
+import json
+import math
+import os
+import platform
+import re
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import urlencode, urlsplit
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault('METRICS_SERVER_TIMING', '1')
+os.environ.setdefault('JOBS_EMBEDDED', '0')  # Sin trabajos periódicos durante la medición
+
+from sqlalchemy import func, select
+import carts
+from app import app, db, cart_store, User, Product, Order
+
+# (nombre, ruta, sesión): la ruta admite {product_id}, {category}, {query} y {order_id}
+ROUTES = [
+    ('inicio', '/', None),
+    ('productos', '/products', None),
+    ('productos p5', '/products?page=5', None),
+    ('categoría', '/products?category={category}', None),
+    ('detalle', '/product/{product_id}', None),
+    ('búsqueda', '/search?q={query}', None),
+    ('api productos', '/api/v1/products', None),
+    ('api detalle', '/api/v1/products/{product_id}', None),
+    ('carrito', '/cart', 'user'),
+    ('mis pedidos', '/orders', 'user'),
+    ('api pedido', '/api/v1/orders/{order_id}', 'user'),
+    ('panel', '/admin', 'admin'),
+    ('admin pedidos', '/admin/orders', 'admin'),
+    ('admin productos', '/admin/products', 'admin'),
+    ('admin usuarios', '/admin/users', 'admin'),
+]
+SERVER_TIMING_DB = re.compile(r'db;dur=([\d.]+);desc="(\d+) SQL"')
+
+
+def option(name, default, kind=str):
+    if name in sys.argv:
+        return kind(sys.argv[sys.argv.index(name) + 1])
+    return default
+
+
+def fixtures():
+    """Ids y textos para las rutas, elegidos de los datos existentes"""
+    with app.app_context():
+        sizes = {
+            name: db.session.execute(select(func.count()).select_from(model)).scalar()
+            for name, model in (('users', User), ('products', Product), ('orders', Order))
+        }
+        # Un producto de la mitad del catálogo, ni el más nuevo ni el más viejo
+        product = db.session.execute(
+            select(Product.id, Product.name, Product.category)
+            .where(Product.is_active.is_(True)).order_by(Product.id)
+            .offset(sizes['products'] // 2).limit(1)
+        ).first()
+        admin = db.session.execute(select(User.id, User.username).where(User.is_admin.is_(True)).limit(1)).first()
+        # Un cliente con carrito y pedidos, si lo hay entre los primeros pedidos
+        customers = db.session.execute(select(Order.user_id, Order.id).order_by(Order.id).limit(100)).all()
+        customer = next(
+            (row for row in customers if cart_store.lines(carts.user_cart(row.user_id))),
+            customers[0] if customers else None
+        )
+        username = db.session.get(User, customer[0]).username if customer else None
+        database = db.engine.dialect.name
+
+    if product is None or admin is None or customer is None:
+        print("❌ Faltan datos: llena la base con python datagen.py")
+        sys.exit(1)
+    return {
+        'product_id': product.id,
+        'category': urlencode({'': product.category})[1:],
+        'query': urlencode({'': product.name.split()[0]})[1:],
+        'order_id': customer[1],
+        'users': {'user': (customer[0], username, 'cliente123'), 'admin': (admin.id, admin.username, 'admin123')},
+        'sizes': sizes,
+        'database': database,
+    }
+
+
+class TestClientSession:
+    """Peticiones en proceso; la sesión se abre escribiendo la cookie directamente"""
+
+    def __init__(self, user):
+        self.client = app.test_client()
+        if user:
+            with self.client.session_transaction() as session:
+                session['_user_id'] = str(user[0])
+                session['_fresh'] = True
+
+    def get(self, path):
+        response = self.client.get(path)
+        return response.status_code, response.headers.get('Server-Timing', '')
+
+
+class HttpSession:
+    """Peticiones a un servidor real con conexión keep-alive"""
+
+    def __init__(self, base, user):
+        parts = urlsplit(base)
+        self.conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=60)
+        self.cookie = ''
+        if user:
+            body = urlencode({'username': user[1], 'password': user[2]})
+            self.conn.request('POST', '/login', body, {'Content-Type': 'application/x-www-form-urlencoded'})
+            response = self.conn.getresponse()
+            response.read()
+            cookie = response.getheader('Set-Cookie', '')
+            self.cookie = cookie.split(';', 1)[0]
+            if not self.cookie:
+                raise RuntimeError(f'No se pudo iniciar sesión como {user[1]}')
+
+    def get(self, path):
+        self.conn.request('GET', path, headers={'Cookie': self.cookie, 'Accept-Encoding': 'gzip'})
+        response = self.conn.getresponse()
+        response.read()
+        return response.status, response.getheader('Server-Timing', '')
+
+
+def percentile(values, p):
+    """Percentil por rango más cercano de una lista ordenada"""
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+
+def run_route(make_session, path, requests, concurrency):
+    warmup = make_session()
+    for _ in range(min(20, max(1, requests // 10))):
+        warmup.get(path)
+
+    latencies, errors, sql, db_ms = [], [0], [], []
+    lock = threading.Lock()
+    per_thread = [requests // concurrency + (1 if i < requests % concurrency else 0) for i in range(concurrency)]
+
+    def worker(session, count):
+        local = []
+        for _ in range(count):
+            started = time.perf_counter()
+            status, timing = session.get(path)
+            local.append(time.perf_counter() - started)
+            match = SERVER_TIMING_DB.search(timing)
+            with lock:
+                if status >= 400:
+                    errors[0] += 1
+                if match:
+                    db_ms.append(float(match.group(1)))
+                    sql.append(int(match.group(2)))
+        with lock:
+            latencies.extend(local)
+
+    # Las sesiones (y el login) se preparan fuera del tiempo medido
+    sessions = [make_session() for _ in range(concurrency)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, sessions, per_thread))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'p50': round(percentile(latencies, 50) * 1000, 3),
+        'p95': round(percentile(latencies, 95) * 1000, 3),
+        'p99': round(percentile(latencies, 99) * 1000, 3),
+        'rps': round(len(latencies) / elapsed, 1),
+        'errors': errors[0],
+        'sql': round(sum(sql) / len(sql), 1) if sql else None,
+        'db_ms': round(sum(db_ms) / len(db_ms), 3) if db_ms else None,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline, results, threshold):
+    """Imprimir las diferencias con la línea base; devuelve las rutas que empeoraron"""
+    if baseline.get('data') != results['data']:
+        print(f"⚠️  Los datos no coinciden con la línea base: {baseline.get('data')} / {results['data']}")
+    print(f"\nComparación con {baseline.get('commit') or 'línea base'} ({baseline.get('created')})")
+    print("-" * 72)
+    print(f"{'Ruta':<16} {'p95 antes':>10} {'p95 ahora':>10} {'Δ p95':>8} {'pet/s antes':>12} {'Δ pet/s':>8}")
+    print("-" * 72)
+    regressions = []
+    for name, now in results['routes'].items():
+        before = baseline['routes'].get(name)
+        if before is None:
+            print(f"{name:<16} {'(nueva)':>10} {now['p95']:>10.2f}")
+            continue
+        p95_delta = (now['p95'] - before['p95']) / before['p95'] * 100 if before['p95'] else 0
+        rps_delta = (now['rps'] - before['rps']) / before['rps'] * 100 if before['rps'] else 0
+        worse = p95_delta > threshold or rps_delta < -threshold
+        if worse:
+            regressions.append(name)
+        print(f"{name:<16} {before['p95']:>10.2f} {now['p95']:>10.2f} {p95_delta:>+7.1f}% "
+              f"{before['rps']:>12.1f} {rps_delta:>+7.1f}%{'  ⚠️' if worse else ''}")
+    print("-" * 72)
+    return regressions
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 and sys.argv[1].isdigit() else 500
+    url = option('--url', None)
+    concurrency = option('--concurrency', 1, int)
+    threshold = option('--threshold', 10.0, float)
+
+    data = fixtures()
+    app.config['SQL_QUERY_BUDGET_ENFORCE'] = False
+
+    mode = url or 'cliente de pruebas'
+    print(f"⏱️  {requests} peticiones por ruta, {concurrency} hilo(s), {mode}")
+    print(f"   Datos: {data['sizes']}")
+    print("-" * 86)
+    print(f"{'Ruta':<16} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'pet/s':>9} {'SQL':>6} {'db ms':>8} {'errores':>8}")
+    print("-" * 86)
+
+    routes = {}
+    for name, path, who in ROUTES:
+        path = path.format(**data)
+        user = data['users'][who] if who else None
+        if url:
+            make_session = lambda: HttpSession(url, user)
+        else:
+            make_session = lambda: TestClientSession(user)
+        result = routes[name] = run_route(make_session, path, requests, concurrency)
+        sql = '-' if result['sql'] is None else f"{result['sql']:g}"
+        db_ms = '-' if result['db_ms'] is None else f"{result['db_ms']:.2f}"
+        print(f"{name:<16} {result['p50']:>9.2f} {result['p95']:>9.2f} {result['p99']:>9.2f} "
+              f"{result['rps']:>9.1f} {sql:>6} {db_ms:>8} {result['errors']:>8}")
+    print("-" * 86)
+
+    results = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'mode': 'url' if url else 'client',
+        'database': None if url else data['database'],
+        'requests': requests,
+        'concurrency': concurrency,
+        'data': data['sizes'],
+        'routes': routes,
+    }
+
+    save = option('--save', None)
+    if save:
+        with open(save, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"💾 Resultados guardados en {save}")
+
+    baseline_path = option('--compare', None)
+    if baseline_path:
+        with open(baseline_path, encoding='utf-8') as f:
+            regressions = compare(json.load(f), results, threshold)
+        if regressions:
+            print(f"❌ Empeoran más de un {threshold:g}%: {', '.join(regressions)}")
+            sys.exit(1)
+        print("✅ Sin regresiones")
+
+
+if __name__ == '__main__':
+    main()
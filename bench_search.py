@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Benchmark de búsqueda: LIKE contra el índice de texto completo
+Crea una base SQLite temporal con productos sintéticos y mide la primera
+página de resultados más el COUNT que hace `paginate`.
+
+Uso: python bench_search.py [productos] [repeticiones]
+"""
+
+import os
+import sys
+import random
+import tempfile
+import time
+from sqlalchemy import create_engine, func, insert
+from sqlalchemy.orm import Session
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import Product
+import search
+
+WORDS = [
+    'camión', 'rápido', 'teclado', 'mecánico', 'monitor', 'pantalla', 'ratón',
+    'inalámbrico', 'portátil', 'batería', 'cargador', 'cable', 'auriculares',
+    'micrófono', 'cámara', 'impresora', 'tóner', 'disco', 'sólido', 'memoria',
+    'gráfica', 'placa', 'fuente', 'alimentación', 'gabinete', 'ventilador',
+]
+QUERIES = ['teclado', 'raton inalambrico', 'cam', 'bateria portatil', 'toner']
+
+
+def vocabulary(rng, size=5000):
+    """Palabras sintéticas para que las descripciones no sean todas iguales"""
+    syllables = ['ba', 'ce', 'di', 'fo', 'gu', 'la', 'me', 'no', 'pi', 'ro', 'su', 'ta', 'vo', 'xe', 'zu']
+    return [''.join(rng.choices(syllables, k=rng.randint(2, 4))) for _ in range(size)]
+
+
+def populate(engine, rows):
+    """Insertar productos sintéticos en bloques"""
+    Product.__table__.create(engine)
+    rng = random.Random(42)
+    vocab = vocabulary(rng)
+    batch = []
+    with engine.begin() as conn:
+        for i in range(rows):
+            batch.append({
+                'name': ' '.join([rng.choice(WORDS)] + rng.sample(vocab, 2)).title(),
+                'description': ' '.join(rng.choices(WORDS, k=2) + rng.choices(vocab, k=20)),
+                'price': round(rng.uniform(1, 2000), 2),
+                'stock': rng.randint(0, 100),
+                'category': rng.choice(['Periféricos', 'Componentes', 'Audio']),
+                'is_active': True,
+            })
+            if len(batch) == 5000:
+                conn.execute(insert(Product.__table__), batch)
+                batch = []
+        if batch:
+            conn.execute(insert(Product.__table__), batch)
+
+
+def run(session, build, repeat):
+    """Ejecutar COUNT + primera página para cada consulta y devolver ms por búsqueda"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for q in QUERIES:
+            query, order = build(session.query(Product).filter_by(is_active=True), q)
+            query.with_entities(func.count()).scalar()
+            query.order_by(*[c.desc() if d else c for c, d in order]).limit(12).all()
+    return (time.perf_counter() - start) * 1000 / (repeat * len(QUERIES))
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        print(f"📦 Generando {rows} productos...")
+        populate(engine, rows)
+
+        with Session(engine) as session:
+            like_ms = run(session, lambda q, text: (search.like_search(q, Product, text), [(Product.id, False)]), repeat)
+
+            start = time.perf_counter()
+            search.ensure_index(engine)
+            index_s = time.perf_counter() - start
+
+            fts_ms = run(session, lambda q, text: search.apply_search(q, Product, text), repeat)
+
+        print("-" * 50)
+        print(f"{'Método':<20} {'ms/búsqueda':>15}")
+        print("-" * 50)
+        print(f"{'LIKE':<20} {like_ms:>15.2f}")
+        print(f"{'Texto completo':<20} {fts_ms:>15.2f}")
+        print("-" * 50)
+        print(f"Construcción del índice: {index_s:.2f}s")
+        print(f"Mejora: {like_ms / fts_ms:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Benchmark del tiempo de arranque de la aplicación y de los comandos
+Cada comando se lanza varias veces en un proceso nuevo (mediana y máximo del
+tiempo total) y una vez más con `python -X importtime`, que da el tiempo de
+importación y los paquetes que más pesan. Sirve para vigilar que
+`manage_users.py list`, el worker de trabajos y el arranque sigan siendo
+rápidos: todo lo que se importe de más en app.py lo pagan todos.
+
+Igual que bench_routes.py, los resultados se guardan en JSON (--save) y se
+comparan con una línea base (--compare): si la mediana de algún comando
+empeora más del umbral, el script termina con código 1.
+
+Uso: python bench_startup.py [repeticiones] [--top N] [--save base.json]
+         [--compare base.json] [--threshold 20]
+"""
+
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# (nombre, argumentos de python); se ejecutan desde la carpeta del proyecto
+COMMANDS = [
+    ('import app', ['-c', 'import app']),
+    ('usuarios ayuda', ['manage_users.py', 'help']),
+    ('usuarios list', ['manage_users.py', 'list']),
+    ('worker', ['jobs.py', 'list', 'queued']),
+    ('migraciones', ['migrations.py', 'status']),
+    ('exportar ayuda', ['exports.py']),
+]
+
+IMPORT_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( +)(\S+)$')
+
+
+def option(name, default, kind=str):
+    if name in sys.argv:
+        return kind(sys.argv[sys.argv.index(name) + 1])
+    return default
+
+
+def run(args):
+    """Segundos que tarda `python args` de principio a fin"""
+    started = time.perf_counter()
+    subprocess.run([sys.executable, *args], cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - started
+
+
+def import_profile(args, top):
+    """Tiempo total de importación, módulos importados y paquetes con más tiempo propio"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', *args], cwd=ROOT,
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True
+    )
+    total = modules = 0
+    packages = Counter()
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if not match:
+            continue
+        own, cumulative, indent, name = match.groups()
+        modules += 1
+        packages[name.split('.')[0]] += int(own)
+        if len(indent) == 1:  # Importación de primer nivel: su acumulado incluye todo lo que arrastra
+            total += int(cumulative)
+    return {
+        'import_ms': round(total / 1000, 1),
+        'modules': modules,
+        'top': [[name, round(own / 1000, 1)] for name, own in packages.most_common(top)],
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline, results, threshold):
+    """Imprimir las diferencias con la línea base; devuelve los comandos que empeoraron"""
+    print(f"\nComparación con {baseline.get('commit') or 'línea base'} ({baseline.get('created')})")
+    print("-" * 64)
+    print(f"{'Comando':<16} {'ms antes':>10} {'ms ahora':>10} {'Δ':>8} {'módulos':>16}")
+    print("-" * 64)
+    regressions = []
+    for name, now in results['commands'].items():
+        before = baseline['commands'].get(name)
+        if before is None:
+            print(f"{name:<16} {'(nuevo)':>10} {now['median_ms']:>10.1f}")
+            continue
+        delta = (now['median_ms'] - before['median_ms']) / before['median_ms'] * 100 if before['median_ms'] else 0
+        worse = delta > threshold
+        if worse:
+            regressions.append(name)
+        modules = f"{before['modules']} → {now['modules']}"
+        print(f"{name:<16} {before['median_ms']:>10.1f} {now['median_ms']:>10.1f} {delta:>+7.1f}% "
+              f"{modules:>16}{'  ⚠️' if worse else ''}")
+    print("-" * 64)
+    return regressions
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 and sys.argv[1].isdigit() else 5
+    top = option('--top', 5, int)
+    threshold = option('--threshold', 20.0, float)
+
+    print(f"⏱️  Arranque de {len(COMMANDS)} comandos, {repeat} repeticiones cada uno")
+    print("-" * 72)
+    print(f"{'Comando':<16} {'mediana ms':>11} {'máx ms':>9} {'import ms':>10} {'módulos':>8}")
+    print("-" * 72)
+
+    commands = {}
+    for name, args in COMMANDS:
+        run(args)  # Calentamiento: bytecode en __pycache__ y archivos en la caché del sistema
+        times = [run(args) * 1000 for _ in range(repeat)]
+        result = commands[name] = {
+            'median_ms': round(statistics.median(times), 1),
+            'max_ms': round(max(times), 1),
+            **import_profile(args, top),
+        }
+        print(f"{name:<16} {result['median_ms']:>11.1f} {result['max_ms']:>9.1f} "
+              f"{result['import_ms']:>10.1f} {result['modules']:>8}")
+        print(f"{'':<16} {', '.join(f'{package} {ms:g}' for package, ms in result['top'])}")
+    print("-" * 72)
+
+    results = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'repeat': repeat,
+        'commands': commands,
+    }
+
+    save = option('--save', None)
+    if save:
+        with open(save, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"💾 Resultados guardados en {save}")
+
+    baseline_path = option('--compare', None)
+    if baseline_path:
+        with open(baseline_path, encoding='utf-8') as f:
+            regressions = compare(json.load(f), results, threshold)
+        if regressions:
+            print(f"❌ Empeoran más de un {threshold:g}%: {', '.join(regressions)}")
+            sys.exit(1)
+        print("✅ Sin regresiones")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,269 @@
+"""
+Caché de lectura para el catálogo
+Backends:
+  - memory:     LRU en memoria del proceso, con TTL
+  - filesystem: un archivo por clave en CACHE_DIR, compartido entre workers
+  - null:       no guarda nada (desactiva la caché)
+
+Configuración: CACHE_TYPE, CACHE_DEFAULT_TIMEOUT, CACHE_THRESHOLD, CACHE_DIR
+"""
+
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+
+
+class CacheStats:
+    """Contadores de aciertos, fallos y desalojos (por proceso)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.sets = self.deletes = self.evictions = 0
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def as_dict(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'sets': self.sets,
+            'deletes': self.deletes,
+            'evictions': self.evictions,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+class NullCache:
+    shared = False  # True si todos los procesos ven lo mismo (un delete llega a todos)
+
+    def __init__(self, default_timeout=300, **kwargs):
+        self.default_timeout = default_timeout
+        self.stats = CacheStats()
+
+    def get(self, key):
+        self.stats.incr('misses')
+        return None
+
+    def set(self, key, value, timeout=None):
+        pass
+
+    def delete(self, key):
+        pass
+
+    def clear(self):
+        pass
+
+    def __len__(self):
+        return 0
+
+
+class MemoryCache(NullCache):
+    """LRU con caducidad; thread-safe"""
+
+    def __init__(self, default_timeout=300, threshold=1000, **kwargs):
+        super().__init__(default_timeout)
+        self.threshold = threshold
+        self._data = OrderedDict()  # {clave: (expira, valor)}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._data.move_to_end(key)
+                self.stats.incr('hits')
+                return entry[1]
+            if entry is not None:
+                del self._data[key]
+        self.stats.incr('misses')
+        return None
+
+    def set(self, key, value, timeout=None):
+        expires = time.monotonic() + (timeout or self.default_timeout)
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.threshold:
+                self._data.popitem(last=False)
+                self.stats.incr('evictions')
+        self.stats.incr('sets')
+
+    def delete(self, key):
+        with self._lock:
+            if self._data.pop(key, None) is not None:
+                self.stats.incr('deletes')
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class FileSystemCache(NullCache):
+    """Un archivo pickle por clave; sirve para varios procesos en la misma máquina"""
+
+    shared = True
+
+    def __init__(self, cache_dir, default_timeout=300, threshold=5000, **kwargs):
+        super().__init__(default_timeout)
+        self.cache_dir = cache_dir
+        self.threshold = threshold
+        self._writes = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, hashlib.sha1(key.encode()).hexdigest())
+
+    def get(self, key):
+        try:
+            with open(self._path(key), 'rb') as f:
+                expires, value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            self.stats.incr('misses')
+            return None
+        if expires <= time.time():
+            self.delete(key)
+            self.stats.incr('misses')
+            return None
+        self.stats.incr('hits')
+        return value
+
+    def set(self, key, value, timeout=None):
+        expires = time.time() + (timeout or self.default_timeout)
+        # Escritura atómica: otro worker nunca lee un archivo a medias
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir)
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump((expires, value), f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self._path(key))
+        self.stats.incr('sets')
+
+        self._writes += 1
+        if self._writes % 100 == 0:
+            self._prune()
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+            self.stats.incr('deletes')
+        except FileNotFoundError:
+            pass
+
+    def clear(self):
+        for name in os.listdir(self.cache_dir):
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except OSError:
+                pass
+
+    def _prune(self):
+        """Borrar los archivos más antiguos si se supera el umbral"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            try:
+                entries.append((os.path.getmtime(path), path))
+            except OSError:
+                pass
+        entries.sort()
+        for _, path in entries[:max(0, len(entries) - self.threshold)]:
+            try:
+                os.remove(path)
+                self.stats.incr('evictions')
+            except OSError:
+                pass
+
+    def __len__(self):
+        return len(os.listdir(self.cache_dir))
+
+
+BACKENDS = {
+    'null': NullCache,
+    'memory': MemoryCache,
+    'filesystem': FileSystemCache,
+}
+
+
+class Cache:
+    """Extensión de Flask que delega en el backend de la aplicación actual
+
+    Cada aplicación guarda su backend en app.extensions['cache'], así dos
+    aplicaciones del mismo proceso (pruebas, otra configuración) no se pisan.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('CACHE_TYPE', 'memory')
+        app.config.setdefault('CACHE_DEFAULT_TIMEOUT', 300)
+        app.config.setdefault('CACHE_THRESHOLD', 1000)
+        app.config.setdefault('CACHE_DIR', os.path.join(app.instance_path, 'cache'))
+
+        backend = BACKENDS[app.config['CACHE_TYPE']]
+        app.extensions['cache'] = backend(
+            cache_dir=app.config['CACHE_DIR'],
+            default_timeout=app.config['CACHE_DEFAULT_TIMEOUT'],
+            threshold=app.config['CACHE_THRESHOLD'],
+        )
+
+    @property
+    def backend(self):
+        return current_app.extensions['cache']
+
+    @property
+    def shared(self):
+        return self.backend.shared
+
+    def get(self, key):
+        return self.backend.get(key)
+
+    def set(self, key, value, timeout=None):
+        self.backend.set(key, value, timeout)
+
+    def delete(self, *keys):
+        for key in keys:
+            self.backend.delete(key)
+
+    def clear(self):
+        self.backend.clear()
+
+    def get_or_set(self, key, factory, timeout=None):
+        """Devolver la clave o calcularla con `factory()` y guardarla"""
+        value = self.get(key)
+        if value is None:
+            value = factory()
+            if value is not None:
+                self.set(key, value, timeout)
+        return value
+
+    def generation(self, name):
+        """Generación actual de un espacio de claves (ver `bump`)"""
+        key = f'gen:{name}'
+        value = self.get(key)
+        if value is None:
+            value = time.time_ns()
+            # Sin caducidad práctica: perderla solo invalida ese espacio
+            self.set(key, value, timeout=365 * 24 * 3600)
+        return value
+
+    def bump(self, *names):
+        """Invalidar de golpe todas las claves construidas con `generation(name)`"""
+        for name in names:
+            self.set(f'gen:{name}', time.time_ns(), timeout=365 * 24 * 3600)
+
+    def stats(self):
+        stats = self.backend.stats.as_dict()
+        stats['backend'] = type(self.backend).__name__
+        stats['entries'] = len(self.backend)
+        return stats
@@ -0,0 +1,419 @@
+"""
+Almacén de carritos, fuera de la base principal
+Cada clic en el carrito escribe aquí y no en la base de la tienda: los
+carritos solo pasan a cart_item dentro de la transacción del pago. Así
+los visitantes que navegan no generan escrituras en la base principal y
+los invitados también pueden llenar un carrito (se suma al suyo al iniciar
+sesión).
+
+Un carrito tiene una clave (user:<id> o guest:<token de la sesión>) y una
+línea por producto. Cada línea tiene un id propio que no se reutiliza,
+como los de cart_item: es el id de línea de la API /api/v1/cart, y las
+líneas que vienen de cart_item conservan el suyo. Los carritos que llevan
+CART_MAX_AGE_DAYS sin cambios se borran de golpe con `expire` (trabajo
+cleanup_carts).
+
+Backends:
+  - sqlite: archivo SQLite propio en modo WAL (CART_STORE_PATH, por defecto
+    instance/carts.db), compartido entre los procesos de la máquina
+  - memory: diccionario del proceso (pruebas y desarrollo con un proceso)
+
+Configuración: CART_STORE, CART_STORE_PATH
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from flask import current_app
+
+
+def user_cart(user_id):
+    return f'user:{user_id}'
+
+
+def guest_cart(token):
+    return f'guest:{token}'
+
+
+class MemoryCartStore:
+    """Carritos en un diccionario; thread-safe"""
+
+    def __init__(self, **kwargs):
+        self._carts = {}  # {clave: (última modificación, {product_id: [id de línea, cantidad]})}
+        self._last_id = 0
+        self._lock = threading.Lock()
+
+    def lines(self, cart):
+        return {product_id: quantity for _, product_id, quantity in self.items(cart)}
+
+    def items(self, cart):
+        with self._lock:
+            _, lines = self._carts.get(cart, (None, {}))
+            return [(line[0], product_id, line[1]) for product_id, line in sorted(lines.items())]
+
+    def add(self, cart, lines):
+        """Sumar unidades: {product_id: cantidad}"""
+        with self._lock:
+            current = self._touch(cart)
+            for product_id, quantity in lines.items():
+                self._add(current, product_id, quantity)
+
+    def add_many(self, carts):
+        """Llenar varios carritos de una vez: {clave: {product_id: cantidad}}"""
+        with self._lock:
+            for cart, lines in carts.items():
+                current = self._touch(cart)
+                for product_id, quantity in lines.items():
+                    self._add(current, product_id, quantity)
+
+    def update(self, cart, quantities):
+        """Cambiar la cantidad de líneas existentes ({id de línea: cantidad}); 0 las elimina
+
+        Devuelve los ids de las líneas eliminadas.
+        """
+        with self._lock:
+            _, current = self._carts.get(cart, (None, {}))
+            changed, removed = False, []
+            for product_id, line in list(current.items()):
+                quantity = quantities.get(line[0])
+                if quantity is None:
+                    continue
+                if quantity:
+                    line[1] = quantity
+                    changed = True
+                else:
+                    del current[product_id]
+                    removed.append(line[0])
+            if changed or removed:
+                self._touch(cart)
+            return removed
+
+    def remove(self, cart, line_ids):
+        """Eliminar líneas por id; devuelve cuántas había"""
+        line_ids = set(line_ids)
+        with self._lock:
+            _, current = self._carts.get(cart, (None, {}))
+            removed = [product_id for product_id, line in current.items() if line[0] in line_ids]
+            for product_id in removed:
+                del current[product_id]
+            if removed:
+                self._touch(cart)
+            return len(removed)
+
+    def clear(self, cart):
+        with self._lock:
+            self._carts.pop(cart, None)
+
+    def take(self, cart):
+        """Sacar el carrito entero: devuelve sus líneas (id, product_id, cantidad) y lo borra"""
+        with self._lock:
+            _, lines = self._carts.pop(cart, (None, {}))
+            return [(line[0], product_id, line[1]) for product_id, line in sorted(lines.items())]
+
+    def restore(self, cart, items):
+        """Devolver líneas (id, product_id, cantidad) con su id, si nadie lo usa ya"""
+        with self._lock:
+            taken = {line[0] for _, lines in self._carts.values() for line in lines.values()}
+            current = self._touch(cart)
+            for line_id, product_id, quantity in items:
+                if product_id in current or line_id in taken:
+                    self._add(current, product_id, quantity)
+                else:
+                    current[product_id] = [line_id, quantity]
+                    self._last_id = max(self._last_id, line_id)
+
+    def merge(self, source, target):
+        """Sumar el carrito `source` a `target` y borrarlo; las líneas nuevas conservan su id"""
+        with self._lock:
+            _, lines = self._carts.pop(source, (None, {}))
+            current = self._touch(target)
+            for product_id, line in lines.items():
+                if product_id in current:
+                    current[product_id][1] += line[1]
+                else:
+                    current[product_id] = line
+
+    def expire(self, max_age):
+        """Borrar los carritos sin cambios en `max_age` segundos; devuelve cuántos"""
+        cutoff = time.time() - max_age
+        with self._lock:
+            expired = [cart for cart, (updated_at, _) in self._carts.items() if updated_at < cutoff]
+            for cart in expired:
+                del self._carts[cart]
+        return len(expired)
+
+    def _touch(self, cart):
+        _, lines = self._carts.get(cart, (None, {}))
+        self._carts[cart] = (time.time(), lines)
+        return lines
+
+    def _add(self, current, product_id, quantity):
+        if product_id in current:
+            current[product_id][1] += quantity
+        else:
+            self._last_id += 1
+            current[product_id] = [self._last_id, quantity]
+
+    def __len__(self):
+        return len(self._carts)
+
+
+class SQLiteCartStore:
+    """Carritos en un archivo SQLite en modo WAL; una conexión por hilo y proceso"""
+
+    VERSION = 2  # PRAGMA user_version
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS cart (id TEXT PRIMARY KEY, updated_at REAL NOT NULL) WITHOUT ROWID',
+        'CREATE INDEX IF NOT EXISTS ix_cart_updated ON cart (updated_at)',
+        # AUTOINCREMENT: un id de línea borrado no vuelve a usarse
+        'CREATE TABLE IF NOT EXISTS cart_line (id INTEGER PRIMARY KEY AUTOINCREMENT, cart_id TEXT NOT NULL, '
+        'product_id INTEGER NOT NULL, quantity INTEGER NOT NULL, UNIQUE (cart_id, product_id))',
+    )
+    ADD = (
+        'INSERT INTO cart_line (cart_id, product_id, quantity) VALUES (?, ?, ?) '
+        'ON CONFLICT (cart_id, product_id) DO UPDATE SET quantity = quantity + excluded.quantity'
+    )
+    TOUCH = (
+        'INSERT INTO cart (id, updated_at) VALUES (?, ?) '
+        'ON CONFLICT (id) DO UPDATE SET updated_at = excluded.updated_at'
+    )
+
+    def __init__(self, path, busy_timeout=5000, **kwargs):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        # El archivo y las tablas se crean con la primera operación, no al arrancar;
+        # tras un fork el proceso hijo abre su propia conexión
+        if getattr(self._local, 'pid', None) != os.getpid():
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout / 1000, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            if conn.execute('PRAGMA user_version').fetchone()[0] < self.VERSION:
+                self._upgrade(conn)
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return self._local.conn
+
+    def _upgrade(self, conn):
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            columns = [row[1] for row in conn.execute('PRAGMA table_info(cart_line)')]
+            if columns and 'id' not in columns:
+                # Versión 1: sin id de línea; las líneas reciben uno nuevo
+                conn.execute('ALTER TABLE cart_line RENAME TO cart_line_v1')
+            for statement in self.SCHEMA:
+                conn.execute(statement)
+            if columns and 'id' not in columns:
+                conn.execute(
+                    'INSERT INTO cart_line (cart_id, product_id, quantity) '
+                    'SELECT cart_id, product_id, quantity FROM cart_line_v1 ORDER BY cart_id, product_id'
+                )
+                conn.execute('DROP TABLE cart_line_v1')
+            conn.execute(f'PRAGMA user_version = {self.VERSION}')
+
+    def _write(self, cart, statement, rows=()):
+        """Ejecutar `statement` con `rows` en una transacción; si cambió alguna línea, marcar
+        el carrito como modificado (y crearlo). Devuelve las filas cambiadas"""
+        if not rows:
+            return 0
+        conn = self._connection()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            changed = conn.executemany(statement, rows).rowcount
+            if changed:
+                conn.execute(self.TOUCH, (cart, time.time()))
+        return changed
+
+    def lines(self, cart):
+        return {product_id: quantity for _, product_id, quantity in self.items(cart)}
+
+    def items(self, cart):
+        return self._connection().execute(
+            'SELECT id, product_id, quantity FROM cart_line WHERE cart_id = ? ORDER BY product_id', (cart,)
+        ).fetchall()
+
+    def add(self, cart, lines):
+        """Sumar unidades: {product_id: cantidad}"""
+        self._write(cart, self.ADD, [(cart, product_id, quantity) for product_id, quantity in lines.items()])
+
+    def add_many(self, carts):
+        """Llenar varios carritos en una sola transacción: {clave: {product_id: cantidad}}"""
+        conn = self._connection()
+        now = time.time()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.executemany(self.ADD, [
+                (cart, product_id, quantity) for cart, lines in carts.items() for product_id, quantity in lines.items()
+            ])
+            conn.executemany(self.TOUCH, [(cart, now) for cart in carts])
+
+    def update(self, cart, quantities):
+        """Cambiar la cantidad de líneas existentes ({id de línea: cantidad}); 0 las elimina
+
+        Devuelve los ids de las líneas eliminadas.
+        """
+        changes = [(quantity, cart, line_id) for line_id, quantity in quantities.items() if quantity]
+        conn = self._connection()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            changed = conn.executemany(
+                'UPDATE cart_line SET quantity = ? WHERE cart_id = ? AND id = ?', changes
+            ).rowcount if changes else 0
+            # Una a una para saber cuáles existían
+            removed = [
+                line_id for line_id, quantity in quantities.items()
+                if not quantity and conn.execute(
+                    'DELETE FROM cart_line WHERE cart_id = ? AND id = ?', (cart, line_id)
+                ).rowcount
+            ]
+            if changed or removed:
+                conn.execute('UPDATE cart SET updated_at = ? WHERE id = ?', (time.time(), cart))
+        return removed
+
+    def remove(self, cart, line_ids):
+        """Eliminar líneas por id; devuelve cuántas había"""
+        return self._write(
+            cart, 'DELETE FROM cart_line WHERE cart_id = ? AND id = ?', [(cart, line_id) for line_id in line_ids]
+        )
+
+    def clear(self, cart):
+        conn = self._connection()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('DELETE FROM cart_line WHERE cart_id = ?', (cart,))
+            conn.execute('DELETE FROM cart WHERE id = ?', (cart,))
+
+    def take(self, cart):
+        """Sacar el carrito entero: devuelve sus líneas (id, product_id, cantidad) y lo borra"""
+        conn = self._connection()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            items = conn.execute(
+                'SELECT id, product_id, quantity FROM cart_line WHERE cart_id = ? ORDER BY product_id', (cart,)
+            ).fetchall()
+            conn.execute('DELETE FROM cart_line WHERE cart_id = ?', (cart,))
+            conn.execute('DELETE FROM cart WHERE id = ?', (cart,))
+        return items
+
+    def restore(self, cart, items):
+        """Devolver líneas (id, product_id, cantidad) con su id, si nadie lo usa ya (una transacción)"""
+        conn = self._connection()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            for line_id, product_id, quantity in items:
+                taken = conn.execute('SELECT 1 FROM cart_line WHERE id = ?', (line_id,)).fetchone()
+                if taken:
+                    conn.execute(self.ADD, (cart, product_id, quantity))
+                else:
+                    conn.execute(
+                        'INSERT INTO cart_line (id, cart_id, product_id, quantity) VALUES (?, ?, ?, ?) '
+                        'ON CONFLICT (cart_id, product_id) DO UPDATE SET quantity = quantity + excluded.quantity',
+                        (line_id, cart, product_id, quantity)
+                    )
+            conn.execute(self.TOUCH, (cart, time.time()))
+
+    def merge(self, source, target):
+        """Sumar el carrito `source` a `target` y borrarlo; las líneas nuevas conservan su id"""
+        conn = self._connection()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            items = conn.execute(
+                'SELECT id, product_id, quantity FROM cart_line WHERE cart_id = ?', (source,)
+            ).fetchall()
+            if not items:
+                return
+            for line_id, product_id, quantity in items:
+                summed = conn.execute(
+                    'UPDATE cart_line SET quantity = quantity + ? WHERE cart_id = ? AND product_id = ?',
+                    (quantity, target, product_id)
+                ).rowcount
+                if summed:
+                    conn.execute('DELETE FROM cart_line WHERE id = ?', (line_id,))
+                else:
+                    conn.execute('UPDATE cart_line SET cart_id = ? WHERE id = ?', (target, line_id))
+            conn.execute('DELETE FROM cart WHERE id = ?', (source,))
+            conn.execute(self.TOUCH, (target, time.time()))
+
+    def expire(self, max_age):
+        """Borrar los carritos sin cambios en `max_age` segundos; devuelve cuántos"""
+        cutoff = time.time() - max_age
+        conn = self._connection()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute(
+                'DELETE FROM cart_line WHERE cart_id IN (SELECT id FROM cart WHERE updated_at < ?)', (cutoff,)
+            )
+            return conn.execute('DELETE FROM cart WHERE updated_at < ?', (cutoff,)).rowcount
+
+    def __len__(self):
+        return self._connection().execute('SELECT count(*) FROM cart').fetchone()[0]
+
+
+BACKENDS = {
+    'memory': MemoryCartStore,
+    'sqlite': SQLiteCartStore,
+}
+
+
+class CartStore:
+    """Extensión de Flask que delega en el backend de la aplicación actual (app.extensions['carts'])"""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('CART_STORE', 'sqlite')
+        app.config.setdefault('CART_STORE_PATH', '')
+        backend = BACKENDS[app.config['CART_STORE']]
+        app.extensions['carts'] = backend(
+            path=app.config['CART_STORE_PATH'] or os.path.join(app.instance_path, 'carts.db'),
+            busy_timeout=app.config.get('SQLITE_BUSY_TIMEOUT', 5000),
+        )
+
+    @property
+    def backend(self):
+        return current_app.extensions['carts']
+
+    def lines(self, cart):
+        """{product_id: cantidad} ordenado por producto; vacío si el carrito no existe"""
+        return self.backend.lines(cart) if cart else {}
+
+    def items(self, cart):
+        """[(id de línea, product_id, cantidad)] ordenado por producto"""
+        return self.backend.items(cart) if cart else []
+
+    def add(self, cart, lines):
+        self.backend.add(cart, lines)
+
+    def add_many(self, carts):
+        self.backend.add_many(carts)
+
+    def update(self, cart, quantities):
+        """Devuelve los ids de las líneas eliminadas (cantidad 0 y que estaban en el carrito)"""
+        return self.backend.update(cart, quantities) if cart else []
+
+    def remove(self, cart, line_ids):
+        return self.backend.remove(cart, line_ids) if cart else 0
+
+    def clear(self, cart):
+        self.backend.clear(cart)
+
+    def take(self, cart):
+        """Líneas del carrito, que queda vacío; solo una de dos llamadas simultáneas las recibe"""
+        return self.backend.take(cart)
+
+    def restore(self, cart, items):
+        self.backend.restore(cart, items)
+
+    def merge(self, source, target):
+        self.backend.merge(source, target)
+
+    def expire(self, max_age):
+        return self.backend.expire(max_age)
+
+    def __len__(self):
+        return len(self.backend)
@@ -0,0 +1,136 @@
+"""
+Configuración de la aplicación
+Cada nivel pisa al anterior:
+  1. DEFAULTS de este módulo
+  2. instance/config.py (lo genera install.py)
+  3. variables de entorno con el mismo nombre (DATABASE_URL, SECRET_KEY, ...)
+
+El pool de conexiones se ajusta según el motor: MySQL (PyMySQL) usa un pool
+con pre_ping y reciclado; SQLite activa WAL y pragmas para concurrencia.
+"""
+
+import os
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+DEFAULT_SECRET_KEY = 'tu_clave_secreta_aqui'
+
+DEFAULTS = {
+    'DEBUG': False,
+    'SECRET_KEY': DEFAULT_SECRET_KEY,
+    'DATABASE_URL': 'sqlite:///tienda.db',
+    # Pool de conexiones (MySQL)
+    'DB_POOL_SIZE': 10,  # Conexiones abiertas por proceso
+    'DB_MAX_OVERFLOW': 10,  # Conexiones extra en picos
+    'DB_POOL_TIMEOUT': 10,  # Segundos esperando una conexión libre
+    'DB_POOL_RECYCLE': 280,  # Reabrir antes de que MySQL/proxy corten las inactivas
+    # SQLite
+    'SQLITE_BUSY_TIMEOUT': 5000,  # ms esperando a que otro proceso suelte el bloqueo
+    'SQLITE_CACHE_SIZE_KB': 20000,
+    'UPLOAD_FOLDER': 'static/uploads',
+    'MAX_CONTENT_LENGTH': 16 * 1024 * 1024,  # 16MB max file size
+    'UPLOAD_MAX_SIZE': 1024 * 1024 * 1024,  # 1GB por archivo en subidas por partes
+    'UPLOAD_CHUNK_SIZE': 4 * 1024 * 1024,  # Tamaño de parte sugerido al cliente
+    'PAGINATION_MAX_PAGE': 10,  # Páginas por número; después, cursores
+    'STATS_REFRESH_INTERVAL': 3600,  # Segundos entre recálculos completos del panel
+    'CACHE_TYPE': 'memory',  # 'filesystem' para compartir la caché entre workers
+    'PAGE_CACHE_TIMEOUT': 60,  # Segundos que una página anónima se sirve sin regenerar; 0 la desactiva
+    'PAGE_CACHE_STALE': 300,  # Segundos extra sirviendo la copia vieja mientras se regenera
+    'TASK_WORKERS': 2,
+    # Cola de trabajos persistente (ver jobs.py)
+    'JOB_WORKERS': 2,  # Hilos del worker
+    'JOBS_EMBEDDED': True,  # Worker dentro de cada proceso web; False si corre python jobs.py work
+    'JOBS_POLL_INTERVAL': 1.0,  # Segundos entre consultas a la cola vacía
+    'JOBS_RETRY_DELAY': 30,  # Segundos antes del primer reintento; se duplica en cada uno
+    'JOBS_TIMEOUT': 600,  # Segundos tras los que un trabajo en marcha se da por colgado
+    'JOBS_KEEP_DAYS': 7,  # Días que se guardan los trabajos terminados
+    # Carritos (ver carts.py): fuera de la base principal hasta el pago
+    'CART_STORE': 'sqlite',  # 'memory' para pruebas con un solo proceso
+    'CART_STORE_PATH': '',  # Archivo SQLite de los carritos; vacío: instance/carts.db
+    'CART_MAX_AGE_DAYS': 30,  # Días sin cambios tras los que cleanup_carts borra un carrito
+    'CART_CLEANUP_INTERVAL': 86400,
+    # Correo (ver mail.py); sin servidor los mensajes van al log
+    'MAIL_SERVER': '',
+    'MAIL_PORT': 587,
+    'MAIL_USERNAME': '',
+    'MAIL_PASSWORD': '',
+    'MAIL_USE_TLS': True,
+    'MAIL_FROM': 'tienda@localhost',
+    # Hash de contraseñas (ver passwords.py); al cambiarlo se recalculan al iniciar sesión
+    'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:600000',  # O 'scrypt:32768:8:1'
+    'METRICS_ENABLED': True,
+    'METRICS_SERVER_TIMING': False,  # Cabecera Server-Timing en cada respuesta
+    'METRICS_TOKEN': '',  # Token Bearer para /metrics; sin él, /metrics da 404 (salvo en DEBUG)
+}
+
+
+def _convert(value, default):
+    """Texto de una variable de entorno al tipo del valor por defecto"""
+    if isinstance(default, bool):
+        return value.strip().lower() in ('1', 'true', 'yes', 'on', 'si', 'sí')
+    if isinstance(default, int):
+        return int(value)
+    if isinstance(default, float):
+        return float(value)
+    return value
+
+
+def database_uri(url):
+    """mysql:// se conecta con PyMySQL, que es el driver de requirements.txt"""
+    if url.startswith('mysql://'):
+        return 'mysql+pymysql://' + url[len('mysql://'):]
+    return url
+
+
+def engine_options(config):
+    """SQLALCHEMY_ENGINE_OPTIONS según el motor de la URL"""
+    backend = make_url(config['SQLALCHEMY_DATABASE_URI']).get_backend_name()
+    if backend == 'mysql':
+        return {
+            'pool_size': config['DB_POOL_SIZE'],
+            'max_overflow': config['DB_MAX_OVERFLOW'],
+            'pool_timeout': config['DB_POOL_TIMEOUT'],
+            'pool_recycle': config['DB_POOL_RECYCLE'],
+            'pool_pre_ping': True,  # Descartar conexiones cortadas por el servidor
+        }
+    if backend == 'sqlite':
+        return {'connect_args': {'timeout': config['SQLITE_BUSY_TIMEOUT'] / 1000}}
+    return {'pool_pre_ping': True}
+
+
+def load(app, overrides=None):
+    """Cargar la configuración en `app` (ver el orden al inicio del módulo)"""
+    app.config.update(DEFAULTS)
+    app.config.from_pyfile('config.py', silent=True)
+    for name, default in DEFAULTS.items():
+        if name in os.environ:
+            app.config[name] = _convert(os.environ[name], default)
+    app.config.update(overrides or {})
+    # Ruta absoluta una sola vez: subidas, derivados y lo que se sirve usan el
+    # mismo árbol aunque el proceso arranque desde otra carpeta
+    app.config['UPLOAD_FOLDER'] = os.path.join(app.root_path, app.config['UPLOAD_FOLDER'])
+
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri(app.config['DATABASE_URL'])
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config))
+
+    if not app.debug and not app.testing and app.config['SECRET_KEY'] == DEFAULT_SECRET_KEY:
+        app.logger.warning('SECRET_KEY es la de ejemplo; defínela en el entorno o en instance/config.py')
+
+
+def configure_engine(engine, config):
+    """Pragmas de SQLite en cada conexión nueva (WAL, sincronización, caché)"""
+    if engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def _sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if engine.url.database not in (None, '', ':memory:'):
+            # Lectores y escritor en paralelo; NORMAL es seguro con WAL
+            cursor.execute('PRAGMA journal_mode=WAL')
+            cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.execute(f"PRAGMA busy_timeout={int(config['SQLITE_BUSY_TIMEOUT'])}")
+        cursor.execute(f"PRAGMA cache_size=-{int(config['SQLITE_CACHE_SIZE_KB'])}")
+        cursor.execute('PRAGMA temp_store=MEMORY')
+        cursor.close()
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Generador de datos sintéticos para pruebas de rendimiento
+Llena la base configurada (DATABASE_URL) con usuarios, productos, carritos,
+pedidos con sus líneas y archivos subidos, con inserciones masivas por
+lotes y una semilla fija: la misma escala produce siempre los mismos datos.
+Los carritos van al almacén de carritos (CART_STORE), no a la base. Al
+terminar recalcula las estadísticas del panel.
+
+La base tiene que estar vacía (o usar --reset para vaciarla). El usuario 1
+es admin / admin123 y el resto cliente<N> / cliente123.
+
+Escalas (usuarios, productos, carritos, pedidos, archivos):
+  small    1.000       5.000     200      20.000     100
+  medium   10.000      100.000   2.000    500.000    1.000
+  large    100.000     1.000.000 20.000   10.000.000 10.000
+
+Uso: python datagen.py [escala] [--users N] [--products N] [--carts N]
+                       [--orders N] [--files N] [--seed N] [--reset]
+"""
+
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import func, insert, select
+from werkzeug.security import generate_password_hash
+
+SCALES = {
+    'small': {'users': 1000, 'products': 5000, 'carts': 200, 'orders': 20000, 'files': 100},
+    'medium': {'users': 10000, 'products': 100000, 'carts': 2000, 'orders': 500000, 'files': 1000},
+    'large': {'users': 100000, 'products': 1000000, 'carts': 20000, 'orders': 10000000, 'files': 10000},
+}
+BATCH_SIZE = 10000
+DAYS = 365
+
+CATEGORIES = [
+    'Periféricos', 'Componentes', 'Audio', 'Monitores', 'Almacenamiento',
+    'Redes', 'Impresión', 'Portátiles', 'Gaming', 'Accesorios',
+]
+WORDS = [
+    'teclado', 'mecánico', 'monitor', 'ratón', 'inalámbrico', 'portátil', 'batería',
+    'cargador', 'cable', 'auriculares', 'micrófono', 'cámara', 'impresora', 'tóner',
+    'disco', 'sólido', 'memoria', 'gráfica', 'placa', 'fuente', 'router', 'switch',
+]
+# Pesos aproximados de una tienda con historial: casi todo entregado
+STATUSES = ['completed', 'shipped', 'processing', 'pending', 'cancelled']
+STATUS_WEIGHTS = [70, 10, 5, 10, 5]
+
+
+def batches(rows, size=BATCH_SIZE):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def bulk_insert(engine, table, rows, label, total=None):
+    """Insertar `rows` (un generador) por lotes, una transacción por lote"""
+    started = time.perf_counter()
+    done = 0
+    for batch in batches(rows):
+        with engine.begin() as conn:
+            conn.execute(insert(table), batch)
+        done += len(batch)
+        print(f"\r   {label:<12} {done:>12,}" + (f" / {total:,}" if total else ''), end='', flush=True)
+    elapsed = time.perf_counter() - started
+    rate = done / elapsed if elapsed else 0
+    print(f"\r   {label:<12} {done:>12,} filas en {elapsed:.1f}s ({rate:,.0f} filas/s)")
+
+
+def users(count, now):
+    admin_hash = generate_password_hash('admin123')
+    client_hash = generate_password_hash('cliente123')  # Un solo hash: calcularlo por fila llevaría horas
+    yield {
+        'username': 'admin', 'email': 'admin@tienda.com', 'password_hash': admin_hash,
+        'is_admin': True, 'created_at': now - timedelta(days=DAYS),
+    }
+    for i in range(2, count + 1):
+        yield {
+            'username': f'cliente{i}', 'email': f'cliente{i}@tienda.com', 'password_hash': client_hash,
+            'is_admin': False, 'created_at': now - timedelta(seconds=(count - i) * DAYS * 86400 // count),
+        }
+
+
+def products(count, rng, now, catalog):
+    """Productos; `catalog` recibe (nombre, precio) de cada uno para los pedidos"""
+    for i in range(1, count + 1):
+        price = round(rng.lognormvariate(3.5, 1.0), 2) + 1
+        name = f"{' '.join(rng.sample(WORDS, 3)).capitalize()} {i}"
+        catalog.append((name, price))
+        yield {
+            'name': name,
+            'description': f"{' '.join(rng.choices(WORDS, k=12))}.",
+            'sku': f'SKU-{i:08d}',
+            'price': price,
+            'stock': 0 if rng.random() < 0.1 else rng.randint(1, 500),
+            'category': rng.choice(CATEGORIES),
+            'is_active': rng.random() > 0.05,
+            'created_at': now - timedelta(seconds=(count - i) * DAYS * 86400 // count),
+            'updated_at': now,
+        }
+
+
+def cart_lines(count, users_count, products_count, rng):
+    """(user_id, {product_id: cantidad}) de cada carrito"""
+    for user_id in rng.sample(range(2, users_count + 1), min(count, users_count - 1)):
+        product_ids = rng.sample(range(1, products_count + 1), rng.randint(1, min(5, products_count)))
+        yield user_id, {product_id: rng.randint(1, 3) for product_id in product_ids}
+
+
+def fill_carts(cart_store, carts):
+    """Llenar el almacén de carritos por lotes, una transacción por lote"""
+    started = time.perf_counter()
+    done = 0
+    for batch in batches(carts):
+        cart_store.add_many({f'user:{user_id}': lines for user_id, lines in batch})
+        done += len(batch)
+        print(f"\r   {'carritos':<12} {done:>12,}", end='', flush=True)
+    elapsed = time.perf_counter() - started
+    print(f"\r   {'carritos':<12} {done:>12,} carritos en {elapsed:.1f}s")
+
+
+def orders_and_items(count, users_count, catalog, rng, now, order_rows, item_rows):
+    """Pedidos con sus líneas; `order_rows` e `item_rows` reciben las filas de cada lote"""
+    start = now - timedelta(days=DAYS)
+    for order_id in range(1, count + 1):
+        total = 0.0
+        for product_id in rng.sample(range(1, len(catalog) + 1), rng.randint(1, min(4, len(catalog)))):
+            name, price = catalog[product_id - 1]
+            quantity = rng.randint(1, 3)
+            total += price * quantity
+            item_rows.append({
+                'order_id': order_id, 'product_id': product_id, 'product_name': name,
+                'unit_price': price, 'quantity': quantity,
+            })
+        order_rows.append({
+            'user_id': rng.randint(1, users_count),
+            'total': round(total, 2),
+            'status': rng.choices(STATUSES, STATUS_WEIGHTS)[0],
+            'created_at': start + timedelta(seconds=order_id * DAYS * 86400 // count),
+        })
+        yield order_id
+
+
+def uploads(count, rng, now):
+    for i in range(1, count + 1):
+        image = rng.random() < 0.8
+        yield {
+            'filename': f'{i:016x}_{"imagen" if image else "precios"}_{i}.{"jpg" if image else "csv"}',
+            'original_filename': f'{"imagen" if image else "precios"}_{i}.{"jpg" if image else "csv"}',
+            'file_type': 'product_image' if image else 'price_list',
+            'uploaded_by': 1,
+            'uploaded_at': now - timedelta(seconds=(count - i) * 3600),
+            'status': 'ready',
+            'size': rng.randint(10_000, 5_000_000),
+        }
+
+
+def generate(engine, metadata, cart_store, sizes, seed=42):
+    rng = random.Random(seed)
+    now = datetime(2024, 1, 1)  # Fecha fija para que los datos sean reproducibles
+    tables = metadata.tables
+
+    print(f"📦 Generando datos (semilla {seed})")
+    bulk_insert(engine, tables['user'], users(sizes['users'], now), 'usuarios', sizes['users'])
+    catalog = []
+    bulk_insert(engine, tables['product'], products(sizes['products'], rng, now, catalog), 'productos', sizes['products'])
+    fill_carts(cart_store, cart_lines(sizes['carts'], sizes['users'], sizes['products'], rng))
+
+    # Pedidos y líneas en la misma transacción por lote; los ids son consecutivos
+    # porque la tabla está vacía
+    started = time.perf_counter()
+    order_rows, item_rows = [], []
+    done = 0
+    for batch in batches(orders_and_items(sizes['orders'], sizes['users'], catalog, rng, now, order_rows, item_rows)):
+        with engine.begin() as conn:
+            conn.execute(insert(tables['order']), order_rows)
+            conn.execute(insert(tables['order_item']), item_rows)
+        done += len(batch)
+        order_rows.clear()
+        item_rows.clear()
+        print(f"\r   {'pedidos':<12} {done:>12,} / {sizes['orders']:,}", end='', flush=True)
+    elapsed = time.perf_counter() - started
+    print(f"\r   {'pedidos':<12} {done:>12,} filas en {elapsed:.1f}s ({done / elapsed if elapsed else 0:,.0f} filas/s)")
+
+    bulk_insert(engine, tables['file_upload'], uploads(sizes['files'], rng, now), 'archivos', sizes['files'])
+
+
+def option(name, default):
+    if name in sys.argv:
+        return int(sys.argv[sys.argv.index(name) + 1])
+    return default
+
+
+def main():
+    args = [arg for i, arg in enumerate(sys.argv[1:], start=1)
+            if not arg.startswith('--') and not sys.argv[i - 1].startswith('--')]
+    scale = args[0].lower() if args else 'small'
+    if scale not in SCALES:
+        print(f"❌ Escala desconocida: {scale} (usa {', '.join(SCALES)})")
+        sys.exit(1)
+    sizes = {name: option(f'--{name}', value) for name, value in SCALES[scale].items()}
+    sizes['users'] = max(sizes['users'], 2)
+    sizes['products'] = max(sizes['products'], 1)
+
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    from app import app, db, cart_store
+    import facets
+    import migrations
+    import search
+    import stats
+
+    with app.app_context():
+        if '--reset' in sys.argv:
+            db.drop_all()
+            with db.engine.begin() as conn:
+                for table in (migrations.schema_version.name, search.FTS_TABLE):
+                    conn.exec_driver_sql(f'DROP TABLE IF EXISTS {table}')
+            cart_store.expire(0)  # Todos los carritos del almacén
+        migrations.upgrade(db.engine, db.metadata)
+
+        with db.engine.connect() as conn:
+            existing = conn.execute(select(func.count()).select_from(db.metadata.tables['user'])).scalar()
+        if existing:
+            print(f"❌ La base ya tiene {existing} usuarios; usa --reset para vaciarla")
+            sys.exit(1)
+
+        started = time.perf_counter()
+        generate(db.engine, db.metadata, cart_store, sizes, seed=option('--seed', 42))
+        stats.refresh(db.engine, db.metadata)
+        facets.refresh(db.engine, db.metadata)
+        print(f"✅ Datos generados en {time.perf_counter() - started:.1f}s ({db.engine.url.render_as_string()})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Exportación de pedidos, líneas de pedido, productos y usuarios
+Las filas se leen con un cursor del servidor (yield_per) y se escriben por
+lotes en un generador, así la memoria no depende del número de filas: sirve
+igual para un mes que para millones de pedidos. Formatos CSV o JSONL, con
+gzip opcional (también en streaming).
+
+Filtros: rango de fechas [desde, hasta) sobre la fecha de creación y estado
+(pedidos: pending, completed...; productos: active/inactive; usuarios:
+admin/customer).
+
+Uso: python exports.py [orders|order_items|products|users] [--since AAAA-MM-DD]
+         [--until AAAA-MM-DD] [--status a,b] [--format csv|jsonl] [--gzip] [-o archivo]
+"""
+
+import csv
+import io
+import json
+import os
+import sys
+import time
+import zlib
+from datetime import date, datetime
+from sqlalchemy import select
+
+YIELD_PER = 2000  # Filas por lote leído del cursor y escrito en la salida
+FORMATS = {'csv': 'text/csv', 'jsonl': 'application/x-ndjson'}
+
+
+def _orders(tables):
+    order, user = tables['order'], tables['user']
+    query = (
+        select(order.c.id, order.c.created_at, order.c.status, order.c.user_id,
+               user.c.username, user.c.email, order.c.total)
+        .select_from(order.outerjoin(user, user.c.id == order.c.user_id))
+        .order_by(order.c.created_at, order.c.id)
+    )
+    return query, order.c.created_at, lambda statuses: order.c.status.in_(statuses)
+
+
+def _order_items(tables):
+    order, item = tables['order'], tables['order_item']
+    query = (
+        select(item.c.order_id, order.c.created_at, order.c.status, item.c.product_id, item.c.product_name,
+               item.c.quantity, item.c.unit_price, (item.c.quantity * item.c.unit_price).label('subtotal'))
+        .select_from(order.join(item, item.c.order_id == order.c.id))
+        .order_by(order.c.created_at, order.c.id)
+    )
+    return query, order.c.created_at, lambda statuses: order.c.status.in_(statuses)
+
+
+def _products(tables):
+    product = tables['product'].c
+    query = (
+        select(product.id, product.sku, product.name, product.category, product.price, product.stock,
+               product.is_active, product.created_at, product.updated_at)
+        .order_by(product.id)
+    )
+    return query, product.created_at, _flag(product.is_active, 'active', 'inactive')
+
+
+def _users(tables):
+    user = tables['user'].c
+    query = select(user.id, user.username, user.email, user.is_admin, user.created_at).order_by(user.id)
+    return query, user.created_at, _flag(user.is_admin, 'admin', 'customer')
+
+
+def _flag(column, yes, no):
+    """Filtro de estado sobre una columna booleana"""
+    def condition(statuses):
+        unknown = set(statuses) - {yes, no}
+        if unknown:
+            raise ValueError(f"Estado desconocido: {', '.join(sorted(unknown))} (usa {yes} o {no})")
+        return column.in_([status == yes for status in statuses])
+    return condition
+
+
+DATASETS = {
+    'orders': _orders,
+    'order_items': _order_items,
+    'products': _products,
+    'users': _users,
+}
+
+
+def parse_date(value):
+    """AAAA-MM-DD (o fecha y hora ISO) a datetime; None si viene vacío"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'Fecha inválida: {value} (usa AAAA-MM-DD)')
+
+
+def parse_statuses(*values):
+    """Estados de una o varias listas separadas por comas ('a,b', 'c')"""
+    return [status.strip() for value in values if value for status in value.split(',') if status.strip()]
+
+
+def build_query(metadata, dataset, since=None, until=None, statuses=()):
+    if dataset not in DATASETS:
+        raise ValueError(f"Exportación desconocida: {dataset} (usa {', '.join(DATASETS)})")
+    query, date_column, status_filter = DATASETS[dataset](metadata.tables)
+    if since is not None:
+        query = query.where(date_column >= since)
+    if until is not None:
+        query = query.where(date_column < until)
+    if statuses:
+        query = query.where(status_filter(list(statuses)))
+    return query
+
+
+def _value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _csv(columns, batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for rows in batches:
+        writer.writerows([_value(value) for value in row] for row in rows)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def _jsonl(columns, batches):
+    for rows in batches:
+        yield ''.join(
+            json.dumps(dict(zip(columns, row)), default=_value, ensure_ascii=False) + '\n' for row in rows
+        ).encode('utf-8')
+
+
+def gzipped(chunks, level=6):
+    """Comprimir un flujo de bytes a gzip sin tenerlo entero en memoria"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # 31: cabecera gzip
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def _generate(engine, query, fmt):
+    with engine.connect() as conn:
+        result = conn.execution_options(yield_per=YIELD_PER).execute(query)
+        columns = list(result.keys())
+        writer = _csv if fmt == 'csv' else _jsonl
+        yield from writer(columns, result.partitions())
+
+
+def export(engine, metadata, dataset, fmt='csv', compress=False, since=None, until=None, statuses=()):
+    """Generador de bytes con la exportación
+
+    Los errores de parámetros (ValueError) saltan al llamar, antes de
+    empezar a enviar nada.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Formato desconocido: {fmt} (usa {', '.join(FORMATS)})")
+    query = build_query(metadata, dataset, since, until, statuses)
+    chunks = _generate(engine, query, fmt)
+    return gzipped(chunks) if compress else chunks
+
+
+def filename(dataset, fmt, compress=False, since=None, until=None):
+    parts = [dataset] + [value.strftime('%Y%m%d') for value in (since, until) if value is not None]
+    return '_'.join(parts) + f'.{fmt}' + ('.gz' if compress else '')
+
+
+def mimetype(fmt, compress=False):
+    return 'application/gzip' if compress else FORMATS[fmt]
+
+
+def option(name, default=None):
+    if name in sys.argv:
+        return sys.argv[sys.argv.index(name) + 1]
+    return default
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in DATASETS:
+        print(f"Uso: python exports.py [{'|'.join(DATASETS)}] [--since AAAA-MM-DD] [--until AAAA-MM-DD]")
+        print("         [--status a,b] [--format csv|jsonl] [--gzip] [-o archivo]")
+        return
+
+    dataset = sys.argv[1]
+    fmt = option('--format', 'csv')
+    compress = '--gzip' in sys.argv
+    output = option('-o')
+    try:
+        since, until = parse_date(option('--since')), parse_date(option('--until'))
+        statuses = parse_statuses(option('--status'))
+    except ValueError as error:
+        print(f"❌ {error}", file=sys.stderr)
+        sys.exit(1)
+
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    from app import app, db
+
+    with app.app_context():
+        try:
+            chunks = export(db.engine, db.metadata, dataset, fmt, compress, since, until, statuses)
+        except ValueError as error:
+            print(f"❌ {error}", file=sys.stderr)
+            sys.exit(1)
+
+        started = time.perf_counter()
+        written = 0
+        target = open(output, 'wb') if output else sys.stdout.buffer
+        try:
+            for chunk in chunks:
+                target.write(chunk)
+                written += len(chunk)
+        finally:
+            if output:
+                target.close()
+
+    if output:
+        print(f"✅ {output}: {written / 1024 / 1024:.1f} MB en {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
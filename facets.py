@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Navegación por facetas del catálogo
+La tabla product_facet guarda cuántos productos activos hay en cada celda
+(categoría, rango de precio, con stock). Son pocas filas, así que los
+conteos de cualquier combinación de filtros se suman en Python sin recorrer
+el catálogo. Las rutas de administración y el pago mueven el producto de
+celda con `move`; `refresh` la recalcula entera tras cambios masivos.
+
+Uso: python facets.py refresh
+"""
+
+import os
+import sys
+from sqlalchemy import select, insert, delete, func, case, and_
+
+import stats
+
+# (clave, mínimo, máximo); el máximo no se incluye y None es sin límite
+PRICE_RANGES = [
+    ('0-25', 0, 25),
+    ('25-50', 25, 50),
+    ('50-100', 50, 100),
+    ('100-250', 100, 250),
+    ('250-500', 250, 500),
+    ('500-1000', 500, 1000),
+    ('1000-', 1000, None),
+]
+PRICE_LABELS = {
+    key: f'${low:g} - ${high:g}' if high is not None else f'Más de ${low:g}'
+    for key, low, high in PRICE_RANGES
+}
+SORTS = {
+    '': 'Más antiguos',
+    'newest': 'Más nuevos',
+    'price_asc': 'Precio: menor a mayor',
+    'price_desc': 'Precio: mayor a menor',
+}
+
+
+def price_band(price):
+    for key, low, high in PRICE_RANGES:
+        if high is None or price < high:
+            return key
+    return PRICE_RANGES[-1][0]
+
+
+def price_band_sql(column):
+    return case(
+        *[(column < high, key) for key, low, high in PRICE_RANGES if high is not None],
+        else_=PRICE_RANGES[-1][0]
+    )
+
+
+def price_filter(column, bands):
+    """Condición SQL para uno o más rangos de precio"""
+    conditions = []
+    for key, low, high in PRICE_RANGES:
+        if key in bands:
+            conditions.append(column >= low if high is None else and_(column >= low, column < high))
+    return conditions
+
+
+def cell(category, price, stock, is_active=True):
+    """Celda de un producto, o None si no cuenta (inactivo)"""
+    if is_active is False:
+        return None
+    return (category or '', price_band(price or 0), (stock or 0) > 0)
+
+
+def move(conn, metadata, *changes):
+    """Aplicar cambios (celda anterior, celda nueva) en un solo statement
+
+    Cualquiera de las dos puede ser None (producto nuevo, desactivado...).
+    """
+    moves = {}
+    for old, new in changes:
+        for key, amount in ((old, -1), (new, 1)):
+            if key is not None:
+                moves[key] = moves.get(key, 0) + amount
+    rows = [
+        {'category': category, 'price_band': band, 'in_stock': in_stock, 'products': amount}
+        for (category, band, in_stock), amount in moves.items() if amount
+    ]
+    if rows:
+        stats.upsert_add(conn, metadata.tables['product_facet'], rows,
+                         ['category', 'price_band', 'in_stock'], ['products'])
+    return bool(rows)
+
+
+def refresh(engine, metadata):
+    """Recalcular la tabla a partir del catálogo, en una transacción"""
+    facet = metadata.tables['product_facet']
+    product = metadata.tables['product'].c
+    band = price_band_sql(product.price)
+    category = func.coalesce(product.category, '')
+    in_stock = product.stock > 0
+    with engine.begin() as conn:
+        conn.execute(delete(facet))
+        conn.execute(insert(facet).from_select(
+            ['category', 'price_band', 'in_stock', 'products'],
+            select(category, band, in_stock, func.count())
+            .where(product.is_active.is_(True))
+            .group_by(category, band, in_stock)
+        ))
+
+
+def read(conn, metadata):
+    """Todas las celdas con productos: [(categoría, rango, con_stock, productos)]"""
+    facet = metadata.tables['product_facet'].c
+    return [
+        (category, band, bool(in_stock), products)
+        for category, band, in_stock, products in conn.execute(
+            select(facet.category, facet.price_band, facet.in_stock, facet.products)
+            .where(facet.products > 0)
+        )
+    ]
+
+
+def counts(cells, categories=(), bands=(), in_stock=False):
+    """Conteos de cada faceta con los filtros de las demás, y el total filtrado
+
+    El conteo de una categoría no depende de las otras categorías elegidas
+    (lo mismo con los precios), así se puede seguir sumando opciones.
+    """
+    by_category, by_band = {}, {}
+    stocked = total = 0
+    for category, band, has_stock, products in cells:
+        stock_ok = has_stock or not in_stock
+        category_ok = not categories or category in categories
+        band_ok = not bands or band in bands
+        if band_ok and stock_ok:
+            by_category[category] = by_category.get(category, 0) + products
+        if category_ok and stock_ok:
+            by_band[band] = by_band.get(band, 0) + products
+        if category_ok and band_ok:
+            if has_stock:
+                stocked += products
+            if stock_ok:
+                total += products
+    for category in categories:
+        by_category.setdefault(category, 0)  # Las elegidas se muestran aunque queden en cero
+    return {
+        'categories': sorted((name, count) for name, count in by_category.items() if name),
+        'prices': [(key, PRICE_LABELS[key], by_band.get(key, 0)) for key, low, high in PRICE_RANGES],
+        'in_stock': stocked,
+        'total': total,
+    }
+
+
+def main():
+    command = sys.argv[1].lower() if len(sys.argv) > 1 else 'help'
+    if command != 'refresh':
+        print("Uso: python facets.py refresh")
+        return
+
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    from app import app, db, cache
+
+    with app.app_context():
+        refresh(db.engine, db.metadata)
+        with db.engine.connect() as conn:
+            cells = read(conn, db.metadata)
+        cache.delete('facets')
+    print(f"✅ Facetas recalculadas: {len(cells)} celdas, {sum(cell[3] for cell in cells)} productos activos")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Derivados de las imágenes de producto
+Por cada imagen se generan miniaturas de ancho fijo en JPEG, WebP y AVIF
+(según lo que soporte Pillow) con nombre direccionado por contenido, más un
+manifiesto JSON con las variantes que usan las plantillas para el srcset.
+Como el nombre cambia si cambia el contenido, se sirven con caché inmutable.
+
+Uso: python images.py backfill [procesos]
+"""
+
+import hashlib
+import json
+import os
+import sys
+import tempfile
+from importlib.util import find_spec
+from concurrent.futures import ProcessPoolExecutor
+from markupsafe import Markup
+
+WIDTHS = (160, 320, 640, 1280)
+QUALITY = {'avif': 60, 'webp': 80, 'jpeg': 82}
+EXTENSIONS = {'avif': 'avif', 'webp': 'webp', 'jpeg': 'jpg'}
+MIME_TYPES = {'avif': 'image/avif', 'webp': 'image/webp', 'jpeg': 'image/jpeg'}
+VERSION = 1  # Subir si cambian anchos o calidades: todos los nombres cambian
+MAX_AGE = 365 * 24 * 3600
+DERIVED_DIR = 'derived'
+
+
+def available():
+    """Pillow es opcional: sin él se sirve la imagen original"""
+    # Se importa al generar la primera imagen, no al arrancar la aplicación
+    return find_spec('PIL') is not None
+
+
+def formats():
+    """Formatos que puede escribir esta instalación, de más a menos eficiente"""
+    if not available():
+        return ()
+    from PIL import Image
+    Image.init()
+    return tuple(fmt for fmt in ('avif', 'webp', 'jpeg') if fmt.upper() in Image.SAVE)
+
+
+def derived_dir(root):
+    return os.path.join(root, DERIVED_DIR)
+
+
+def manifest_path(root, image):
+    name = hashlib.sha1(image.encode()).hexdigest()
+    return os.path.join(derived_dir(root), 'manifests', f'{name}.json')
+
+
+def load_manifest(root, image):
+    """Manifiesto de una imagen, o None si aún no tiene derivados"""
+    try:
+        with open(manifest_path(root, image)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def content_key(path):
+    """Prefijo de los nombres: hash del contenido y de la versión del pipeline"""
+    hasher = hashlib.sha256(f'v{VERSION}:'.encode())
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(64 * 1024), b''):
+            hasher.update(block)
+    return hasher.hexdigest()[:20]
+
+
+def _atomic_write(directory, target, write):
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+        os.replace(tmp, target)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+
+def _save(image, fmt, f):
+    if fmt == 'jpeg' and image.mode not in ('RGB', 'L'):
+        # JPEG no tiene transparencia: aplanar sobre blanco
+        from PIL import Image
+        background = Image.new('RGB', image.size, 'white')
+        rgba = image.convert('RGBA')
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        image = background
+    image.save(f, format=fmt.upper(), quality=QUALITY[fmt], optimize=fmt == 'jpeg')
+
+
+def generate(root, image):
+    """Generar los derivados que falten de `image` (ruta dentro de root)
+
+    Idempotente: si el manifiesto corresponde al contenido actual no hace
+    nada. Devuelve el manifiesto.
+    """
+    source = os.path.join(root, image)
+    key = content_key(source)
+    manifest = load_manifest(root, image)
+    if manifest and manifest['key'] == key:
+        return manifest
+
+    from PIL import Image, ImageOps
+    out_dir = derived_dir(root)
+    os.makedirs(os.path.join(out_dir, 'manifests'), exist_ok=True)
+
+    with Image.open(source) as original:
+        original = ImageOps.exif_transpose(original)
+        width, height = original.size
+        widths = [w for w in WIDTHS if w < width] + [min(width, WIDTHS[-1])]
+
+        variants = {fmt: [] for fmt in formats()}
+        for w in widths:
+            resized = original.resize((w, max(1, round(height * w / width))), Image.LANCZOS)
+            for fmt in variants:
+                name = f'{key}-{w}.{EXTENSIONS[fmt]}'
+                target = os.path.join(out_dir, name)
+                if not os.path.exists(target):
+                    _atomic_write(out_dir, target, lambda f: _save(resized, fmt, f))
+                variants[fmt].append([w, name])
+
+    manifest = {'key': key, 'width': width, 'height': height, 'variants': variants}
+    _atomic_write(
+        os.path.join(out_dir, 'manifests'), manifest_path(root, image),
+        lambda f: f.write(json.dumps(manifest).encode())
+    )
+    return manifest
+
+
+def picture(manifest, variant_url, original_url, alt, sizes, class_=None):
+    """Etiqueta <picture> con un <source> por formato y <img> JPEG de respaldo"""
+    if not manifest or not manifest['variants'].get('jpeg'):
+        return Markup('<img src="{}" alt="{}"{} loading="lazy" decoding="async">').format(
+            original_url, alt, Markup(' class="{}"').format(class_) if class_ else ''
+        )
+
+    def srcset(fmt):
+        return ', '.join(f'{variant_url(name)} {w}w' for w, name in manifest['variants'][fmt])
+
+    sources = Markup('').join(
+        Markup('<source type="{}" srcset="{}" sizes="{}">').format(MIME_TYPES[fmt], srcset(fmt), sizes)
+        for fmt in manifest['variants'] if fmt != 'jpeg'
+    )
+    jpeg = manifest['variants']['jpeg']
+    fallback = next((name for w, name in jpeg if w >= 640), jpeg[-1][1])
+    return Markup(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}" alt="{}"{} '
+        'loading="lazy" decoding="async"></picture>'
+    ).format(
+        sources, variant_url(fallback), srcset('jpeg'), sizes,
+        manifest['width'], manifest['height'], alt,
+        Markup(' class="{}"').format(class_) if class_ else ''
+    )
+
+
+def _backfill_one(args):
+    root, image = args
+    try:
+        generate(root, image)
+        return image, None
+    except OSError as e:
+        return image, str(e)
+
+
+def backfill(root, workers=None):
+    """Generar los derivados de todas las imágenes en products/; devuelve (generadas, errores)"""
+    products = os.path.join(root, 'products')
+    jobs = [
+        (root, f'products/{name}') for name in sorted(os.listdir(products))
+        if not name.endswith('.part')
+    ] if os.path.isdir(products) else []
+
+    done, failed = [], []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for image, error in pool.map(_backfill_one, jobs, chunksize=8):
+            if error:
+                failed.append((image, error))
+            else:
+                done.append(image)
+    return done, failed
+
+
+def main():
+    command = sys.argv[1].lower() if len(sys.argv) > 1 else 'help'
+    if command != 'backfill':
+        print("Uso: python images.py backfill [procesos]")
+        return
+    if not available():
+        print("❌ Falta Pillow: pip install Pillow")
+        sys.exit(1)
+
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    from app import app, refresh_images
+
+    done, failed = backfill(app.config['UPLOAD_FOLDER'], workers)
+    with app.app_context():
+        refresh_images(done)
+    print(f"✅ {len(done)} imágenes con derivados ({', '.join(formats())})")
+    for image, error in failed:
+        print(f"❌ {image}: {error}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -5,10 +5,9 @@ Este script ayuda a configurar la aplicación automáticamente
 """
 
 import os
+import secrets
 import sys
 import subprocess
-import mysql.connector
-from mysql.connector import Error
 
 def install_requirements():
     """Instala las dependencias de Python"""
@@ -23,62 +22,67 @@ def install_requirements():
 
 def test_mysql_connection(host, user, password, database):
     """Prueba la conexión a MySQL"""
+    # PyMySQL (el driver de requirements.txt) se importa aquí: install_requirements lo instala antes
+    import pymysql
     try:
-        connection = mysql.connector.connect(
+        connection = pymysql.connect(
             host=host,
             user=user,
             password=password,
             database=database
         )
-        if connection.is_connected():
+        if connection.open:
             print("✅ Conexión a MySQL exitosa")
             connection.close()
             return True
-    except Error as e:
+    except pymysql.MySQLError as e:
         print(f"❌ Error de conexión a MySQL: {e}")
         return False
     return False
 
 def create_database(host, user, password, database_name):
     """Crea la base de datos si no existe"""
+    import pymysql
     try:
-        connection = mysql.connector.connect(
+        connection = pymysql.connect(
             host=host,
             user=user,
             password=password
         )
         cursor = connection.cursor()
-        cursor.execute(f"CREATE DATABASE IF NOT EXISTS {database_name}")
+        cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{database_name.replace('`', '``')}`")
         print(f"✅ Base de datos '{database_name}' creada/verificada")
         cursor.close()
         connection.close()
         return True
-    except Error as e:
+    except pymysql.MySQLError as e:
         print(f"❌ Error al crear base de datos: {e}")
         return False
 
-def update_app_config(host, user, password, database):
-    """Actualiza la configuración en app.py"""
-    config_line = f"app.config['SQLALCHEMY_DATABASE_URI'] = 'mysql://{user}:{password}@{host}/{database}'"
+def write_instance_config(host, user, password, database):
+    """Guarda la configuración en instance/config.py (ver config.py); no toca el código"""
+    path = os.path.join('instance', 'config.py')
+    settings = {'DATABASE_URL': f"mysql+pymysql://{user}:{password}@{host}/{database}"}
     
     try:
-        with open('app.py', 'r', encoding='utf-8') as file:
-            content = file.read()
+        # Conservar la SECRET_KEY de una instalación anterior
+        if os.path.exists(path):
+            previous = {}
+            with open(path, 'r', encoding='utf-8') as file:
+                exec(file.read(), previous)
+            settings['SECRET_KEY'] = previous.get('SECRET_KEY')
+        settings['SECRET_KEY'] = settings.get('SECRET_KEY') or secrets.token_hex(32)
         
-        # Buscar y reemplazar la línea de configuración
-        lines = content.split('\n')
-        for i, line in enumerate(lines):
-            if "SQLALCHEMY_DATABASE_URI" in line and "mysql://" in line:
-                lines[i] = f"app.config['SQLALCHEMY_DATABASE_URI'] = 'mysql://{user}:{password}@{host}/{database}'"
-                break
+        os.makedirs('instance', exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write("# Generado por install.py; las variables de entorno tienen prioridad\n")
+            for name, value in settings.items():
+                file.write(f"{name} = {value!r}\n")
         
-        with open('app.py', 'w', encoding='utf-8') as file:
-            file.write('\n'.join(lines))
-        
-        print("✅ Configuración actualizada en app.py")
+        print(f"✅ Configuración guardada en {path}")
         return True
     except Exception as e:
-        print(f"❌ Error al actualizar configuración: {e}")
+        print(f"❌ Error al guardar configuración: {e}")
         return False
 
 def main():
@@ -111,14 +115,15 @@ def main():
     if not test_mysql_connection(host, user, password, database):
         return
     
-    # Actualizar configuración
-    if not update_app_config(host, user, password, database):
+    # Guardar configuración
+    if not write_instance_config(host, user, password, database):
         return
     
     print("\n🎉 ¡Instalación completada!")
     print("=" * 40)
     print("Para iniciar la aplicación:")
-    print("  python app.py")
+    print("  python app.py      (desarrollo; DEBUG=1 para el depurador)")
+    print("  python serve.py    (producción, varios procesos)")
     print("\nAccede a:")
     print("  Frontend: http://localhost:5000")
     print("  Admin: http://localhost:5000/admin")
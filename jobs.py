@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+"""
+Cola de trabajos persistente en la propia base de datos
+Las vistas encolan con `jobs.enqueue(db.session, ...)` dentro de su
+transacción: el trabajo se guarda junto con el pedido (o lo que sea) y la
+respuesta sale enseguida. Un worker con un pool de hilos lo ejecuta
+después, embebido en cada proceso web (JOBS_EMBEDDED) o como proceso
+aparte (python jobs.py work).
+
+Cada trabajo se reclama con un UPDATE condicional, así varios hilos y
+procesos comparten la tabla sin ejecutar nada dos veces. Si falla se
+reintenta con espera exponencial hasta `max_attempts`; los periódicos
+(`every`) se reprograman al terminar. Un trabajo con `key` no se duplica
+mientras esté pendiente.
+
+Tabla: job (modelo en app.py)
+Configuración: JOB_WORKERS, JOBS_EMBEDDED, JOBS_POLL_INTERVAL,
+JOBS_RETRY_DELAY, JOBS_TIMEOUT, JOBS_KEEP_DAYS, TASKS_EAGER
+
+Uso: python jobs.py [work|list|enqueue|retry|purge] ...
+"""
+
+import json
+import os
+import socket
+import sys
+import threading
+import time
+import uuid
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+from flask import current_app, g, has_request_context
+from sqlalchemy import case, delete, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+PENDING = ('queued', 'running')
+MAINTENANCE_INTERVAL = 60  # Segundos entre recuperaciones de trabajos colgados
+
+Handler = namedtuple('Handler', 'func max_attempts every')
+
+
+class JobQueue:
+    """Extensión de Flask: registro de trabajos, encolado y ejecución
+
+    El registro de trabajos es común; lo de cada aplicación (el worker
+    embebido) va en app.extensions['jobs'] y se busca con current_app.
+    """
+
+    def __init__(self, app=None, db=None):
+        self.db = None
+        self.handlers = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db):
+        app.config.setdefault('JOB_WORKERS', 2)
+        app.config.setdefault('JOBS_EMBEDDED', True)
+        app.config.setdefault('JOBS_POLL_INTERVAL', 1.0)
+        app.config.setdefault('JOBS_RETRY_DELAY', 30)
+        app.config.setdefault('JOBS_TIMEOUT', 600)
+        app.config.setdefault('JOBS_KEEP_DAYS', 7)
+        app.config.setdefault('TASKS_EAGER', False)
+        self.db = db
+        app.extensions['jobs'] = {'worker_pid': None}
+        self.job('purge_jobs', every=86400)(self.purge)
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+
+    @property
+    def table(self):
+        return self.db.metadata.tables['job']
+
+    def job(self, name, max_attempts=3, every=None):
+        """Registrar una función como trabajo
+
+        every: segundos entre ejecuciones (o el nombre de una clave de
+        configuración) para un trabajo periódico.
+        """
+        def register(func):
+            self.handlers[name] = Handler(func, max_attempts, every)
+            return func
+        return register
+
+    def enqueue(self, conn, name, payload=None, key=None, delay=0, max_attempts=None):
+        """Encolar `name(**payload)` en la transacción de `conn` (Session o Connection)
+
+        Con `key`, si ya hay uno pendiente con esa clave solo se adelanta su
+        hora. Devuelve True si se creó un trabajo nuevo.
+        """
+        table = self.table
+        handler = self.handlers[name]
+        now = datetime.utcnow()
+        run_at = now + timedelta(seconds=delay)
+        if key is not None:
+            result = conn.execute(
+                update(table)
+                .where(table.c.dedupe_key == key, table.c.status.in_(PENDING))
+                .values(run_at=case((table.c.run_at > run_at, run_at), else_=table.c.run_at))
+            )
+            if result.rowcount:
+                return False
+        conn.execute(insert(table).values(
+            name=name, payload=json.dumps(payload or {}), dedupe_key=key, status='queued', attempts=0,
+            max_attempts=max_attempts or handler.max_attempts, run_at=run_at, created_at=now
+        ))
+        if current_app.config['TASKS_EAGER'] and has_request_context():
+            g.jobs_enqueued = True
+        return True
+
+    def interval(self, handler):
+        every = handler.every
+        return current_app.config[every] if isinstance(every, str) else every
+
+    def claim(self, worker, limit):
+        """Reclamar hasta `limit` trabajos vencidos; devuelve sus filas"""
+        table = self.table
+        engine = self.db.engine
+        now = datetime.utcnow()
+        with engine.connect() as conn:
+            ids = conn.execute(
+                select(table.c.id)
+                .where(table.c.status == 'queued', table.c.run_at <= now)
+                .order_by(table.c.run_at, table.c.id).limit(limit)
+            ).scalars().all()
+
+        claimed = []
+        for job_id in ids:
+            with engine.begin() as conn:
+                result = conn.execute(
+                    update(table)
+                    .where(table.c.id == job_id, table.c.status == 'queued')
+                    .values(status='running', locked_by=worker, locked_at=now, attempts=table.c.attempts + 1)
+                )
+                if result.rowcount == 1:  # 0 si otro worker lo reclamó antes
+                    claimed.append(conn.execute(
+                        select(table.c.id, table.c.name, table.c.payload, table.c.attempts, table.c.max_attempts)
+                        .where(table.c.id == job_id)
+                    ).mappings().one())
+        return claimed
+
+    def execute(self, job, worker):
+        """Ejecutar un trabajo reclamado, en un contexto nuevo de la aplicación actual, y registrar el resultado"""
+        handler = self.handlers.get(job['name'])
+        error = None
+        app = current_app._get_current_object()
+        with app.app_context():
+            try:
+                if handler is None:
+                    raise LookupError(f"Trabajo desconocido: {job['name']}")
+                handler.func(**json.loads(job['payload'] or '{}'))
+            except Exception as exc:
+                self.db.session.rollback()
+                app.logger.exception('Error en el trabajo %s (%s)', job['name'], job['id'])
+                error = f'{type(exc).__name__}: {exc}'[:1000]
+            self._finish(job, worker, handler, error)
+        return error is None
+
+    def _finish(self, job, worker, handler, error):
+        table = self.table
+        now = datetime.utcnow()
+        mine = (table.c.id == job['id'], table.c.locked_by == worker, table.c.status == 'running')
+        with self.db.engine.begin() as conn:
+            if error is not None and job['attempts'] < job['max_attempts']:
+                delay = current_app.config['JOBS_RETRY_DELAY'] * 2 ** (job['attempts'] - 1)
+                conn.execute(update(table).where(*mine).values(
+                    status='queued', run_at=now + timedelta(seconds=delay), last_error=error, locked_by=None
+                ))
+                return
+            result = conn.execute(update(table).where(*mine).values(
+                status='failed' if error else 'done', dedupe_key=None, finished_at=now, last_error=error, locked_by=None
+            ))
+            if result.rowcount and handler is not None and handler.every:
+                self.enqueue(conn, job['name'], key=f"every:{job['name']}", delay=self.interval(handler))
+
+    def maintain(self):
+        """Devolver a la cola los trabajos colgados y programar los periódicos que falten"""
+        table = self.table
+        now = datetime.utcnow()
+        cutoff = now - timedelta(seconds=current_app.config['JOBS_TIMEOUT'])
+        exhausted = table.c.attempts >= table.c.max_attempts
+        with self.db.engine.begin() as conn:
+            conn.execute(
+                update(table)
+                .where(table.c.status == 'running', table.c.locked_at < cutoff)
+                .values(
+                    status=case((exhausted, 'failed'), else_='queued'),
+                    dedupe_key=case((exhausted, None), else_=table.c.dedupe_key),
+                    finished_at=case((exhausted, now), else_=None),
+                    last_error='Tiempo agotado', locked_by=None
+                )
+            )
+            scheduled = set(conn.execute(
+                select(table.c.dedupe_key).where(table.c.dedupe_key.like('every:%'), table.c.status.in_(PENDING))
+            ).scalars())
+
+        for name, handler in self.handlers.items():
+            if handler.every and f'every:{name}' not in scheduled:
+                try:
+                    with self.db.engine.begin() as conn:
+                        self.enqueue(conn, name, key=f'every:{name}')
+                except IntegrityError:
+                    pass  # Otro worker lo programó a la vez
+
+    def run_pending(self):
+        """Ejecutar en este hilo todos los trabajos vencidos (TASKS_EAGER y --once)"""
+        return Worker(self, threads=1).run(once=True, inline=True)
+
+    def purge(self):
+        """Trabajo periódico: borrar los terminados hace más de JOBS_KEEP_DAYS"""
+        table = self.table
+        cutoff = datetime.utcnow() - timedelta(days=current_app.config['JOBS_KEEP_DAYS'])
+        with self.db.engine.begin() as conn:
+            return conn.execute(
+                delete(table).where(table.c.status.in_(('done', 'failed')), table.c.finished_at < cutoff)
+            ).rowcount
+
+    def _before_request(self):
+        # El worker embebido se arranca en cada proceso (gunicorn hace fork
+        # después de importar la aplicación, y los hilos no sobreviven al fork)
+        state = current_app.extensions['jobs']
+        if state['worker_pid'] == os.getpid():
+            return
+        config = current_app.config
+        if not config['JOBS_EMBEDDED'] or config['TASKS_EAGER'] or config['TESTING']:
+            return
+        with self._lock:
+            if state['worker_pid'] != os.getpid():
+                state['worker_pid'] = os.getpid()
+                worker = Worker(self, config['JOB_WORKERS'])
+                threading.Thread(target=worker.run, name='jobs-worker', daemon=True).start()
+
+    def _after_request(self, response):
+        if g.pop('jobs_enqueued', False):
+            self.run_pending()
+        return response
+
+
+class Worker:
+    """Bucle que reclama trabajos y los reparte en un pool de hilos
+
+    Atiende a la aplicación dada o, si no, a la del contexto actual.
+    """
+
+    def __init__(self, queue, threads, app=None):
+        self.queue = queue
+        self.app = app or current_app._get_current_object()
+        self.threads = threads
+        self.name = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        self.stopping = threading.Event()
+
+    def run(self, once=False, inline=False):
+        """Atender la cola hasta `stop()`; con once, hasta que no quede nada vencido
+
+        inline ejecuta en el hilo actual y sin mantenimiento (no programa
+        periódicos). Devuelve el número de trabajos ejecutados.
+        """
+        executor = None if inline else ThreadPoolExecutor(self.threads, thread_name_prefix='jobs')
+        try:
+            with self.app.app_context():
+                return self._loop(once, executor)
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=True)  # Dejar terminar los que están en marcha
+
+    def _loop(self, once, executor):
+        poll = self.app.config['JOBS_POLL_INTERVAL']
+        active = set()
+        executed = 0
+        next_maintenance = 0 if executor is not None else float('inf')
+        while not self.stopping.is_set():
+            try:
+                if time.monotonic() >= next_maintenance:
+                    self.queue.maintain()
+                    next_maintenance = time.monotonic() + MAINTENANCE_INTERVAL
+                free = self.threads - len(active)
+                claimed = self.queue.claim(self.name, free) if free else []
+            except Exception:
+                # Base caída o bloqueada: reintentar en la próxima vuelta
+                self.app.logger.exception('Error leyendo la cola de trabajos')
+                claimed = []
+
+            executed += len(claimed)
+            for job in claimed:
+                if executor is None:
+                    self.queue.execute(job, self.name)
+                else:
+                    active.add(executor.submit(self._execute, job))
+
+            if once and not claimed and not active:
+                break
+            if claimed and len(active) < self.threads:
+                continue  # Puede haber más vencidos
+            if active:
+                done, active = wait(active, timeout=poll, return_when=FIRST_COMPLETED)
+            elif not claimed:
+                self.stopping.wait(poll)
+        return executed
+
+    def _execute(self, job):
+        # Los hilos del pool no heredan el contexto de la aplicación
+        with self.app.app_context():
+            return self.queue.execute(job, self.name)
+
+    def stop(self):
+        self.stopping.set()
+
+
+def counts(conn, table):
+    """Trabajos por estado"""
+    return dict(conn.execute(select(table.c.status, func.count()).group_by(table.c.status)).all())
+
+
+def show_help():
+    print("""
+⚙️  Cola de trabajos - Tienda Online
+
+Comandos disponibles:
+
+1. Atender la cola (Ctrl+C para parar):
+   python jobs.py work [--threads N] [--once]
+
+2. Ver el estado de la cola:
+   python jobs.py list [estado]
+
+3. Encolar un trabajo a mano:
+   python jobs.py enqueue [nombre] [json]
+
+   Ejemplo:
+   python jobs.py enqueue send_order_confirmation '{"order_id": 1}'
+
+4. Reintentar trabajos fallidos:
+   python jobs.py retry [id|failed]
+
+5. Borrar trabajos terminados:
+   python jobs.py purge [días]
+""")
+
+
+def main():
+    command = sys.argv[1].lower() if len(sys.argv) > 1 else 'help'
+    if command not in ('work', 'list', 'enqueue', 'retry', 'purge'):
+        show_help()
+        return
+
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    from app import app, db, jobs
+
+    table = jobs.table
+    with app.app_context():
+        if command == 'work':
+            threads = int(sys.argv[sys.argv.index('--threads') + 1]) if '--threads' in sys.argv else app.config['JOB_WORKERS']
+            worker = Worker(jobs, threads)
+            print(f"⚙️  Worker {worker.name} con {threads} hilo(s)")
+            try:
+                executed = worker.run(once='--once' in sys.argv)
+            except KeyboardInterrupt:
+                worker.stop()
+                print("\n⏹️  Deteniendo...")
+                return
+            print(f"✅ {executed} trabajos ejecutados")
+
+        elif command == 'list':
+            with db.engine.connect() as conn:
+                print("\n📋 Trabajos por estado: " + ', '.join(
+                    f'{status} {count}' for status, count in sorted(counts(conn, table).items())
+                ))
+                query = select(table).order_by(table.c.id.desc()).limit(20)
+                if len(sys.argv) > 2:
+                    query = query.where(table.c.status == sys.argv[2])
+                rows = conn.execute(query).mappings().all()
+            print("-" * 90)
+            print(f"{'ID':<8} {'Trabajo':<26} {'Estado':<9} {'Intentos':<9} {'Programado':<20} Error")
+            print("-" * 90)
+            for row in rows:
+                print(f"{row['id']:<8} {row['name']:<26} {row['status']:<9} "
+                      f"{row['attempts']}/{row['max_attempts']:<7} {row['run_at']:%Y-%m-%d %H:%M:%S}  "
+                      f"{(row['last_error'] or '')[:40]}")
+
+        elif command == 'enqueue':
+            if len(sys.argv) < 3 or sys.argv[2] not in jobs.handlers:
+                print(f"❌ Uso: python jobs.py enqueue [{'|'.join(sorted(jobs.handlers))}] [json]")
+                return
+            payload = json.loads(sys.argv[3]) if len(sys.argv) > 3 else {}
+            with db.engine.begin() as conn:
+                jobs.enqueue(conn, sys.argv[2], payload)
+            print(f"✅ Trabajo {sys.argv[2]} encolado")
+
+        elif command == 'retry':
+            if len(sys.argv) != 3:
+                print("❌ Uso: python jobs.py retry [id|failed]")
+                return
+            target = table.c.status == 'failed'
+            if sys.argv[2] != 'failed':
+                target = (table.c.id == int(sys.argv[2])) & target
+            with db.engine.begin() as conn:
+                retried = conn.execute(update(table).where(target).values(
+                    status='queued', attempts=0, run_at=datetime.utcnow(), finished_at=None
+                )).rowcount
+            print(f"✅ {retried} trabajos vuelven a la cola")
+
+        elif command == 'purge':
+            if len(sys.argv) > 2:
+                app.config['JOBS_KEEP_DAYS'] = int(sys.argv[2])
+            print(f"✅ {jobs.purge()} trabajos borrados")
+
+
+if __name__ == '__main__':
+    main()
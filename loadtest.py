@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Prueba de carga HTTP de las rutas principales
+Lanza peticiones GET concurrentes contra un servidor en marcha (python
+serve.py) durante unos segundos por ruta, cada hilo con su conexión
+keep-alive, y muestra peticiones/seg, latencia media y p95, y errores.
+
+Uso: python loadtest.py [url] [segundos por ruta] [concurrencia]
+     python loadtest.py http://127.0.0.1:8000 10 32
+"""
+
+import http.client
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+ROUTES = [
+    ('Inicio', '/'),
+    ('Productos', '/products'),
+    ('Detalle', '/product/1'),
+    ('Búsqueda', '/search?q=producto'),
+    ('API productos', '/api/v1/products'),
+]
+
+
+def worker(base, path, deadline):
+    """Peticiones seguidas hasta `deadline`; devuelve (latencias, errores)"""
+    parts = urlsplit(base)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+    latencies, errors = [], 0
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            conn.request('GET', path, headers={'Accept-Encoding': 'gzip'})
+            response = conn.getresponse()
+            response.read()
+            if response.status >= 400:
+                errors += 1
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            conn.close()
+            conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+            continue
+        latencies.append(time.perf_counter() - started)
+    conn.close()
+    return latencies, errors
+
+
+def run(base, path, seconds, concurrency):
+    deadline = time.perf_counter() + seconds
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda _: worker(base, path, deadline), range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for result in results for latency in result[0])
+    errors = sum(result[1] for result in results)
+    if not latencies:
+        return 0.0, 0.0, 0.0, errors
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    return len(latencies) / elapsed, sum(latencies) / len(latencies) * 1000, p95 * 1000, errors
+
+
+def main():
+    base = sys.argv[1].rstrip('/') if len(sys.argv) > 1 else 'http://127.0.0.1:8000'
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 10
+    concurrency = int(sys.argv[3]) if len(sys.argv) > 3 else 32
+
+    print(f"🔥 {base}: {concurrency} conexiones, {seconds:g}s por ruta")
+    print("-" * 64)
+    print(f"{'Ruta':<16} {'pet/s':>10} {'media ms':>10} {'p95 ms':>10} {'errores':>10}")
+    print("-" * 64)
+    for name, path in ROUTES:
+        rps, mean, p95, errors = run(base, path, seconds, concurrency)
+        print(f"{name:<16} {rps:>10.1f} {mean:>10.2f} {p95:>10.2f} {errors:>10}")
+    print("-" * 64)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Prueba de carga del pago: muchos compradores contra las últimas unidades
+Crea una base SQLite temporal (o usa DATABASE_URL, p. ej. un MySQL local),
+llena los carritos y lanza pagos concurrentes desde varios hilos, con
+reintentos que repiten la misma clave de idempotencia. Al final verifica
+que no se vendió más stock del que había ni se duplicó ningún pedido.
+
+Uso: python loadtest_checkout.py [compradores] [stock] [hilos]
+"""
+
+import os
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# Los carritos de prueba van siempre a un almacén temporal, aunque la base sea otra
+tmp = tempfile.TemporaryDirectory()
+if 'DATABASE_URL' not in os.environ:
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp.name, 'loadtest.db')}"
+os.environ['CART_STORE_PATH'] = os.path.join(tmp.name, 'carts.db')
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import carts
+from app import app, db, cart_store, User, Product, Order, OrderItem
+
+
+def setup(buyers, stock):
+    """Crear el producto en oferta y un carrito de una unidad por comprador"""
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        product = Product(name='Oferta relámpago', description='', price=99.0, stock=stock)
+        db.session.add(product)
+        db.session.flush()
+        for i in range(buyers):
+            user = User(username=f'comprador{i}', email=f'comprador{i}@tienda.com', password_hash='-')
+            db.session.add(user)
+            db.session.flush()
+            cart_store.add(carts.user_cart(user.id), {product.id: 1})
+        db.session.commit()
+        return product.id, [user.id for user in User.query.order_by(User.id)], db.engine.dialect.name
+
+
+def buy(user_id):
+    """Pagar el carrito; el cliente reintenta el mismo POST como un navegador impaciente"""
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+
+    key = uuid.uuid4().hex
+    started = time.perf_counter()
+    statuses = [
+        client.post('/checkout', data={'idempotency_key': key}).status_code
+        for _ in range(2)
+    ]
+    return time.perf_counter() - started, statuses
+
+
+def main():
+    buyers = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    stock = int(sys.argv[2]) if len(sys.argv) > 2 else 25
+    threads = int(sys.argv[3]) if len(sys.argv) > 3 else 16
+
+    product_id, user_ids, dialect = setup(buyers, stock)
+    print(f"🛒 {buyers} compradores, {stock} unidades, {threads} hilos ({dialect})")
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(buy, user_ids))
+    elapsed = time.perf_counter() - started
+
+    with app.app_context():
+        remaining = db.session.get(Product, product_id).stock
+        orders = Order.query.count()
+        units = db.session.query(db.func.coalesce(db.func.sum(OrderItem.quantity), 0)).scalar()
+        duplicated = db.session.query(Order.user_id).group_by(Order.user_id) \
+            .having(db.func.count() > 1).count()
+
+    latencies = sorted(latency for latency, _ in results)
+    errors = sum(1 for _, statuses in results for status in statuses if status >= 500)
+    print("-" * 50)
+    print(f"Pedidos creados:      {orders}")
+    print(f"Unidades vendidas:    {units}")
+    print(f"Stock restante:       {remaining}")
+    print(f"Pedidos duplicados:   {duplicated}")
+    print(f"Errores HTTP 5xx:     {errors}")
+    print(f"Pagos/seg:            {buyers / elapsed:.1f}")
+    print(f"Latencia p50 / p95:   {latencies[len(latencies) // 2] * 1000:.1f} ms / "
+          f"{latencies[int(len(latencies) * 0.95)] * 1000:.1f} ms")
+    print("-" * 50)
+
+    ok = units == stock - remaining and remaining >= 0 and orders <= stock and duplicated == 0
+    print("✅ Sin sobreventa" if ok else "❌ Se vendió más stock del disponible")
+    tmp.cleanup()
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,32 @@
+"""
+Envío de correos por SMTP
+Sin MAIL_SERVER configurado los mensajes solo se registran en el log, así
+en desarrollo no hace falta un servidor de correo.
+
+Configuración: MAIL_SERVER, MAIL_PORT, MAIL_USERNAME, MAIL_PASSWORD,
+MAIL_USE_TLS, MAIL_FROM
+"""
+
+import smtplib
+from email.message import EmailMessage
+
+
+def send(app, to, subject, body):
+    """Enviar un correo de texto; devuelve False si solo se registró"""
+    config = app.config
+    if not config['MAIL_SERVER']:
+        app.logger.info('Correo para %s: %s\n%s', to, subject, body)
+        return False
+
+    message = EmailMessage()
+    message['From'] = config['MAIL_FROM']
+    message['To'] = to
+    message['Subject'] = subject
+    message.set_content(body)
+    with smtplib.SMTP(config['MAIL_SERVER'], config['MAIL_PORT'], timeout=30) as smtp:
+        if config['MAIL_USE_TLS']:
+            smtp.starttls()
+        if config['MAIL_USERNAME']:
+            smtp.login(config['MAIL_USERNAME'], config['MAIL_PASSWORD'])
+        smtp.send_message(message)
+    return True
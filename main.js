@@ -39,18 +39,11 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     });
     
-    // Filtro de categorías en productos
-    const categorySelect = document.getElementById('category');
-    if (categorySelect) {
-        categorySelect.addEventListener('change', function() {
-            const category = this.value;
-            const url = new URL(window.location);
-            if (category) {
-                url.searchParams.set('category', category);
-            } else {
-                url.searchParams.delete('category');
-            }
-            window.location.href = url.toString();
+    // Filtros del catálogo: se aplican al cambiar cualquier opción
+    const catalogFilters = document.getElementById('catalog-filters');
+    if (catalogFilters) {
+        catalogFilters.addEventListener('change', function() {
+            catalogFilters.submit();
         });
     }
     
@@ -66,19 +59,93 @@ document.addEventListener('DOMContentLoaded', function() {
 });
 
 // Funciones para el carrito
+// Los cambios de cantidad se acumulan unos instantes y se envían juntos en
+// una sola petición; la respuesta trae las líneas modificadas y el total.
+const pendingCartChanges = new Map();
+let cartFlushTimer = null;
+
 function updateCartQuantity(itemId, quantity) {
-    if (quantity <= 0) {
-        if (confirm('¿Quieres eliminar este producto del carrito?')) {
-            window.location.href = `/remove_from_cart/${itemId}`;
-        }
+    if (quantity <= 0 && !confirm('¿Quieres eliminar este producto del carrito?')) {
         return;
     }
     
-    // Aquí podrías implementar una actualización AJAX del carrito
-    // Por ahora, recargamos la página
-    window.location.href = `/update_cart/${itemId}/${quantity}`;
+    pendingCartChanges.set(itemId, Math.max(0, quantity));
+    clearTimeout(cartFlushTimer);
+    cartFlushTimer = setTimeout(flushCartChanges, 300);
 }
 
+function flushCartChanges() {
+    const items = Array.from(pendingCartChanges, ([id, quantity]) => ({id: id, quantity: quantity}));
+    pendingCartChanges.clear();
+    if (items.length === 0) {
+        return;
+    }
+    
+    fetch('/api/v1/cart/items', {
+        method: 'PATCH',
+        headers: {'Content-Type': 'application/json'},
+        body: JSON.stringify({items: items})
+    })
+    .then(response => response.json().then(data => ({ok: response.ok, data: data})))
+    .then(({ok, data}) => {
+        if (!ok) {
+            showAlert(data.error || 'Error al actualizar el carrito', 'error');
+            return;
+        }
+        applyCartChanges(data);
+    })
+    .catch(error => {
+        showAlert('Error de conexión', 'error');
+    });
+}
+
+function applyCartChanges(data) {
+    data.items.forEach(item => {
+        const line = document.querySelector(`[data-cart-item="${item.id}"]`);
+        if (line) {
+            line.querySelector('.cart-quantity').value = item.quantity;
+            line.querySelector('.cart-item-price').textContent = `$${item.subtotal.toFixed(2)}`;
+        }
+    });
+    data.removed.forEach(id => {
+        const line = document.querySelector(`[data-cart-item="${id}"]`);
+        if (line) {
+            line.remove();
+        }
+    });
+    
+    if (data.units === 0) {
+        // Carrito vacío: la página muestra su propio mensaje
+        window.location.reload();
+        return;
+    }
+    const total = document.querySelector('.total-amount');
+    if (total) {
+        total.textContent = `$${data.total.toFixed(2)}`;
+    }
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+    document.querySelectorAll('.cart-quantity').forEach(input => {
+        input.addEventListener('change', function() {
+            updateCartQuantity(parseInt(this.dataset.itemId, 10), parseInt(this.value, 10) || 0);
+        });
+    });
+    
+    // Eliminar sin recargar; el enlace sigue funcionando sin JavaScript.
+    // La confirmación ya la pide el manejador general de .btn-danger.
+    document.querySelectorAll('[data-remove-item]').forEach(link => {
+        link.addEventListener('click', function(e) {
+            if (e.defaultPrevented) {
+                return;
+            }
+            e.preventDefault();
+            pendingCartChanges.set(parseInt(this.dataset.removeItem, 10), 0);
+            flushCartChanges();
+        });
+    });
+});
+
 // Funciones para administración
 function updateOrderStatus(orderId, status) {
     fetch(`/admin/orders/${orderId}/status`, {
@@ -2,19 +2,30 @@
 """
 Script para gestionar usuarios administradores
 Uso: python manage_users.py [comando] [argumentos]
+
+Cada comando importa solo lo que usa: la aplicación (app.py, Flask y
+SQLAlchemy) se carga dentro de los comandos que tocan la base, así la ayuda
+y los errores de uso responden al instante y los procesos de import-users
+arrancan sin cargarla.
 """
 
+import csv
 import sys
 import os
-from werkzeug.security import generate_password_hash
+import time
 
 # Agregar el directorio actual al path para importar app
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from app import app, db, User
+IMPORT_BATCH_SIZE = 1000
+IMPORT_MAX_ERRORS = 20  # Filas rechazadas que se muestran una a una
 
 def create_admin(username, email, password):
     """Crear un nuevo usuario administrador"""
+    from app import app, db, User
+    import passwords
+    import stats
+    
     with app.app_context():
         # Verificar si el usuario ya existe
         existing_user = User.query.filter_by(username=username).first()
@@ -31,11 +42,12 @@ def create_admin(username, email, password):
         admin = User(
             username=username,
             email=email,
-            password_hash=generate_password_hash(password),
+            password_hash=passwords.hash_password(password, app.config['PASSWORD_HASH_METHOD']),
             is_admin=True
         )
         
         db.session.add(admin)
+        stats.incr(db.session, db.metadata, 'users')
         db.session.commit()
         
         print(f"✅ Usuario administrador '{username}' creado exitosamente")
@@ -44,9 +56,12 @@ def create_admin(username, email, password):
         return True
 
 def list_users():
-    """Listar todos los usuarios"""
+    """Listar todos los usuarios (por lotes: no se cargan todos en memoria)"""
+    from app import app, User
+    
     with app.app_context():
-        users = User.query.all()
+        users = User.query.order_by(User.id).yield_per(1000)
+        total = 0
         print("\n📋 Lista de Usuarios:")
         print("-" * 60)
         print(f"{'ID':<3} {'Usuario':<15} {'Email':<25} {'Tipo':<12}")
@@ -55,12 +70,145 @@ def list_users():
         for user in users:
             user_type = "Admin" if user.is_admin else "Usuario"
             print(f"{user.id:<3} {user.username:<15} {user.email:<25} {user_type:<12}")
+            total += 1
         
         print("-" * 60)
-        print(f"Total: {len(users)} usuarios")
+        print(f"Total: {total} usuarios")
+
+def _read_users(path):
+    """Filas del CSV (username, email, password y opcionalmente is_admin) con su número de línea"""
+    with open(path, newline='', encoding='utf-8-sig') as file:
+        reader = csv.DictReader(file)
+        missing = {'username', 'email', 'password'} - set(reader.fieldnames or ())
+        if missing:
+            raise ValueError(f"Faltan columnas: {', '.join(sorted(missing))}")
+        for row in reader:
+            yield reader.line_num, {
+                'username': (row['username'] or '').strip(),
+                'email': (row['email'] or '').strip(),
+                'password': row['password'] or '',
+                'is_admin': (row.get('is_admin') or '').strip().lower() in ('1', 'true', 'yes', 'si', 'sí'),
+            }
+
+
+def _batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _taken(rows):
+    """Usuarios y emails del lote que ya existen en la base (una sola consulta)"""
+    from sqlalchemy import or_, select
+    from app import db, User
+    
+    existing = db.session.execute(select(User.username, User.email).where(or_(
+        User.username.in_([row['username'] for row in rows]),
+        User.email.in_([row['email'] for row in rows]),
+    ))).all()
+    return {username for username, _ in existing}, {email for _, email in existing}
+
+
+def import_users(path, workers=None, batch_size=IMPORT_BATCH_SIZE):
+    """Alta masiva desde un CSV: conflictos por lote, hashes en paralelo e inserción por lotes"""
+    from concurrent.futures import ProcessPoolExecutor
+    from itertools import repeat
+    from sqlalchemy import insert
+    from sqlalchemy.exc import IntegrityError
+    from app import app, db, User
+    import passwords
+    import stats
+    
+    method = app.config['PASSWORD_HASH_METHOD']
+    created = rejected = 0
+    seen_usernames, seen_emails = set(), set()
+
+    def reject(line, reason):
+        nonlocal rejected
+        rejected += 1
+        if rejected <= IMPORT_MAX_ERRORS:
+            print(f"\r❌ Línea {line}: {reason}" if line else f"\r❌ {reason}")
+
+    workers = workers or os.cpu_count() or 1
+    started = time.perf_counter()
+    with app.app_context(), ProcessPoolExecutor(max_workers=workers) as pool:
+        try:
+            for batch in _batches(_read_users(path), batch_size):
+                valid = []
+                for line, row in batch:
+                    if not row['username'] or not row['email'] or not row['password']:
+                        reject(line, "usuario, email y contraseña son obligatorios")
+                    elif len(row['username']) > 80 or len(row['email']) > 120 or '@' not in row['email']:
+                        reject(line, f"usuario o email inválido ({row['username']}, {row['email']})")
+                    elif row['username'] in seen_usernames or row['email'] in seen_emails:
+                        reject(line, f"'{row['username']}' o '{row['email']}' repetido en el archivo")
+                    else:
+                        seen_usernames.add(row['username'])
+                        seen_emails.add(row['email'])
+                        valid.append((line, row))
+                if not valid:
+                    continue
+
+                usernames, emails = _taken([row for _, row in valid])
+                rows = []
+                for line, row in valid:
+                    if row['username'] in usernames or row['email'] in emails:
+                        reject(line, f"'{row['username']}' o '{row['email']}' ya existe")
+                    else:
+                        rows.append(row)
+                if not rows:
+                    continue
+
+                # El hash es lo que cuesta (cientos de ms cada uno): repartirlo entre procesos
+                hashes = pool.map(passwords.hash_password, [row['password'] for row in rows], repeat(method),
+                                  chunksize=max(1, len(rows) // (workers * 4)))
+                rows = [
+                    {'username': row['username'], 'email': row['email'],
+                     'password_hash': password_hash, 'is_admin': row['is_admin']}
+                    for row, password_hash in zip(rows, hashes)
+                ]
+
+                while rows:
+                    try:
+                        db.session.execute(insert(User), rows)
+                        stats.incr(db.session, db.metadata, 'users', amount=len(rows))
+                        db.session.commit()
+                        created += len(rows)
+                        break
+                    except IntegrityError:
+                        # Alguien se registró entre la consulta y la inserción: volver a filtrar
+                        db.session.rollback()
+                        usernames, emails = _taken(rows)
+                        remaining = [row for row in rows if row['username'] not in usernames and row['email'] not in emails]
+                        if len(remaining) == len(rows):
+                            raise
+                        for row in rows:
+                            if row['username'] in usernames or row['email'] in emails:
+                                reject(None, f"'{row['username']}' o '{row['email']}' se registró durante la importación")
+                        rows = remaining
+
+                elapsed = time.perf_counter() - started
+                print(f"\r   {created:,} creados, {rejected:,} rechazados ({created / elapsed:,.0f} usuarios/s)",
+                      end='', flush=True)
+        except (OSError, ValueError) as error:
+            print(f"\n❌ {error}")
+            return False
+
+    print(f"\r✅ {created:,} usuarios importados en {time.perf_counter() - started:.1f}s "
+          f"con {workers} procesos ({rejected:,} filas rechazadas)")
+    if rejected > IMPORT_MAX_ERRORS:
+        print(f"   (se mostraron las primeras {IMPORT_MAX_ERRORS})")
+    return True
 
 def toggle_admin(username):
     """Cambiar permisos de administrador de un usuario"""
+    from app import app, db, User, invalidate_principal
+    
     with app.app_context():
         user = User.query.filter_by(username=username).first()
         if not user:
@@ -68,7 +216,11 @@ def toggle_admin(username):
             return False
         
         user.is_admin = not user.is_admin
+        user.auth_version += 1
         db.session.commit()
+        # Con CACHE_TYPE='filesystem' esto invalida los workers en marcha; con la
+        # caché en memoria, load_user compara auth_version antes de dar permisos de admin
+        invalidate_principal(user.id)
         
         status = "administrador" if user.is_admin else "usuario normal"
         print(f"✅ {username} ahora es {status}")
@@ -96,7 +248,13 @@ Comandos disponibles:
    Ejemplo:
    python manage_users.py toggle juan
 
-4. Ayuda:
+4. Importar usuarios desde un CSV (columnas username, email, password y opcional is_admin):
+   python manage_users.py import-users [archivo.csv] [--workers N]
+   
+   Ejemplo:
+   python manage_users.py import-users mayoristas.csv --workers 8
+
+5. Ayuda:
    python manage_users.py help
 
 Ejemplos de uso:
@@ -133,6 +291,14 @@ def main():
         username = sys.argv[2]
         toggle_admin(username)
     
+    elif command == "import-users":
+        if len(sys.argv) not in (3, 5) or (len(sys.argv) == 5 and sys.argv[3] != '--workers'):
+            print("❌ Uso: python manage_users.py import-users [archivo.csv] [--workers N]")
+            return
+        
+        workers = int(sys.argv[4]) if len(sys.argv) == 5 else None
+        import_users(sys.argv[2], workers)
+    
     elif command == "help":
         show_help()
     
@@ -0,0 +1,201 @@
+"""
+Métricas de rendimiento por petición (por proceso)
+- Latencia por ruta en histogramas
+- Sentencias SQL y tiempo en la base de datos (eventos del motor)
+- Tiempo de renderizado de plantillas (señales de Jinja/Flask)
+
+Se publican en formato de texto de Prometheus (`exposition`) y, si
+METRICS_SERVER_TIMING está activo, en la cabecera Server-Timing de cada
+respuesta. No hacen ninguna consulta: solo cuentan en memoria.
+
+Configuración: METRICS_ENABLED, METRICS_SERVER_TIMING, METRICS_TOKEN
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from flask import before_render_template, current_app, g, has_app_context, request, template_rendered
+from sqlalchemy import event
+
+import query_budget
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # El último es +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    """Contadores por (endpoint, método); thread-safe"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = {}  # {(endpoint, método, estado): peticiones}
+        self.latency = {}  # {(endpoint, método): Histogram}
+        self.db_statements = {}
+        self.db_seconds = {}
+        self.render_seconds = {}
+
+    def record(self, endpoint, method, status, seconds, statements, db_seconds, render_seconds):
+        key = (endpoint, method)
+        with self._lock:
+            self.requests[key + (status,)] = self.requests.get(key + (status,), 0) + 1
+            histogram = self.latency.get(key)
+            if histogram is None:
+                histogram = self.latency[key] = Histogram()
+            histogram.observe(seconds)
+            self.db_statements[key] = self.db_statements.get(key, 0) + statements
+            self.db_seconds[key] = self.db_seconds.get(key, 0.0) + db_seconds
+            self.render_seconds[key] = self.render_seconds.get(key, 0.0) + render_seconds
+
+    def reset(self):
+        with self._lock:
+            for values in (self.requests, self.latency, self.db_statements, self.db_seconds, self.render_seconds):
+                values.clear()
+
+
+registry = Registry()
+
+
+def init_app(app, db):
+    app.config.setdefault('METRICS_ENABLED', True)
+    app.config.setdefault('METRICS_SERVER_TIMING', False)
+    app.config.setdefault('METRICS_TOKEN', None)  # Sin token, /metrics da 404 (salvo en DEBUG o TESTING)
+    if not app.config['METRICS_ENABLED']:
+        return
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', _query_start)
+        event.listen(db.engine, 'after_cursor_execute', _query_end)
+    before_render_template.connect(_render_start, app)
+    template_rendered.connect(_render_end, app)
+
+    app.before_request(_start)
+    app.after_request(_finish)
+
+
+class _Timing:
+    """Tiempos de la petición en curso; un solo objeto en `g` para acceder poco al proxy"""
+
+    __slots__ = ('started', 'db', 'render', 'render_depth', 'render_started')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db = self.render = 0.0
+        self.render_depth = 0
+
+
+def _start():
+    g.metrics = _Timing()
+
+
+def _query_start(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._metrics_start = time.perf_counter()
+
+
+def _query_end(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, '_metrics_start', None)
+    if started is not None and has_app_context():
+        timing = g.get('metrics')
+        if timing is not None:
+            timing.db += time.perf_counter() - started
+
+
+def _render_start(sender, template, context, **extra):
+    timing = g.get('metrics')
+    # Una plantilla renderizada dentro de otra no se cuenta dos veces
+    if timing is not None:
+        if timing.render_depth == 0:
+            timing.render_started = time.perf_counter()
+        timing.render_depth += 1
+
+
+def _render_end(sender, template, context, **extra):
+    timing = g.get('metrics')
+    if timing is not None and timing.render_depth:
+        timing.render_depth -= 1
+        if timing.render_depth == 0:
+            timing.render += time.perf_counter() - timing.render_started
+
+
+def _finish(response):
+    timing = g.pop('metrics', None)
+    if timing is None:
+        return response
+    elapsed = time.perf_counter() - timing.started
+    statements = query_budget.statement_count()
+    req = request._get_current_object()
+    registry.record(
+        req.endpoint or 'not_found', req.method, response.status_code,
+        elapsed, statements, timing.db, timing.render
+    )
+
+    if current_app.config['METRICS_SERVER_TIMING']:
+        response.headers['Server-Timing'] = ', '.join([
+            f'db;dur={timing.db * 1000:.2f};desc="{statements} SQL"',
+            f'tpl;dur={timing.render * 1000:.2f}',
+            f'total;dur={elapsed * 1000:.2f}',
+        ])
+    return response
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{name}="{value}"' for name, value in labels.items()) + '}'
+
+
+def _number(value):
+    return f'{value:.6f}' if isinstance(value, float) else str(value)
+
+
+def _metric(lines, name, kind, help_text, samples):
+    lines.append(f'# HELP {name} {help_text}')
+    lines.append(f'# TYPE {name} {kind}')
+    lines.extend(samples)
+
+
+def exposition(extra=None):
+    """Todas las métricas en formato de texto de Prometheus
+
+    extra: {nombre: (tipo, ayuda, valor)} con métricas sueltas de otros módulos
+    """
+    lines = []
+    with registry._lock:
+        _metric(lines, 'http_requests_total', 'counter', 'Peticiones atendidas', [
+            f'http_requests_total{_labels(endpoint=e, method=m, status=s)} {count}'
+            for (e, m, s), count in sorted(registry.requests.items())
+        ])
+
+        samples = []
+        for (e, m), histogram in sorted(registry.latency.items()):
+            cumulative = 0
+            for le, count in zip(list(histogram.buckets) + ['+Inf'], histogram.counts):
+                cumulative += count
+                samples.append(f'http_request_duration_seconds_bucket{_labels(endpoint=e, method=m, le=le)} {cumulative}')
+            samples.append(f'http_request_duration_seconds_sum{_labels(endpoint=e, method=m)} {histogram.sum:.6f}')
+            samples.append(f'http_request_duration_seconds_count{_labels(endpoint=e, method=m)} {histogram.count}')
+        _metric(lines, 'http_request_duration_seconds', 'histogram', 'Latencia por ruta', samples)
+
+        for name, values, help_text in (
+            ('db_statements_total', registry.db_statements, 'Sentencias SQL ejecutadas'),
+            ('db_duration_seconds_total', registry.db_seconds, 'Tiempo en la base de datos'),
+            ('template_render_seconds_total', registry.render_seconds, 'Tiempo renderizando plantillas'),
+        ):
+            _metric(lines, name, 'counter', help_text, [
+                f'{name}{_labels(endpoint=e, method=m)} {_number(value)}'
+                for (e, m), value in sorted(values.items())
+            ])
+
+    for name, (kind, help_text, value) in (extra or {}).items():
+        _metric(lines, name, kind, help_text, [f'{name} {value}'])
+    return '\n'.join(lines) + '\n'
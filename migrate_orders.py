@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Migración de Order.items (JSON) a la tabla order_item
+Recorre los pedidos por lotes ordenados por id, así que nunca carga la
+tabla completa en memoria. Es idempotente: los pedidos que ya tienen
+líneas en order_item se saltan.
+
+Uso: python migrate_orders.py [tamaño_lote]
+"""
+
+import sys
+import os
+import json
+from sqlalchemy import select, insert, exists
+
+BATCH_SIZE = 500
+
+
+def migrate_order_items(engine, order_table, item_table, product_table, batch_size=BATCH_SIZE):
+    """Convertir los pedidos con JSON en filas de order_item; devuelve (pedidos, líneas)"""
+    item_table.create(engine, checkfirst=True)
+
+    pending = (
+        select(order_table.c.id, order_table.c['items'])
+        .where(order_table.c['items'].isnot(None))
+        .where(~exists().where(item_table.c.order_id == order_table.c.id))
+        .order_by(order_table.c.id)
+        .limit(batch_size)
+    )
+
+    last_id = 0
+    orders = lines = 0
+    while True:
+        # Una transacción por lote
+        with engine.begin() as conn:
+            batch = conn.execute(pending.where(order_table.c.id > last_id)).all()
+            if not batch:
+                break
+            last_id = batch[-1].id
+
+            rows = []
+            for order_id, items in batch:
+                try:
+                    parsed = json.loads(items)
+                except ValueError:
+                    print(f"⚠️  Pedido {order_id}: JSON inválido, se omite")
+                    continue
+                for item in parsed:
+                    rows.append({
+                        'order_id': order_id,
+                        'product_id': item.get('product_id'),
+                        'product_name': item.get('product_name') or '',
+                        'unit_price': item.get('price') or 0,
+                        'quantity': item.get('quantity') or 0,
+                    })
+
+            # Productos borrados desde la compra: se conserva la línea sin referencia
+            product_ids = {row['product_id'] for row in rows if row['product_id'] is not None}
+            existing = set(conn.execute(
+                select(product_table.c.id).where(product_table.c.id.in_(product_ids))
+            ).scalars()) if product_ids else set()
+            for row in rows:
+                if row['product_id'] not in existing:
+                    row['product_id'] = None
+
+            if rows:
+                conn.execute(insert(item_table), rows)
+            orders += len(batch)
+            lines += len(rows)
+
+    return orders, lines
+
+
+def main():
+    batch_size = int(sys.argv[1]) if len(sys.argv) > 1 else BATCH_SIZE
+
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    from app import app, db, Order, OrderItem, Product
+
+    with app.app_context():
+        orders, lines = migrate_order_items(
+            db.engine, Order.__table__, OrderItem.__table__, Product.__table__, batch_size
+        )
+        print(f"✅ {orders} pedidos migrados ({lines} líneas)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Migraciones de esquema versionadas
+Cada migración se aplica una sola vez y queda registrada en la tabla
+schema_version. Todas son idempotentes, así que también sirven para una
+base creada a mano o con db.create_all().
+
+Uso: python migrations.py [upgrade|status|explain]
+"""
+
+import os
+import re
+import sys
+from datetime import datetime
+from sqlalchemy import (
+    MetaData, Table, Column, Integer, String, DateTime, UniqueConstraint,
+    inspect, select, insert, update, delete, func, text, or_
+)
+from sqlalchemy.schema import CreateColumn
+import migrate_orders
+import facets
+import search
+import stats
+
+_schema = MetaData()
+schema_version = Table(
+    'schema_version', _schema,
+    Column('version', Integer, primary_key=True),
+    Column('name', String(100), nullable=False),
+    Column('applied_at', DateTime, default=datetime.utcnow),
+)
+
+
+def _initial(engine, metadata):
+    """Crear las tablas que falten con su definición actual"""
+    metadata.create_all(engine)
+
+
+def _order_items(engine, metadata):
+    """Pasar las líneas JSON de los pedidos a order_item"""
+    migrate_orders.migrate_order_items(
+        engine, metadata.tables['order'], metadata.tables['order_item'], metadata.tables['product']
+    )
+
+
+def _search_index(engine, metadata):
+    """Índice de texto completo para /search"""
+    search.ensure_index(engine)
+
+
+def _hot_query_indexes(engine, metadata):
+    """Índices compuestos de las rutas y unicidad (user_id, product_id) en el carrito"""
+    cart = metadata.tables['cart_item']
+    with engine.begin() as conn:
+        # Fusionar líneas duplicadas antes de exigir unicidad
+        duplicates = conn.execute(
+            select(cart.c.user_id, cart.c.product_id, func.min(cart.c.id), func.sum(cart.c.quantity))
+            .group_by(cart.c.user_id, cart.c.product_id)
+            .having(func.count() > 1)
+        ).all()
+        for user_id, product_id, keep_id, quantity in duplicates:
+            conn.execute(update(cart).where(cart.c.id == keep_id).values(quantity=quantity))
+            conn.execute(delete(cart).where(
+                cart.c.user_id == user_id, cart.c.product_id == product_id, cart.c.id != keep_id
+            ))
+
+        _create_missing_indexes(conn, metadata.sorted_tables)
+
+
+def _upload_status(engine, metadata):
+    """Estado, hash y tamaño de file_upload para las subidas por partes"""
+    table = metadata.tables['file_upload']
+    with engine.begin() as conn:
+        _add_missing_columns(conn, table)
+        _create_missing_indexes(conn, [table])
+
+
+def _product_sku(engine, metadata):
+    """SKU de producto e índices para la importación de listas de precios"""
+    table = metadata.tables['product']
+    with engine.begin() as conn:
+        _add_missing_columns(conn, table)
+        _create_missing_indexes(conn, [table])
+
+
+def _dashboard_stats(engine, metadata):
+    """Tablas de estadísticas del panel, calculadas a partir de los datos actuales"""
+    tables = [metadata.tables[name] for name in ('stat_counter', 'daily_sales', 'product_sales')]
+    metadata.create_all(engine, tables=tables)
+    stats.refresh(engine, metadata)
+
+
+def _product_updated_at(engine, metadata):
+    """Fecha de última modificación de cada producto (Last-Modified de la API)"""
+    table = metadata.tables['product']
+    with engine.begin() as conn:
+        _add_missing_columns(conn, table)
+        conn.execute(update(table).where(table.c.updated_at.is_(None)).values(updated_at=table.c.created_at))
+
+
+def _product_facets(engine, metadata):
+    """Conteos de facetas del catálogo e índice para ordenar por precio"""
+    metadata.create_all(engine, tables=[metadata.tables['product_facet']])
+    with engine.begin() as conn:
+        _create_missing_indexes(conn, [metadata.tables['product']])
+    facets.refresh(engine, metadata)
+
+
+def _job_queue(engine, metadata):
+    """Cola de trabajos e índice para limpiar carritos abandonados"""
+    metadata.create_all(engine, tables=[metadata.tables['job']])
+    with engine.begin() as conn:
+        _create_missing_indexes(conn, [metadata.tables['cart_item']])
+
+
+def _password_hash_length(engine, metadata):
+    """password_hash a VARCHAR(255) para los hashes scrypt (SQLite no limita la longitud)"""
+    column = metadata.tables['user'].c.password_hash
+    quote = engine.dialect.identifier_preparer.quote
+    ddl = column.type.compile(dialect=engine.dialect)
+    with engine.begin() as conn:
+        if engine.dialect.name == 'mysql':
+            conn.execute(text(f"ALTER TABLE {quote('user')} MODIFY {quote(column.name)} {ddl} NOT NULL"))
+        elif engine.dialect.name == 'postgresql':
+            conn.execute(text(f"ALTER TABLE {quote('user')} ALTER COLUMN {quote(column.name)} TYPE {ddl}"))
+
+
+def _user_auth_version(engine, metadata):
+    """Versión de los permisos de cada usuario (invalida los usuarios en caché)"""
+    with engine.begin() as conn:
+        _add_missing_columns(conn, metadata.tables['user'])
+
+
+def _add_missing_columns(conn, table):
+    """ALTER TABLE ADD COLUMN para las columnas del modelo que faltan en la base"""
+    existing = {column['name'] for column in inspect(conn).get_columns(table.name)}
+    quote = conn.dialect.identifier_preparer.quote
+    for column in table.columns:
+        if column.name not in existing:
+            ddl = CreateColumn(column).compile(dialect=conn.dialect)
+            conn.execute(text(f"ALTER TABLE {quote(table.name)} ADD COLUMN {ddl}"))
+
+
+def _create_missing_indexes(conn, tables):
+    """Crear los índices y restricciones UNIQUE del modelo que falten en la base"""
+    inspector = inspect(conn)
+    quote = conn.dialect.identifier_preparer.quote
+    for table in tables:
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        existing |= {constraint['name'] for constraint in inspector.get_unique_constraints(table.name)}
+        # Columnas que añadirá una migración posterior: su índice se crea allí
+        columns = {column['name'] for column in inspector.get_columns(table.name)}
+
+        for index in table.indexes:
+            if index.name not in existing and {column.name for column in index.columns} <= columns:
+                index.create(conn)
+
+        # Las restricciones UNIQUE se añaden como índice único (SQLite no tiene ALTER ADD CONSTRAINT)
+        for constraint in table.constraints:
+            if isinstance(constraint, UniqueConstraint) and constraint.name and constraint.name not in existing:
+                columns = ', '.join(quote(column.name) for column in constraint.columns)
+                conn.execute(text(
+                    f"CREATE UNIQUE INDEX {quote(constraint.name)} ON {quote(table.name)} ({columns})"
+                ))
+
+
+# (versión, nombre, función); agregar siempre al final
+MIGRATIONS = [
+    (1, 'initial', _initial),
+    (2, 'order_items', _order_items),
+    (3, 'search_index', _search_index),
+    (4, 'hot_query_indexes', _hot_query_indexes),
+    (5, 'upload_status', _upload_status),
+    (6, 'product_sku', _product_sku),
+    (7, 'dashboard_stats', _dashboard_stats),
+    (8, 'product_updated_at', _product_updated_at),
+    (9, 'product_facets', _product_facets),
+    (10, 'job_queue', _job_queue),
+    (11, 'password_hash_length', _password_hash_length),
+    (12, 'user_auth_version', _user_auth_version),
+]
+
+
+def applied_versions(engine):
+    """Versiones ya aplicadas en esta base de datos"""
+    schema_version.create(engine, checkfirst=True)
+    with engine.connect() as conn:
+        return set(conn.execute(select(schema_version.c.version)).scalars())
+
+
+def upgrade(engine, metadata):
+    """Aplicar en orden las migraciones pendientes; devuelve sus nombres"""
+    applied = applied_versions(engine)
+    done = []
+    for version, name, migrate in MIGRATIONS:
+        if version in applied:
+            continue
+        migrate(engine, metadata)
+        with engine.begin() as conn:
+            conn.execute(insert(schema_version).values(version=version, name=name))
+        done.append(name)
+    return done
+
+
+def explain(engine, queries):
+    """Plan de cada consulta: [(nombre, líneas del plan, usa índices)]
+
+    Una consulta no pasa si recorre una tabla completa o si ordena sin
+    índice (tabla temporal / filesort).
+    """
+    results = []
+    with engine.connect() as conn:
+        for name, statement in queries:
+            compiled = statement.compile(dialect=engine.dialect, compile_kwargs={'render_postcompile': True})
+            if compiled.positional:
+                params = tuple(compiled.params[key] for key in compiled.positiontup)
+            else:
+                params = compiled.params
+
+            if engine.dialect.name == 'sqlite':
+                rows = conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {compiled}', params).all()
+                plan = [row[-1] for row in rows]
+                ok = not any(re.match(r'^SCAN \S+$', line) or 'TEMP B-TREE' in line for line in plan)
+            else:
+                rows = conn.exec_driver_sql(f'EXPLAIN {compiled}', params).mappings().all()
+                plan = [f"{row['table']}: type={row['type']} key={row['key']} {row['Extra'] or ''}" for row in rows]
+                ok = not any(row['type'] == 'ALL' or 'filesort' in (row['Extra'] or '') for row in rows)
+            results.append((name, plan, ok))
+    return results
+
+
+def route_queries():
+    """Consultas representativas de cada ruta, para `explain`"""
+    from app import Product, CartItem, Order, OrderItem, User, FileUpload, DailySales, ProductSales, Job
+
+    return [
+        ('index', select(Product).filter_by(is_active=True)
+            .order_by(Product.created_at, Product.id).limit(8)),
+        ('products', select(Product).filter_by(is_active=True)
+            .order_by(Product.created_at, Product.id).limit(13)),
+        ('products?category', select(Product).filter_by(is_active=True, category='x')
+            .order_by(Product.created_at, Product.id).limit(13)),
+        ('products?category=a&category=b', select(Product).where(Product.is_active.is_(True), Product.category.in_(['a', 'b']))
+            .order_by(Product.created_at, Product.id).limit(13)),
+        ('products?sort=price_asc', select(Product).filter_by(is_active=True)
+            .order_by(Product.price, Product.id).limit(13)),
+        ('checkout', select(CartItem).filter_by(user_id=1).order_by(CartItem.product_id)),
+        ('orders', select(Order).filter_by(user_id=1).order_by(Order.created_at.desc())),
+        ('líneas de pedido', select(OrderItem).where(OrderItem.order_id.in_([1, 2, 3]))),
+        ('ventas por día', select(DailySales).where(DailySales.day > datetime(2024, 1, 1).date())
+            .order_by(DailySales.day)),
+        ('más vendidos', select(ProductSales).order_by(ProductSales.units.desc()).limit(5)),
+        ('pedidos recientes', select(Order).order_by(Order.created_at.desc()).limit(5)),
+        ('admin/orders', select(Order).order_by(Order.created_at.desc(), Order.id.desc()).limit(51)),
+        ('admin/users', select(User).order_by(User.created_at, User.id).limit(51)),
+        ('admin/files', select(FileUpload)
+            .order_by(FileUpload.uploaded_at.desc(), FileUpload.id.desc()).limit(51)),
+        ('importar precios', select(Product.id, Product.sku, Product.name, Product.price, Product.stock)
+            .where(or_(Product.sku.in_(['A-1', 'A-2']), Product.name.in_(['Teclado'])))),
+        ('subida duplicada', select(FileUpload)
+            .filter_by(content_hash='0' * 64, file_type='other', status='ready').limit(1)),
+        ('cola de trabajos', select(Job.id).where(Job.status == 'queued', Job.run_at <= datetime(2024, 1, 1))
+            .order_by(Job.run_at, Job.id).limit(2)),
+    ]
+
+
+def main():
+    command = sys.argv[1].lower() if len(sys.argv) > 1 else 'help'
+    if command not in ('upgrade', 'status', 'explain'):
+        print("Uso: python migrations.py [upgrade|status|explain]")
+        return
+
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    from app import app, db
+
+    with app.app_context():
+        if command == 'upgrade':
+            done = upgrade(db.engine, db.metadata)
+            for name in done:
+                print(f"✅ Migración aplicada: {name}")
+            if not done:
+                print("✅ El esquema ya está al día")
+
+        elif command == 'status':
+            applied = applied_versions(db.engine)
+            for version, name, _ in MIGRATIONS:
+                mark = "✅" if version in applied else "⏳"
+                print(f"{mark} {version:04d} {name}")
+
+        elif command == 'explain':
+            failed = 0
+            for name, plan, ok in explain(db.engine, route_queries()):
+                print(f"{'✅' if ok else '❌'} {name}")
+                for line in plan:
+                    print(f"     {line}")
+                failed += not ok
+            sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
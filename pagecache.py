@@ -0,0 +1,160 @@
+"""
+Caché de páginas completas y de fragmentos para visitantes anónimos
+- `PageCache.cached`: guarda el HTML de una vista por ruta y query string.
+  Fresca durante PAGE_CACHE_TIMEOUT; después, y hasta PAGE_CACHE_STALE más,
+  se sirve la copia vieja mientras un trabajo en segundo plano la regenera
+  (stale-while-revalidate). Las respuestas llevan Cache-Control público,
+  ETag y Vary: Cookie.
+- `FragmentCache`: etiqueta {% cache clave, ... %}...{% endcache %} de Jinja.
+  La clave se arma con los valores que determinan el contenido (id y
+  updated_at del producto, conteos...), así nunca hace falta invalidarla.
+
+No se usa la caché (ni se guarda la página) con sesión iniciada, con
+mensajes flash pendientes o si la vista escribe en la sesión. Se guarda el
+cuerpo sin comprimir: la compresión la hace después api.compress.
+Las rutas de administración invalidan todas las páginas con `invalidate`.
+
+Configuración: PAGE_CACHE_TIMEOUT (0 la desactiva), PAGE_CACHE_STALE
+"""
+
+import hashlib
+import time
+from functools import wraps
+from flask import current_app, make_response, request, session
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+import api
+
+GENERATION = 'pages'
+
+
+class PageCache:
+    """Extensión de Flask sobre la caché de la aplicación (cache.Cache)"""
+
+    def __init__(self, app=None, cache=None, tasks=None):
+        self.cache = None
+        self.tasks = None
+        if app is not None:
+            self.init_app(app, cache, tasks)
+
+    def init_app(self, app, cache, tasks):
+        app.config.setdefault('PAGE_CACHE_TIMEOUT', 60)
+        app.config.setdefault('PAGE_CACHE_STALE', 300)
+        # cache y tasks resuelven su estado con current_app: valen para varias aplicaciones
+        self.cache = cache
+        self.tasks = tasks
+        app.jinja_env.add_extension(FragmentCache)
+        app.jinja_env.extend(fragment_cache=cache)
+        app.extensions['pagecache'] = self
+
+    def invalidate(self):
+        """Tras escribir en el catálogo: ninguna página guardada vuelve a servirse"""
+        self.cache.bump(GENERATION)
+
+    def cached(self, view):
+        """Decorador para vistas GET públicas que solo cambian con el catálogo"""
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            config = current_app.config
+            if not config['PAGE_CACHE_TIMEOUT'] or not self._anonymous():
+                response = make_response(view(*args, **kwargs))
+                response.cache_control.private = True
+                response.cache_control.no_cache = True
+                return response
+
+            key = f'page:{self.cache.generation(GENERATION)}:{request.full_path}'
+            entry = None if request.environ.get('pagecache.revalidate') else self.cache.get(key)
+            if entry is not None:
+                age = time.time() - entry['created']
+                if age > config['PAGE_CACHE_TIMEOUT']:
+                    self._revalidate(key)
+                response = self._response(entry)
+                response.headers['Age'] = str(int(age))
+                return self._conditional(response, entry['etag'])
+
+            response = make_response(view(*args, **kwargs))
+            # Si la vista dejó un flash o inició sesión, la página es personal
+            if (response.status_code == 200 and not response.direct_passthrough
+                    and not session.modified and self._anonymous()):
+                entry = {
+                    'created': time.time(),
+                    'status': response.status_code,
+                    'mimetype': response.mimetype,
+                    'body': response.get_data(),
+                }
+                entry['etag'] = hashlib.sha256(entry['body']).hexdigest()[:32]
+                self.cache.set(key, entry, timeout=config['PAGE_CACHE_TIMEOUT'] + config['PAGE_CACHE_STALE'])
+                response = self._response(entry)
+                return self._conditional(response, entry['etag'])
+            return response.make_conditional(request)
+        return wrapper
+
+    def _anonymous(self):
+        # Sin cargar el usuario: basta con mirar la sesión y la cookie "recordarme"
+        return (
+            '_user_id' not in session and '_flashes' not in session
+            and current_app.config.get('REMEMBER_COOKIE_NAME', 'remember_token') not in request.cookies
+        )
+
+    def _response(self, entry):
+        config = current_app.config
+        response = current_app.response_class(entry['body'], status=entry['status'], mimetype=entry['mimetype'])
+        response.set_etag(entry['etag'])
+        response.headers['Cache-Control'] = (
+            f"public, max-age={config['PAGE_CACHE_TIMEOUT']}, stale-while-revalidate={config['PAGE_CACHE_STALE']}"
+        )
+        response.vary.add('Cookie')
+        return response
+
+    def _conditional(self, response, etag):
+        """304 también si el cliente guardó la versión comprimida (ETag con -gzip o -br)"""
+        matched = api.matching_etag(etag)
+        if matched is not None:
+            response.set_etag(matched)
+        return response.make_conditional(request)
+
+    def _revalidate(self, key):
+        """Regenerar la página en segundo plano; una sola vez aunque lleguen muchas peticiones"""
+        lock = f'{key}:revalidating'
+        if self.cache.get(lock):
+            return
+        self.cache.set(lock, True, timeout=30)
+        self.tasks.submit(self._render, request.full_path, request.host_url, lock)
+
+    def _render(self, full_path, base_url, lock):
+        # Corre en el contexto de la aplicación que encoló el trabajo (tasks.submit)
+        app = current_app._get_current_object()
+        try:
+            with app.test_request_context(
+                full_path, base_url=base_url, environ_overrides={'pagecache.revalidate': True}
+            ):
+                app.full_dispatch_request()
+        finally:
+            self.cache.delete(lock)
+
+
+class FragmentCache(Extension):
+    """{% cache 'nombre', valor1, valor2 %}...{% endcache %}"""
+
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        parts = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            parts.append(parser.parse_expression())
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        return nodes.CallBlock(
+            self.call_method('_render', [nodes.List(parts)]), [], [], body
+        ).set_lineno(lineno)
+
+    def _render(self, parts, caller):
+        key = 'fragment:' + hashlib.sha1(repr(parts).encode()).hexdigest()
+        cache = self.environment.fragment_cache
+        html = cache.get(key)
+        if html is None:
+            html = str(caller())
+            cache.set(key, html)
+        return Markup(html)
@@ -0,0 +1,249 @@
+"""
+Paginación por cursor (keyset) para listados de productos y administración
+
+Las primeras páginas se siguen pidiendo por número (?page=N) con LIMIT/OFFSET;
+a partir de ahí se navega con cursores opacos (?cursor=...) que guardan los
+valores de la última fila vista, así que ninguna página necesita OFFSET ni
+COUNT(*).
+"""
+
+import base64
+import json
+import math
+import time
+from datetime import datetime
+from flask import current_app, request, abort, url_for
+from sqlalchemy import and_, or_, func
+
+MAX_PAGE_NUMBER = 10
+COUNT_TTL = 300
+COUNT_CACHE_SIZE = 1024
+
+# Conteos aproximados: {clave: (expira, total)}
+_counts = {}
+
+
+class KeysetPage:
+    """Una página de resultados con cursores hacia adelante y hacia atrás"""
+
+    def __init__(self, items, page=None, next_cursor=None, prev_cursor=None,
+                 next_page=None, prev_page=None, total=None, per_page=12):
+        self.items = items
+        self.page = page
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.next_num = next_page
+        self.prev_num = prev_page
+        self.total = total
+        self.per_page = per_page
+
+    @property
+    def has_next(self):
+        return bool(self.next_cursor or self.next_num)
+
+    @property
+    def has_prev(self):
+        return bool(self.prev_cursor or self.prev_num)
+
+    @property
+    def pages(self):
+        """Total de páginas aproximado (None si no se pidió el conteo)"""
+        if self.total is None:
+            return None
+        return max(1, -(-self.total // self.per_page))
+
+    def next_args(self):
+        """Argumentos de URL para la página siguiente"""
+        if self.next_num:
+            return {'page': self.next_num}
+        return {'cursor': self.next_cursor}
+
+    def prev_args(self):
+        """Argumentos de URL para la página anterior"""
+        if self.prev_num:
+            return {'page': self.prev_num}
+        return {'cursor': self.prev_cursor}
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def encode_cursor(values, direction):
+    """Serializar los valores de ordenación en un token opaco"""
+    payload = json.dumps(
+        {'v': [v.isoformat() if isinstance(v, datetime) else v for v in values], 'd': direction},
+        separators=(',', ':')
+    )
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token, order):
+    """Recuperar (valores, dirección) de un token; ValueError si es inválido"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        values, direction = data['v'], data['d']
+    except (ValueError, KeyError, TypeError):
+        raise ValueError('Cursor inválido')
+
+    if direction not in ('n', 'p') or not isinstance(values, list) or len(values) != len(order):
+        raise ValueError('Cursor inválido')
+
+    return [_cursor_value(value, column) for value, (column, _) in zip(values, order)], direction
+
+
+def _cursor_value(value, column):
+    """Valor de un cursor convertido al tipo de su columna; ValueError si no encaja"""
+    expected = _python_type(column)
+    if expected is datetime and isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            raise ValueError('Cursor inválido')
+    # bool es subclase de int, pero ninguna columna de orden es booleana
+    if isinstance(value, bool):
+        raise ValueError('Cursor inválido')
+    if expected is int and isinstance(value, int):
+        return value
+    if expected is float and isinstance(value, (int, float)) and math.isfinite(value):
+        return value
+    if expected is str and isinstance(value, str):
+        return value
+    if expected is None and isinstance(value, (str, int, float)):
+        return value
+    raise ValueError('Cursor inválido')
+
+
+def paginate(query, order, per_page=12, count_key=None, total=None):
+    """Paginar `query` ordenando por `order`, una lista de (columna, descendente)
+
+    La última columna de `order` debe ser única (normalmente el id) para que
+    el orden sea total. Lee `page` y `cursor` de la petición actual. Si se da
+    `count_key`, el total se calcula una vez y se guarda en caché COUNT_TTL
+    segundos; si se da `total` (p. ej. un conteo precalculado), no se cuenta.
+    Las páginas por número llegan hasta PAGINATION_MAX_PAGE.
+    """
+    max_page = current_app.config.get('PAGINATION_MAX_PAGE', MAX_PAGE_NUMBER)
+    cursor = request.args.get('cursor')
+    page = request.args.get('page', 1, type=int)
+
+    if total is None and count_key:
+        total = approximate_count(query, count_key)
+    keyed = query.add_columns(*[column for column, _ in order])
+
+    if cursor:
+        try:
+            values, direction = decode_cursor(cursor, order)
+        except ValueError:
+            abort(400)
+        return _keyset_page(keyed, order, values, direction, per_page, total)
+
+    if page < 1 or page > max_page:
+        abort(404)
+
+    rows = keyed.order_by(*_ordering(order)).offset((page - 1) * per_page).limit(per_page + 1).all()
+    has_next = len(rows) > per_page
+    rows = rows[:per_page]
+
+    next_page = next_cursor = None
+    if has_next:
+        if page < max_page:
+            next_page = page + 1
+        else:
+            next_cursor = encode_cursor(rows[-1][1:], 'n')
+
+    return KeysetPage(
+        [row[0] for row in rows],
+        page=page,
+        next_page=next_page,
+        prev_page=page - 1 if page > 1 else None,
+        next_cursor=next_cursor,
+        total=total,
+        per_page=per_page
+    )
+
+
+def approximate_count(query, key):
+    """COUNT(*) de la consulta guardado en caché durante COUNT_TTL segundos"""
+    now = time.monotonic()
+    cached = _counts.get(key)
+    if cached and cached[0] > now:
+        return cached[1]
+
+    total = query.order_by(None).with_entities(func.count()).scalar()
+    if len(_counts) >= COUNT_CACHE_SIZE:
+        _counts.pop(next(iter(_counts)))
+    _counts[key] = (now + COUNT_TTL, total)
+    return total
+
+
+def _keyset_page(keyed, order, values, direction, per_page, total):
+    forward = direction == 'n'
+    rows = (
+        keyed.filter(_after(order, values, forward))
+        .order_by(*_ordering(order, reverse=not forward))
+        .limit(per_page + 1)
+        .all()
+    )
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if not forward:
+        rows.reverse()
+
+    if not rows:
+        return KeysetPage([], total=total, per_page=per_page)
+
+    first, last = rows[0][1:], rows[-1][1:]
+    # Desde un cursor siempre hay página en el sentido contrario
+    next_cursor = encode_cursor(last, 'n') if (has_more or not forward) else None
+    prev_cursor = encode_cursor(first, 'p') if (has_more or forward) else None
+
+    return KeysetPage(
+        [row[0] for row in rows],
+        next_cursor=next_cursor,
+        prev_cursor=prev_cursor,
+        total=total,
+        per_page=per_page
+    )
+
+
+def _ordering(order, reverse=False):
+    clauses = []
+    for column, descending in order:
+        if descending != reverse:
+            clauses.append(column.desc())
+        else:
+            clauses.append(column.asc())
+    return clauses
+
+
+def _after(order, values, forward):
+    """Condición de fila posterior (o anterior) a `values` según el orden"""
+    alternatives = []
+    for i, (column, descending) in enumerate(order):
+        equal = [order[j][0] == values[j] for j in range(i)]
+        if descending == forward:
+            equal.append(column < values[i])
+        else:
+            equal.append(column > values[i])
+        alternatives.append(and_(*equal))
+    return or_(*alternatives)
+
+
+def _python_type(column):
+    try:
+        return column.type.python_type
+    except (AttributeError, NotImplementedError):
+        return None
+
+
+def page_url(**args):
+    """URL de la vista actual conservando los filtros y cambiando la página"""
+    params = request.args.to_dict(flat=False)
+    params.pop('page', None)
+    params.pop('cursor', None)
+    params.update({key: value for key, value in args.items() if value is not None})
+    return url_for(request.endpoint, **(request.view_args or {}), **params)
@@ -0,0 +1,32 @@
+"""
+Hash de contraseñas con algoritmo y coste configurables
+PASSWORD_HASH_METHOD usa el formato de werkzeug: 'pbkdf2:sha256:600000'
+(algoritmo e iteraciones) o 'scrypt:32768:8:1' (N, r, p). Los hashes
+guardados con otro método o coste se siguen aceptando y login() los
+recalcula con el actual en cuanto el usuario inicia sesión.
+
+No dependen de la aplicación: manage_users.py import-users los calcula en
+un pool de procesos.
+"""
+
+from functools import lru_cache
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+def hash_password(password, method):
+    return generate_password_hash(password, method)
+
+
+def verify(password_hash, password):
+    return check_password_hash(password_hash, password)
+
+
+@lru_cache(maxsize=None)
+def _stored_method(method):
+    """Método tal como queda en el hash, con los parámetros por defecto ('pbkdf2' -> 'pbkdf2:sha256:600000')"""
+    return generate_password_hash('', method).split('$', 1)[0]
+
+
+def needs_rehash(password_hash, method):
+    """True si el hash se calculó con otro algoritmo o coste que `method`"""
+    return password_hash.split('$', 1)[0] != _stored_method(method)
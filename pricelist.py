@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+Importación masiva de listas de precios (CSV o XLSX)
+El archivo se lee como flujo y se procesa por lotes: una consulta busca los
+productos del lote por SKU o nombre y un UPDATE con executemany aplica los
+cambios, cada lote en su propia transacción. La memoria usada depende del
+tamaño del lote, no del archivo.
+
+Columnas reconocidas (primera fila): sku/código, nombre, precio, stock.
+Hace falta sku o nombre, y precio o stock.
+
+Uso: python pricelist.py <archivo> [--dry-run] [--diff informe.csv]
+"""
+
+import codecs
+import csv
+import math
+import os
+import sys
+import time
+from sqlalchemy import select, update, bindparam, func, or_
+
+BATCH_SIZE = 1000
+SAMPLE_SIZE = 100
+
+ALIASES = {
+    'sku': ('sku', 'codigo', 'código', 'code', 'ref', 'referencia'),
+    'name': ('name', 'nombre', 'producto', 'product'),
+    'price': ('price', 'precio'),
+    'stock': ('stock', 'existencias', 'cantidad'),
+}
+
+DIFF_HEADER = ['linea', 'sku', 'nombre', 'estado', 'precio_anterior', 'precio_nuevo', 'stock_anterior', 'stock_nuevo']
+
+
+class PriceListError(Exception):
+    """Archivo ilegible o sin las columnas necesarias
+
+    Si salta a mitad de la importación, `report` tiene lo hecho hasta ahí
+    (los lotes anteriores ya están confirmados).
+    """
+    report = None
+
+
+class ImportReport:
+    """Resumen de una importación; solo guarda una muestra de las filas"""
+
+    STATUSES = ('updated', 'unchanged', 'not_found', 'ambiguous', 'invalid')
+
+    def __init__(self, dry_run):
+        self.dry_run = dry_run
+        self.rows = 0
+        self.counts = dict.fromkeys(self.STATUSES, 0)
+        self.samples = []
+        self.elapsed = 0.0
+
+    def add(self, status, line, sku=None, name=None, detail=None):
+        self.counts[status] += 1
+        if status != 'unchanged' and len(self.samples) < SAMPLE_SIZE:
+            self.samples.append({'line': line, 'sku': sku, 'name': name, 'status': status, 'detail': detail})
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+    def as_dict(self):
+        return {
+            'dry_run': self.dry_run,
+            'rows': self.rows,
+            **self.counts,
+            'elapsed': round(self.elapsed, 3),
+            'rows_per_second': round(self.rows_per_second, 1),
+            'samples': self.samples,
+        }
+
+
+def read_rows(path):
+    """Filas del archivo como listas de celdas, sin cargarlo entero"""
+    if os.path.splitext(path)[1].lower() in ('.xlsx', '.xlsm'):
+        try:
+            import openpyxl  # Solo para XLSX; importarlo tarda más que el resto de la aplicación
+        except ImportError:
+            raise PriceListError('Hace falta openpyxl para leer archivos XLSX')
+        from zipfile import BadZipFile
+        try:
+            workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        except (BadZipFile, openpyxl.utils.exceptions.InvalidFileException) as e:
+            raise PriceListError(f'Archivo XLSX ilegible: {e}')
+        try:
+            for row in workbook.active.iter_rows(values_only=True):
+                yield list(row)
+        finally:
+            workbook.close()
+    else:
+        with open(path, newline='', encoding=_encoding(path)) as f:
+            try:
+                dialect = csv.Sniffer().sniff(f.read(64 * 1024), delimiters=',;\t|')
+            except csv.Error:
+                dialect = csv.excel
+            f.seek(0)
+            reader = csv.reader(f, dialect)
+            try:
+                yield from reader
+            except csv.Error as e:
+                raise PriceListError(f'CSV ilegible en la línea {reader.line_num}: {e}')
+
+
+def _encoding(path):
+    """UTF-8 si todo el archivo lo es; si no, latin-1 (los CSV de Excel en Windows)"""
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    with open(path, 'rb') as f:
+        try:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                decoder.decode(chunk)
+            decoder.decode(b'', final=True)
+        except UnicodeDecodeError:
+            return 'latin-1'
+    return 'utf-8-sig'
+
+
+def _columns(header):
+    """Posición de cada campo conocido en la fila de encabezados"""
+    names = [str(cell or '').strip().lower() for cell in header]
+    columns = {}
+    for field, aliases in ALIASES.items():
+        for i, name in enumerate(names):
+            if name in aliases:
+                columns[field] = i
+                break
+    if not ({'sku', 'name'} & columns.keys()) or not ({'price', 'stock'} & columns.keys()):
+        raise PriceListError('El archivo necesita una columna sku o nombre, y otra de precio o stock')
+    return columns
+
+
+def _text(value):
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)  # Códigos numéricos leídos de XLSX
+    return str(value).strip() or None
+
+
+def _number(value):
+    """Número de una celda: admite coma decimal y separadores de miles; nunca nan ni inf"""
+    if value is None or isinstance(value, int):
+        return value
+    if not isinstance(value, float):
+        text = str(value).strip().replace(' ', '').lstrip('$')
+        if not text:
+            return None
+        if ',' in text and '.' in text:
+            # El separador que aparece último es el decimal
+            thousands = ',' if text.rfind('.') > text.rfind(',') else '.'
+            text = text.replace(thousands, '')
+        value = float(text.replace(',', '.'))
+    if not math.isfinite(value):
+        raise ValueError(value)
+    return value
+
+
+def parse(rows):
+    """(línea, sku, nombre, precio, stock, error) por cada fila de datos"""
+    rows = iter(rows)
+    try:
+        columns = _columns(next(rows))
+    except StopIteration:
+        raise PriceListError('El archivo está vacío')
+
+    def cell(row, field):
+        i = columns.get(field)
+        return row[i] if i is not None and i < len(row) else None
+
+    for line, row in enumerate(rows, start=2):
+        if not any(value not in (None, '') for value in row):
+            continue
+        sku, name = _text(cell(row, 'sku')), _text(cell(row, 'name'))
+        try:
+            price, stock = _number(cell(row, 'price')), _number(cell(row, 'stock'))
+            if stock is not None:
+                if stock != int(stock):
+                    raise ValueError(stock)
+                stock = int(stock)
+        except (ValueError, OverflowError):
+            yield line, sku, name, None, None, 'Precio o stock no numérico'
+            continue
+
+        if not sku and not name:
+            error = 'Falta sku y nombre'
+        elif price is None and stock is None:
+            error = 'Falta precio y stock'
+        elif (price is not None and price < 0) or (stock is not None and stock < 0):
+            error = 'Valor negativo'
+        else:
+            error = None
+        yield line, sku, name, (round(price, 2) if price is not None else None), stock, error
+
+
+def _batches(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def import_price_list(engine, product_table, path, dry_run=False, batch_size=BATCH_SIZE, diff=None, on_batch=None):
+    """Aplicar la lista de precios de `path` y devolver un ImportReport
+
+    - dry_run: calcular el informe sin modificar nada
+    - diff: archivo de texto donde escribir una línea CSV por fila no igual
+    - on_batch: llamada con los ids modificados tras confirmar cada lote
+    """
+    report = ImportReport(dry_run)
+    writer = csv.writer(diff) if diff is not None else None
+    if writer:
+        writer.writerow(DIFF_HEADER)
+
+    def record(status, line, sku, name, detail=None, values=('', '', '', '')):
+        report.add(status, line, sku, name, detail)
+        if writer and status != 'unchanged':
+            writer.writerow([line, sku, name, status, *values])
+
+    p = product_table.c
+    statement = (
+        update(product_table)
+        .where(p.id == bindparam('_id'))
+        .values(
+            price=func.coalesce(bindparam('_price'), p.price),
+            stock=func.coalesce(bindparam('_stock'), p.stock),
+        )
+    )
+
+    started = time.perf_counter()
+    try:
+        for batch in _batches(parse(read_rows(path)), batch_size):
+            report.rows += len(batch)
+            skus = {row[1] for row in batch if row[1] and not row[5]}
+            names = {row[2] for row in batch if row[2] and not row[5]}
+
+            with engine.begin() as conn:
+                by_sku, by_name = {}, {}
+                if skus or names:
+                    found = conn.execute(
+                        select(p.id, p.sku, p.name, p.price, p.stock)
+                        .where(or_(p.sku.in_(skus), p.name.in_(names)))
+                    ).all()
+                    for product_id, sku, name, price, stock in found:
+                        current = {'id': product_id, 'price': price, 'stock': stock}
+                        if sku in skus:
+                            by_sku[sku] = current
+                        if name in names:
+                            by_name.setdefault(name, []).append(current)
+
+                changes = {}
+                for line, sku, name, price, stock, error in batch:
+                    if error:
+                        record('invalid', line, sku, name, error)
+                        continue
+
+                    current = by_sku.get(sku) if sku else None
+                    if current is None and name:
+                        matches = by_name.get(name, [])
+                        if len(matches) > 1:
+                            record('ambiguous', line, sku, name, f'{len(matches)} productos con ese nombre')
+                            continue
+                        current = matches[0] if matches else None
+                    if current is None:
+                        record('not_found', line, sku, name)
+                        continue
+
+                    new_price = price if price is not None and price != current['price'] else None
+                    new_stock = stock if stock is not None and stock != current['stock'] else None
+                    if new_price is None and new_stock is None:
+                        record('unchanged', line, sku, name)
+                        continue
+
+                    record('updated', line, sku, name, {
+                        'price': [current['price'], new_price], 'stock': [current['stock'], new_stock]
+                    }, (
+                        current['price'], '' if new_price is None else new_price,
+                        current['stock'], '' if new_stock is None else new_stock,
+                    ))
+
+                    # Una fila repetida en el mismo lote se compara con el valor ya cambiado
+                    if new_price is not None:
+                        current['price'] = new_price
+                    if new_stock is not None:
+                        current['stock'] = new_stock
+                    change = changes.setdefault(current['id'], {'_id': current['id'], '_price': None, '_stock': None})
+                    if new_price is not None:
+                        change['_price'] = new_price
+                    if new_stock is not None:
+                        change['_stock'] = new_stock
+
+                if changes and not dry_run:
+                    conn.execute(statement, list(changes.values()))
+
+            if changes and not dry_run and on_batch is not None:
+                on_batch(list(changes))
+    except PriceListError as e:
+        # Los lotes anteriores ya están confirmados: el informe dice cuáles
+        report.elapsed = time.perf_counter() - started
+        e.report = report
+        raise
+
+    report.elapsed = time.perf_counter() - started
+    return report
+
+
+def main():
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    if not args:
+        print("Uso: python pricelist.py <archivo> [--dry-run] [--diff informe.csv]")
+        return
+    dry_run = '--dry-run' in sys.argv
+    diff_path = sys.argv[sys.argv.index('--diff') + 1] if '--diff' in sys.argv else None
+
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    from app import app, db, Product, invalidate_catalog
+    import facets
+
+    with app.app_context():
+        diff = open(diff_path, 'w', newline='', encoding='utf-8') if diff_path else None
+        try:
+            report = import_price_list(db.engine, Product.__table__, args[0], dry_run=dry_run, diff=diff)
+        except PriceListError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+        finally:
+            if diff:
+                diff.close()
+        if not dry_run:
+            facets.refresh(db.engine, db.metadata)
+            invalidate_catalog()
+
+    summary = report.as_dict()
+    print(f"{'🔎 Simulación' if dry_run else '✅ Importación'}: {summary['rows']} filas "
+          f"en {summary['elapsed']}s ({summary['rows_per_second']} filas/s)")
+    for status in ImportReport.STATUSES:
+        print(f"   {status:<10} {summary[status]}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+Límite de sentencias SQL por petición
+En modo testing, una petición que ejecute más sentencias de las permitidas
+falla con QueryBudgetExceeded, así se detectan las regresiones N+1.
+"""
+
+from functools import wraps
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import event
+
+
+class QueryBudgetExceeded(AssertionError):
+    """La petición ejecutó más sentencias SQL que su presupuesto"""
+
+
+def init_app(app, db):
+    """Contar las sentencias de cada petición y comprobar el límite al final"""
+    app.config.setdefault('SQL_QUERY_BUDGET', 10)
+    app.config.setdefault('SQL_QUERY_BUDGET_ENFORCE', False)
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', _count_statement)
+
+    app.before_request(_reset)
+    app.after_request(_check)
+
+
+def query_budget(limit):
+    """Decorador para fijar un presupuesto distinto en una vista concreta"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            return view(*args, **kwargs)
+        wrapper.sql_query_budget = limit
+        return wrapper
+    return decorator
+
+
+def statement_count():
+    """Sentencias SQL ejecutadas en la petición actual"""
+    return g.get('sql_statements', 0)
+
+
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    if has_app_context():
+        g.sql_statements = g.get('sql_statements', 0) + 1
+
+
+def _reset():
+    g.sql_statements = 0
+
+
+def _check(response):
+    app = current_app
+    if not (app.testing or app.config['SQL_QUERY_BUDGET_ENFORCE']):
+        return response
+
+    view = app.view_functions.get(request.endpoint)
+    limit = getattr(view, 'sql_query_budget', app.config['SQL_QUERY_BUDGET'])
+    count = statement_count()
+    if limit is not None and count > limit:
+        raise QueryBudgetExceeded(
+            f'{request.method} {request.path} ejecutó {count} sentencias SQL (máximo {limit})'
+        )
+    return response
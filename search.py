@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Índice de búsqueda de texto completo para el catálogo de productos
+Usa FTS5 en SQLite y FULLTEXT en MySQL; si el índice no existe se
+vuelve a la búsqueda con LIKE.
+
+Uso: python search.py [rebuild]
+"""
+
+import re
+import sys
+import os
+import unicodedata
+from sqlalchemy import text, false, Integer, Float
+
+FTS_TABLE = 'product_fts'
+MYSQL_INDEX = 'ft_product_name_description'
+MAX_TERMS = 8
+
+# Tabla FTS5 con contenido externo: los datos viven en `product` y los
+# triggers mantienen el índice sincronizado en cada alta, edición o baja.
+SQLITE_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        name, description,
+        content='product', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON product BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON product BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF name, description ON product BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO {FTS_TABLE}(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END""",
+]
+
+# Cache por motor de base de datos: {url: bool}
+_available = {}
+
+
+def normalize_terms(q):
+    """Separar la consulta en términos sin acentos y en minúsculas"""
+    q = unicodedata.normalize('NFKD', q or '')
+    q = ''.join(c for c in q if not unicodedata.combining(c)).lower()
+    return re.findall(r'\w+', q)[:MAX_TERMS]
+
+
+def ensure_index(engine):
+    """Crear el índice de texto completo si no existe"""
+    with engine.begin() as conn:
+        if engine.dialect.name == 'sqlite':
+            existed = _sqlite_has_index(conn)
+            for statement in SQLITE_DDL:
+                conn.execute(text(statement))
+            if not existed:
+                # Indexar los productos que ya estaban en la tabla
+                conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+        elif engine.dialect.name == 'mysql':
+            if not _mysql_has_index(conn):
+                conn.execute(text(
+                    f"ALTER TABLE product ADD FULLTEXT INDEX {MYSQL_INDEX} (name, description)"
+                ))
+    _available[str(engine.url)] = engine.dialect.name in ('sqlite', 'mysql')
+
+
+def rebuild_index(engine):
+    """Reconstruir el índice completo a partir de la tabla de productos"""
+    ensure_index(engine)
+    with engine.begin() as conn:
+        if engine.dialect.name == 'sqlite':
+            conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+            conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')"))
+        elif engine.dialect.name == 'mysql':
+            conn.execute(text("OPTIMIZE TABLE product"))
+
+
+def is_available(engine):
+    """Indica si el motor tiene el índice de texto completo creado"""
+    key = str(engine.url)
+    if key not in _available:
+        with engine.connect() as conn:
+            if engine.dialect.name == 'sqlite':
+                _available[key] = _sqlite_has_index(conn)
+            elif engine.dialect.name == 'mysql':
+                _available[key] = _mysql_has_index(conn)
+            else:
+                _available[key] = False
+    return _available[key]
+
+
+def apply_search(query, model, q):
+    """Filtrar una consulta de productos por texto
+
+    Devuelve (consulta, orden), donde orden es una lista de
+    (columna, descendente) por relevancia, lista para `pagination.paginate`.
+    `query` debe traer ya el resto de filtros aplicados (p. ej. is_active),
+    porque después del join `filter_by` apuntaría a la subconsulta.
+    """
+    terms = normalize_terms(q)
+    if not terms:
+        return query.filter(false()), [(model.id, False)]
+
+    engine = query.session.get_bind()
+    if not is_available(engine):
+        return like_search(query, model, q), [(model.id, False)]
+
+    if engine.dialect.name == 'sqlite':
+        match = ' '.join(f'"{term}"*' for term in terms)
+        # bm25 devuelve valores más bajos para los mejores resultados;
+        # el nombre pesa más que la descripción.
+        hits = text(
+            f"SELECT rowid AS id, bm25({FTS_TABLE}, 10.0, 1.0) AS rank "
+            f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match"
+        ).bindparams(match=match).columns(id=Integer, rank=Float).subquery('fts_hits')
+        return query.join(hits, model.id == hits.c.id), [(hits.c.rank, False), (model.id, False)]
+
+    from sqlalchemy.dialects import mysql
+    match = ' '.join(f'+{term}*' for term in terms)
+    relevance = mysql.match(model.name, model.description, against=match).in_boolean_mode()
+    return query.filter(relevance), [(relevance, True), (model.id, False)]
+
+
+def like_search(query, model, q):
+    """Búsqueda con LIKE sobre nombre y descripción (sin índice)"""
+    return query.filter(model.name.contains(q) | model.description.contains(q))
+
+
+def _sqlite_has_index(conn):
+    return conn.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {'name': FTS_TABLE}
+    ).first() is not None
+
+
+def _mysql_has_index(conn):
+    return conn.execute(
+        text(
+            "SELECT 1 FROM information_schema.statistics "
+            "WHERE table_schema = DATABASE() AND table_name = 'product' AND index_name = :name"
+        ),
+        {'name': MYSQL_INDEX}
+    ).first() is not None
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1].lower() != 'rebuild':
+        print("Uso: python search.py rebuild")
+        return
+
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    from app import app, db
+
+    with app.app_context():
+        rebuild_index(db.engine)
+        print("✅ Índice de búsqueda reconstruido")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Servidor de producción
+Aplica las migraciones una vez y arranca la aplicación con varios procesos
+y varios hilos por proceso (gunicorn). En Windows, donde gunicorn no
+funciona, usa un único proceso con un pool de hilos (waitress).
+
+Configuración por entorno:
+  HOST, PORT            dirección de escucha (0.0.0.0:8000)
+  WEB_CONCURRENCY       procesos (2 x CPUs + 1)
+  THREADS               hilos por proceso (4)
+  TIMEOUT               segundos antes de reiniciar un worker colgado (30)
+  y todas las de config.py (DATABASE_URL, SECRET_KEY, DB_POOL_SIZE, ...)
+
+Uso: python serve.py
+"""
+
+import os
+import sys
+
+try:
+    from gunicorn.app.base import BaseApplication
+except ImportError:  # Windows: se usa waitress
+    BaseApplication = None
+
+
+def settings():
+    return {
+        'host': os.environ.get('HOST', '0.0.0.0'),
+        'port': int(os.environ.get('PORT', 8000)),
+        'workers': int(os.environ.get('WEB_CONCURRENCY', 2 * (os.cpu_count() or 1) + 1)),
+        'threads': int(os.environ.get('THREADS', 4)),
+        'timeout': int(os.environ.get('TIMEOUT', 30)),
+    }
+
+
+def prepare(workers):
+    """Importar la aplicación y migrar la base antes de crear los workers"""
+    if workers > 1:
+        # La caché en memoria es de cada proceso: una invalidación en un
+        # worker no llegaría a los demás
+        os.environ.setdefault('CACHE_TYPE', 'filesystem')
+
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    from app import app, db
+    import migrations
+
+    with app.app_context():
+        migrations.upgrade(db.engine, db.metadata)
+        # Los workers heredan el proceso: que cada uno abra sus propias conexiones
+        db.engine.dispose()
+    return app
+
+
+if BaseApplication is not None:
+    class Server(BaseApplication):
+        """gunicorn con workers gthread: procesos x hilos"""
+
+        def __init__(self, app, options):
+            self.application = app
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return self.application
+
+
+def main():
+    options = settings()
+    if BaseApplication is None:
+        options['workers'] = 1
+    app = prepare(options['workers'])
+
+    if BaseApplication is None:
+        from waitress import serve
+        print(f"🚀 waitress en http://{options['host']}:{options['port']} ({options['threads']} hilos)")
+        serve(app, host=options['host'], port=options['port'], threads=options['threads'])
+        return
+
+    print(f"🚀 gunicorn en http://{options['host']}:{options['port']} "
+          f"({options['workers']} procesos x {options['threads']} hilos)")
+    Server(app, {
+        'bind': f"{options['host']}:{options['port']}",
+        'workers': options['workers'],
+        'threads': options['threads'],
+        'worker_class': 'gthread',
+        'timeout': options['timeout'],
+        'keepalive': 5,
+        'accesslog': '-',
+        'max_requests': 10000,  # Reciclar workers de vez en cuando
+        'max_requests_jitter': 1000,
+    }).run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Estadísticas precalculadas del panel de administración
+Las rutas que escriben (registro, pago, cambio de estado, alta de producto)
+suman a los contadores dentro de su misma transacción, y `refresh` los
+recalcula desde cero para corregir cualquier desvío. El panel solo lee
+filas por clave, sin recorrer pedidos.
+
+Tablas: stat_counter, daily_sales, product_sales (modelos en app.py)
+
+Uso: python stats.py refresh
+"""
+
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import select, insert, update, delete, func
+
+REVENUE_DAYS = 30
+TOP_PRODUCTS = 5
+
+
+def _dialect(conn):
+    """Nombre del dialecto de una Connection o de una Session"""
+    bind = conn if hasattr(conn, 'dialect') else conn.get_bind()
+    return bind.dialect.name
+
+
+def upsert_add(conn, table, rows, keys, deltas, overwrite=()):
+    """Insertar `rows` o, si la clave ya existe, sumarle las columnas `deltas`
+
+    Un solo statement para todas las filas. Las columnas de `overwrite` se
+    sustituyen (p. ej. el nombre del producto).
+    """
+    dialect = _dialect(conn)
+    # Los dialectos se importan al usarlos: el de MySQL cuesta al arrancar
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+        stmt = sqlite_insert(table).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(keys),
+            set_={**{name: table.c[name] + stmt.excluded[name] for name in deltas},
+                  **{name: stmt.excluded[name] for name in overwrite}}
+        )
+    elif dialect == 'mysql':
+        from sqlalchemy.dialects.mysql import insert as mysql_insert
+        stmt = mysql_insert(table).values(rows)
+        stmt = stmt.on_duplicate_key_update(
+            **{name: table.c[name] + stmt.inserted[name] for name in deltas},
+            **{name: stmt.inserted[name] for name in overwrite}
+        )
+    else:
+        for row in rows:
+            result = conn.execute(
+                update(table)
+                .where(*[table.c[name] == row[name] for name in keys])
+                .values(**{name: table.c[name] + row[name] for name in deltas},
+                        **{name: row[name] for name in overwrite})
+            )
+            if not result.rowcount:
+                conn.execute(insert(table).values(**row))
+        return
+    conn.execute(stmt)
+
+
+def incr(conn, metadata, *names, amount=1):
+    """Sumar `amount` a uno o más contadores"""
+    upsert_add(conn, metadata.tables['stat_counter'],
+               [{'name': name, 'value': amount} for name in names], ['name'], ['value'])
+
+
+def record_order(conn, metadata, order, items):
+    """Contabilizar un pedido nuevo; items: [(product_id, nombre, cantidad, precio)]"""
+    incr(conn, metadata, 'orders', f'orders:{order.status}')
+    upsert_add(conn, metadata.tables['daily_sales'],
+               [{'day': order.created_at.date(), 'orders': 1, 'revenue': order.total}],
+               ['day'], ['orders', 'revenue'])
+    sales = [
+        {'product_id': product_id, 'product_name': name, 'units': quantity, 'revenue': quantity * unit_price}
+        for product_id, name, quantity, unit_price in items if product_id is not None
+    ]
+    if sales:
+        upsert_add(conn, metadata.tables['product_sales'], sales,
+                   ['product_id'], ['units', 'revenue'], overwrite=['product_name'])
+
+
+def record_status_change(conn, metadata, old_status, new_status):
+    record_status_changes(conn, metadata, {old_status: 1}, new_status)
+
+
+def record_status_changes(conn, metadata, changes, new_status):
+    """Pedidos que pasaron a `new_status`; changes: {estado anterior: pedidos}"""
+    rows = [
+        {'name': f'orders:{old_status}', 'value': -count}
+        for old_status, count in changes.items() if old_status != new_status and count
+    ]
+    if rows:
+        rows.append({'name': f'orders:{new_status}', 'value': -sum(row['value'] for row in rows)})
+        upsert_add(conn, metadata.tables['stat_counter'], rows, ['name'], ['value'])
+
+
+def refresh(engine, metadata):
+    """Recalcular todas las tablas de estadísticas en una transacción"""
+    counter = metadata.tables['stat_counter']
+    daily = metadata.tables['daily_sales']
+    sales = metadata.tables['product_sales']
+    orders = metadata.tables['order']
+    items = metadata.tables['order_item']
+
+    with engine.begin() as conn:
+        for table in (counter, daily, sales):
+            conn.execute(delete(table))
+
+        counts = [
+            ('products', select(func.count()).select_from(metadata.tables['product'])),
+            ('users', select(func.count()).select_from(metadata.tables['user'])),
+            ('orders', select(func.count()).select_from(orders)),
+        ]
+        rows = [{'name': name, 'value': conn.execute(query).scalar()} for name, query in counts]
+        rows += [
+            {'name': f'orders:{status}', 'value': count}
+            for status, count in conn.execute(select(orders.c.status, func.count()).group_by(orders.c.status))
+        ]
+        rows.append({'name': 'refreshed_at', 'value': int(time.time())})
+        conn.execute(insert(counter), rows)
+
+        day = func.date(orders.c.created_at)
+        conn.execute(insert(daily).from_select(
+            ['day', 'orders', 'revenue'],
+            select(day, func.count(), func.sum(orders.c.total)).group_by(day)
+        ))
+        conn.execute(insert(sales).from_select(
+            ['product_id', 'product_name', 'units', 'revenue'],
+            select(
+                items.c.product_id, func.max(items.c.product_name),
+                func.sum(items.c.quantity), func.sum(items.c.quantity * items.c.unit_price)
+            ).where(items.c.product_id.isnot(None)).group_by(items.c.product_id)
+        ))
+
+
+def read(conn, metadata, today=None):
+    """Todo lo que muestra el panel, leído de las tablas precalculadas"""
+    counter = metadata.tables['stat_counter']
+    daily = metadata.tables['daily_sales']
+    sales = metadata.tables['product_sales']
+    today = today or datetime.utcnow().date()  # Los días de daily_sales salen de created_at, en UTC
+
+    counters = dict(conn.execute(select(counter.c.name, counter.c.value)).all())
+    revenue = conn.execute(
+        select(daily.c.day, daily.c.orders, daily.c.revenue)
+        .where(daily.c.day > today - timedelta(days=REVENUE_DAYS))
+        .order_by(daily.c.day)
+    ).all()
+    top_products = conn.execute(
+        select(sales.c.product_id, sales.c.product_name.label('name'), sales.c.units, sales.c.revenue)
+        .order_by(sales.c.units.desc()).limit(TOP_PRODUCTS)
+    ).all()
+
+    return {
+        'total_products': counters.get('products', 0),
+        'total_orders': counters.get('orders', 0),
+        'total_users': counters.get('users', 0),
+        'pending_orders': counters.get('orders:pending', 0),
+        'orders_by_status': sorted(
+            (name.split(':', 1)[1], value) for name, value in counters.items()
+            if name.startswith('orders:') and value
+        ),
+        'revenue_by_day': revenue,
+        'top_products': top_products,
+        'refreshed_at': counters.get('refreshed_at', 0),
+    }
+
+
+def main():
+    command = sys.argv[1].lower() if len(sys.argv) > 1 else 'help'
+    if command != 'refresh':
+        print("Uso: python stats.py refresh")
+        return
+
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    from app import app, db
+
+    with app.app_context():
+        refresh(db.engine, db.metadata)
+        with db.engine.connect() as conn:
+            data = read(conn, db.metadata)
+    print(f"✅ Estadísticas recalculadas: {data['total_orders']} pedidos, "
+          f"{data['total_users']} usuarios, {data['total_products']} productos")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+Cola de trabajos en segundo plano dentro del proceso
+Las vistas encolan el trabajo y responden enseguida; un pool de hilos lo
+ejecuta con su propio contexto de aplicación. Se pierde si el proceso se
+reinicia: solo para lo que puede rehacerse sin más (regenerar páginas en
+caché). Lo que no debe perderse va a la cola persistente (jobs.py).
+
+Configuración: TASK_WORKERS (hilos), TASKS_EAGER (ejecutar en línea, útil en pruebas)
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+
+
+class TaskQueue:
+    """Extensión de Flask con un ThreadPoolExecutor por aplicación (app.extensions['tasks'])"""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('TASK_WORKERS', 2)
+        app.config.setdefault('TASKS_EAGER', False)
+        app.extensions['tasks'] = ThreadPoolExecutor(
+            max_workers=app.config['TASK_WORKERS'], thread_name_prefix='tasks'
+        )
+
+    def submit(self, func, *args, **kwargs):
+        """Encolar `func(*args, **kwargs)` para la aplicación actual; devuelve un Future"""
+        app = current_app._get_current_object()
+        if app.config['TASKS_EAGER']:
+            return _Done(self._run(app, func, args, kwargs))
+        return app.extensions['tasks'].submit(self._run, app, func, args, kwargs)
+
+    def _run(self, app, func, args, kwargs):
+        with app.app_context():
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                app.logger.exception('Error en el trabajo %s', func.__name__)
+                raise
+
+
+class _Done:
+    """Resultado de un trabajo ejecutado en línea (misma interfaz que Future)"""
+
+    def __init__(self, value):
+        self.value = value
+
+    def result(self, timeout=None):
+        return self.value
+
+    def done(self):
+        return True
@@ -0,0 +1,104 @@
+"""
+Fixtures de las pruebas
+La base se genera una vez por sesión con datagen (escala mínima) y cada
+prueba trabaja sobre una copia, con carritos en memoria y los trabajos
+ejecutándose al final de cada petición (TASKS_EAGER).
+"""
+
+import os
+import shutil
+import sys
+
+import pytest
+from jinja2 import ChoiceLoader, FileSystemLoader, FunctionLoader, PrefixLoader
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+import datagen
+import facets
+import migrations
+import stats
+from app import cart_store, create_app, db
+
+SIZES = {'users': 20, 'products': 60, 'carts': 0, 'orders': 200, 'files': 60}
+# Las plantillas están sueltas en la raíz del repositorio; estas son las de admin/
+# (admin/products.html y admin/orders.html no están en el repositorio)
+ADMIN_TEMPLATES = {'dashboard.html', 'add_product.html', 'edit_product.html', 'files.html', 'users.html'}
+
+
+def _admin_template(name):
+    if name not in ADMIN_TEMPLATES:
+        return None
+    path = os.path.join(ROOT, name)
+    with open(path, encoding='utf-8') as f:
+        return f.read(), path, lambda: True
+
+
+def make_app(path, **overrides):
+    app = create_app({
+        'TESTING': True,
+        'SECRET_KEY': 'pruebas',
+        'DATABASE_URL': f'sqlite:///{path}',
+        'CART_STORE': 'memory',
+        'CACHE_TYPE': 'memory',
+        'PAGE_CACHE_TIMEOUT': 0,  # Cada petición renderiza: el presupuesto cuenta las consultas reales
+        'PAGINATION_MAX_PAGE': 2,  # Cursores a partir de la tercera página
+        'TASKS_EAGER': True,
+        'METRICS_ENABLED': False,
+        'UPLOAD_FOLDER': os.path.join(os.path.dirname(path), 'uploads'),
+        **overrides,
+    })
+    app.template_folder = ROOT
+    app.jinja_loader = ChoiceLoader([
+        FileSystemLoader(ROOT),
+        PrefixLoader({'admin': FunctionLoader(_admin_template)}),
+    ])
+    return app
+
+
+@pytest.fixture(scope='session')
+def seed_db(tmp_path_factory):
+    """Base generada por datagen; las pruebas la copian, nunca la modifican"""
+    path = str(tmp_path_factory.mktemp('seed') / 'tienda.db')
+    app = make_app(path)
+    with app.app_context():
+        migrations.upgrade(db.engine, db.metadata)
+        datagen.generate(db.engine, db.metadata, cart_store, SIZES)
+        stats.refresh(db.engine, db.metadata)
+        facets.refresh(db.engine, db.metadata)
+        db.engine.dispose()  # Cierra el WAL para poder copiar el archivo
+    return path
+
+
+@pytest.fixture
+def app(seed_db, tmp_path):
+    path = str(tmp_path / 'tienda.db')
+    shutil.copy(seed_db, path)
+    app = make_app(path)
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def login(client, user_id):
+    """Iniciar sesión sin pasar por el hash de la contraseña"""
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+    return client
+
+
+@pytest.fixture
+def customer(app):
+    return login(app.test_client(), 2)
+
+
+@pytest.fixture
+def admin(app):
+    return login(app.test_client(), 1)
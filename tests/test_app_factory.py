@@ -0,0 +1,52 @@
+"""Dos aplicaciones del mismo proceso no comparten caché, carritos ni trabajos"""
+
+import shutil
+
+import pytest
+from flask import current_app
+from sqlalchemy import select
+
+import mail
+from app import Order, cache, cart_store, db, jobs, tasks
+from conftest import make_app
+
+
+@pytest.fixture
+def other(seed_db, tmp_path_factory):
+    """Otra aplicación creada después de `app`, con otra configuración"""
+    path = str(tmp_path_factory.mktemp('other') / 'tienda.db')
+    shutil.copy(seed_db, path)
+    other = make_app(path, SECRET_KEY='otra', MAIL_FROM='otra@tienda')
+    yield other
+    with other.app_context():
+        db.engine.dispose()
+
+
+def test_cache_and_carts_are_per_app(app, other):
+    with app.app_context():
+        cache.set('clave', 'a')
+        cart_store.add('user:2', {1: 1})
+    with other.app_context():
+        assert cache.get('clave') is None
+        assert cart_store.items('user:2') == []
+    with app.app_context():
+        assert cache.get('clave') == 'a'
+        assert cart_store.lines('user:2') == {1: 1}
+
+
+def test_tasks_run_in_the_submitting_app(app, other):
+    app.config['TASKS_EAGER'] = False
+    with app.app_context():
+        future = tasks.submit(lambda: current_app.config['SECRET_KEY'])
+    assert future.result(timeout=5) == 'pruebas'
+
+
+def test_jobs_run_in_their_app(app, other, monkeypatch):
+    sent = []
+    monkeypatch.setattr(mail, 'send', lambda app, to, subject, body: sent.append(app.config['MAIL_FROM']))
+    with app.app_context():
+        order_id = db.session.scalar(select(Order.id).limit(1))
+        jobs.enqueue(db.session, 'send_order_confirmation', {'order_id': order_id})
+        db.session.commit()
+        assert jobs.run_pending() == 1
+    assert sent == [app.config['MAIL_FROM']]
@@ -0,0 +1,50 @@
+"""Almacén de carritos: ids de línea, líneas eliminadas y carritos que no existen"""
+
+import time
+
+import pytest
+
+import carts
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request, tmp_path):
+    return carts.BACKENDS[request.param](path=str(tmp_path / 'carts.db'))
+
+
+def test_update_returns_only_removed_lines(store):
+    store.add('user:1', {10: 1, 20: 2})
+    (first, _, _), (second, _, _) = store.items('user:1')
+    assert store.update('user:1', {first: 0, second: 5, 999: 0}) == [first]
+    assert store.items('user:1') == [(second, 20, 5)]
+
+
+def test_missing_cart_is_not_created(store):
+    assert store.update('user:1', {1: 0, 2: 3}) == []
+    assert store.remove('user:1', [1, 2]) == 0
+    assert len(store) == 0
+
+
+def test_unknown_lines_do_not_touch_the_cart(store):
+    store.add('user:1', {10: 1})
+    time.sleep(0.05)
+    assert store.remove('user:1', [999]) == 0
+    assert store.update('user:1', {999: 0}) == []
+    assert store.expire(0.04) == 1  # Sigue con la fecha del add
+
+
+def test_restore_keeps_line_ids(store):
+    store.add('user:1', {10: 1, 20: 2})
+    items = store.take('user:1')
+    assert store.items('user:1') == []
+    store.restore('user:1', items)
+    assert store.items('user:1') == items
+
+
+def test_api_patch_reports_only_removed_lines(customer):
+    line_id = customer.post('/api/v1/cart/items', json={'product_id': 1, 'quantity': 2}).json['items'][0]['id']
+    response = customer.patch('/api/v1/cart/items', json={'items': [
+        {'id': line_id, 'quantity': 0}, {'id': line_id + 100, 'quantity': 0},
+    ]})
+    assert response.status_code == 200
+    assert response.json['removed'] == [line_id] and response.json['units'] == 0
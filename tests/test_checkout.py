@@ -0,0 +1,143 @@
+"""Pago: una clave de idempotencia da un solo pedido y los pagos simultáneos no se pisan"""
+
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+import carts
+from app import Order, Product, cart_store, db
+from conftest import login
+
+USER_ID = 2
+
+
+def fill_cart(app, lines):
+    with app.app_context():
+        cart_store.add(carts.user_cart(USER_ID), lines)
+
+
+def in_stock(app, count):
+    with app.app_context():
+        return [product.id for product in Product.query.filter(Product.is_active.is_(True), Product.stock >= 10)
+                .order_by(Product.id).limit(count)]
+
+
+def stock(app, product_id):
+    with app.app_context():
+        return db.session.get(Product, product_id).stock
+
+
+def orders(app):
+    with app.app_context():
+        return Order.query.filter_by(user_id=USER_ID).count()
+
+
+def checkout(app, key):
+    client = login(app.test_client(), USER_ID)
+    return client.post('/checkout', data={'idempotency_key': key})
+
+
+def test_checkout_creates_order_and_empties_cart(app):
+    product_ids = in_stock(app, 3)
+    before, stock_before = orders(app), stock(app, product_ids[0])
+    fill_cart(app, {product_id: 2 for product_id in product_ids})
+
+    response = checkout(app, uuid.uuid4().hex)
+    assert response.status_code == 302 and response.location.endswith('/orders')
+    assert orders(app) == before + 1
+    assert stock(app, product_ids[0]) == stock_before - 2
+    with app.app_context():
+        assert cart_store.items(carts.user_cart(USER_ID)) == []
+
+
+def test_same_key_gives_one_order(app):
+    product_id = in_stock(app, 1)[0]
+    before, stock_before = orders(app), stock(app, product_id)
+    fill_cart(app, {product_id: 1})
+    key = uuid.uuid4().hex
+
+    assert checkout(app, key).status_code == 302
+    fill_cart(app, {product_id: 1})  # Un reintento no debe pagar el carrito nuevo
+    assert checkout(app, key).location.endswith('/orders')
+    assert orders(app) == before + 1
+    assert stock(app, product_id) == stock_before - 1
+    with app.app_context():
+        assert cart_store.lines(carts.user_cart(USER_ID)) == {product_id: 1}
+
+
+def test_empty_cart(app):
+    before = orders(app)
+    assert checkout(app, uuid.uuid4().hex).location.endswith('/cart')
+    assert orders(app) == before
+
+
+def test_stock_failure_restores_cart(app):
+    product_id = in_stock(app, 1)[0]
+    fill_cart(app, {product_id: stock(app, product_id) + 1})
+    with app.app_context():
+        lines = cart_store.items(carts.user_cart(USER_ID))
+    before = orders(app)
+
+    assert checkout(app, uuid.uuid4().hex).location.endswith('/cart')
+    assert orders(app) == before
+    with app.app_context():
+        assert cart_store.items(carts.user_cart(USER_ID)) == lines
+
+
+def together(count, request):
+    """Lanzar `count` peticiones a la vez y devolver sus códigos"""
+    barrier = threading.Barrier(count)
+
+    def run(_):
+        barrier.wait()
+        return request().status_code
+
+    with ThreadPoolExecutor(count) as pool:
+        return list(pool.map(run, range(count)))
+
+
+def test_concurrent_checkouts_place_one_order(app):
+    product_id = in_stock(app, 1)[0]
+    for _ in range(10):
+        before, stock_before = orders(app), stock(app, product_id)
+        fill_cart(app, {product_id: 1})
+        codes = together(6, lambda: checkout(app, uuid.uuid4().hex))
+        assert codes == [302] * 6
+        assert orders(app) == before + 1
+        assert stock(app, product_id) == stock_before - 1
+
+
+def test_checkout_right_after_another_commits(app):
+    """Un pago que entra justo cuando otro confirma su pedido encuentra el carrito vacío"""
+    product_id = in_stock(app, 1)[0]
+    before = orders(app)
+    fill_cart(app, {product_id: 1})
+    first, codes = threading.get_ident(), []
+
+    def second_checkout(session):
+        if threading.get_ident() == first and not codes:
+            codes.append(None)
+            worker = threading.Thread(target=lambda: codes.append(checkout(app, uuid.uuid4().hex).location))
+            worker.start()
+            worker.join()
+
+    event.listen(Session, 'after_commit', second_checkout)
+    try:
+        assert checkout(app, uuid.uuid4().hex).location.endswith('/orders')
+    finally:
+        event.remove(Session, 'after_commit', second_checkout)
+    assert codes[1].endswith('/cart')
+    assert orders(app) == before + 1
+
+
+def test_concurrent_retries_with_same_key(app):
+    product_id = in_stock(app, 1)[0]
+    before = orders(app)
+    fill_cart(app, {product_id: 1})
+    key = uuid.uuid4().hex
+    codes = together(6, lambda: checkout(app, key))
+    assert codes == [302] * 6
+    assert orders(app) == before + 1
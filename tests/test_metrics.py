@@ -0,0 +1,19 @@
+"""/metrics: con token se pide como Bearer; sin token solo en DEBUG o TESTING"""
+
+
+def test_open_in_testing(client):
+    assert client.get('/metrics').status_code == 200
+
+
+def test_hidden_without_token(app, client):
+    app.testing = False
+    assert client.get('/metrics', environ_base={'REMOTE_ADDR': '127.0.0.1'}).status_code == 404
+
+
+def test_token(app, client):
+    app.testing = False
+    app.config['METRICS_TOKEN'] = 'secreto'
+    assert client.get('/metrics').status_code == 403
+    assert client.get('/metrics', headers={'Authorization': 'Bearer otro'}).status_code == 403
+    response = client.get('/metrics', headers={'Authorization': 'Bearer secreto'})
+    assert response.status_code == 200 and b'cache_hits_total' in response.data
@@ -0,0 +1,79 @@
+"""Cursores de paginación: ida y vuelta, y 400 ante cualquier token inválido"""
+
+import base64
+import json
+from datetime import datetime
+
+import pytest
+
+import pagination
+from app import CATALOG_ORDERS, PRODUCT_ORDER
+
+
+def token(values, direction='n'):
+    payload = json.dumps({'v': values, 'd': direction}).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+
+def test_round_trip(app):
+    with app.app_context():
+        values = [datetime(2024, 5, 1, 3, 4, 5, 123), 7]
+        assert pagination.decode_cursor(pagination.encode_cursor(values, 'p'), PRODUCT_ORDER) == (values, 'p')
+        price_order = CATALOG_ORDERS['price_asc']
+        assert pagination.decode_cursor(pagination.encode_cursor([9.99, 7], 'n'), price_order) == ([9.99, 7], 'n')
+        assert pagination.decode_cursor(token([10, 7]), price_order) == ([10, 7], 'n')
+
+
+@pytest.mark.parametrize('cursor', [
+    'no-es-base64!',
+    base64.urlsafe_b64encode(b'[1, 2]').decode(),
+    token(['2024-01-01T00:00:00', 1], 'x'),
+    token(['2024-01-01T00:00:00']),
+    token('2024-01-01T00:00:00'),
+    token(['ayer', 1]),
+    token([None, 1]),
+    token(['2024-01-01T00:00:00', None]),
+    token(['2024-01-01T00:00:00', '1']),
+    token(['2024-01-01T00:00:00', 1.5]),
+    token(['2024-01-01T00:00:00', True]),
+    token(['2024-01-01T00:00:00', [1]]),
+    token([{'a': 1}, 1]),
+])
+def test_invalid_cursor(app, cursor):
+    with app.app_context():
+        with pytest.raises(ValueError):
+            pagination.decode_cursor(cursor, PRODUCT_ORDER)
+
+
+@pytest.mark.parametrize('values', [['5', 1], [1e309, 1], [True, 1]])
+def test_invalid_price_cursor(app, values):
+    with app.app_context():
+        with pytest.raises(ValueError):
+            pagination.decode_cursor(token(values), CATALOG_ORDERS['price_asc'])
+
+
+def test_nan_cursor(app):
+    cursor = base64.urlsafe_b64encode(b'{"v": [NaN, 1], "d": "n"}').decode()
+    with app.app_context():
+        with pytest.raises(ValueError):
+            pagination.decode_cursor(cursor, CATALOG_ORDERS['price_asc'])
+
+
+@pytest.mark.parametrize('url', ['/products', '/api/v1/products', '/admin/orders'])
+def test_invalid_cursor_is_400(admin, url):
+    assert admin.get(f'{url}?cursor={token([None, [1]])}').status_code == 400
+
+
+def test_walk_all_pages(client):
+    """Páginas por número y después por cursor: cada producto activo sale una vez"""
+    seen, args = [], {}
+    while args is not None:
+        response = client.get('/api/v1/products', query_string=args)
+        assert response.status_code == 200
+        seen += [item['id'] for item in response.json['items']]
+        args = response.json['next']
+    assert len(seen) == len(set(seen)) == response.json['total']
+
+    # Hacia atrás desde la última página por cursor
+    back = client.get('/api/v1/products', query_string=response.json['prev']).json
+    assert back['items'] and back['next']
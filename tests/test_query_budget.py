@@ -0,0 +1,62 @@
+"""Las rutas calientes no superan su presupuesto de sentencias SQL"""
+
+import pytest
+
+import query_budget
+
+PUBLIC = [
+    '/',
+    '/products',
+    '/products?sort=price_asc',
+    '/products?category=Monitores&in_stock=1',
+    '/products?page=2',
+    '/product/1',
+    '/search?q=cable',
+    '/search?q=',
+    '/api/v1/products',
+    '/api/v1/products?sort=price_desc&page=2',
+    '/api/v1/products/1',
+    '/api/v1/categories',
+    '/api/v1/search?q=teclado',
+]
+CUSTOMER = ['/cart', '/orders', '/api/v1/cart', '/api/v1/orders']
+MISSING_TEMPLATE = pytest.mark.skip(reason='la plantilla no está en el repositorio')
+ADMIN = [
+    '/admin',
+    pytest.param('/admin/products', marks=MISSING_TEMPLATE),
+    pytest.param('/admin/orders', marks=MISSING_TEMPLATE),
+    '/admin/users',
+    '/admin/files',
+]
+
+
+def test_budget_is_enforced_in_testing(app):
+    assert app.testing and app.config['SQL_QUERY_BUDGET'] == 10
+
+
+@pytest.mark.parametrize('url', PUBLIC)
+def test_public_routes(client, url):
+    assert client.get(url).status_code == 200
+
+
+@pytest.mark.parametrize('url', CUSTOMER)
+def test_customer_routes_with_full_cart(customer, url):
+    for product_id in range(1, 9):
+        customer.post('/api/v1/cart/items', json={'product_id': product_id, 'quantity': 1})
+    assert customer.get(url).status_code == 200
+
+
+@pytest.mark.parametrize('url', ADMIN)
+def test_admin_routes(admin, url):
+    assert admin.get(url).status_code == 200
+
+
+def test_cursor_page_within_budget(client):
+    cursor = client.get('/api/v1/products?page=2').json['next']['cursor']
+    assert client.get(f'/api/v1/products?cursor={cursor}').status_code == 200
+
+
+def test_over_budget_raises(app, client):
+    app.config['SQL_QUERY_BUDGET'] = 1
+    with pytest.raises(query_budget.QueryBudgetExceeded):
+        client.get('/products')
@@ -0,0 +1,115 @@
+"""
+Almacenamiento de archivos subidos por partes
+Todo se copia en bloques de CHUNK_SIZE, así la memoria usada no depende del
+tamaño del archivo. Las subidas reanudables se escriben en tmp/<id>.part
+hasta que se completan y un trabajo en segundo plano las mueve a su carpeta.
+"""
+
+import hashlib
+import os
+import tempfile
+
+CHUNK_SIZE = 64 * 1024
+
+# Carpeta dentro de UPLOAD_FOLDER según el tipo de archivo
+SUBDIRS = {
+    'price_list': 'prices',
+    'product_image': 'products',
+}
+
+
+class UploadError(Exception):
+    """Parte fuera de orden o archivo mayor de lo anunciado"""
+
+
+def subdir(file_type):
+    return SUBDIRS.get(file_type, 'other')
+
+
+def upload_dir(root, file_type):
+    """Carpeta de destino de un tipo de archivo (se crea si no existe)"""
+    path = os.path.join(root, subdir(file_type))
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def partial_path(root, upload_id):
+    """Archivo temporal de una subida en curso"""
+    path = os.path.join(root, 'tmp')
+    os.makedirs(path, exist_ok=True)
+    return os.path.join(path, f'{upload_id}.part')
+
+
+def received_bytes(path):
+    """Bytes ya recibidos de una subida (offset desde el que reanudar)"""
+    try:
+        return os.path.getsize(path)
+    except FileNotFoundError:
+        return 0
+
+
+def copy_stream(source, target, limit=None, hasher=None):
+    """Copiar `source` en `target` por bloques; devuelve los bytes copiados"""
+    copied = 0
+    while True:
+        block = source.read(CHUNK_SIZE)
+        if not block:
+            return copied
+        copied += len(block)
+        if limit is not None and copied > limit:
+            raise UploadError('El archivo supera el tamaño permitido')
+        if hasher is not None:
+            hasher.update(block)
+        target.write(block)
+
+
+def write_chunk(stream, path, offset, size):
+    """Añadir una parte al archivo temporal a partir de `offset`
+
+    El offset debe coincidir con lo ya recibido; si no, el cliente tiene que
+    consultar el estado y reanudar desde ahí. Devuelve el nuevo offset.
+    """
+    current = received_bytes(path)
+    if offset != current:
+        raise UploadError(f'Se esperaba el offset {current}')
+    with open(path, 'ab') as f:
+        try:
+            copy_stream(stream, f, limit=size - offset)
+        except UploadError:
+            f.truncate(offset)
+            raise
+    return received_bytes(path)
+
+
+def file_sha256(path):
+    """Hash SHA-256 del contenido, leído por bloques"""
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(CHUNK_SIZE), b''):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+def store_file(stream, directory, filename, limit=None):
+    """Guardar un archivo con nombre direccionado por contenido
+
+    El hash se calcula mientras se copia; si ya existe un archivo con el mismo
+    contenido se reutiliza. Devuelve (nombre final, sha256).
+    """
+    hasher = hashlib.sha256()
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            copy_stream(stream, f, limit=limit, hasher=hasher)
+        digest = hasher.hexdigest()
+        name = f'{digest[:16]}_{filename}'
+        target = os.path.join(directory, name)
+        if os.path.exists(target):
+            os.remove(tmp)
+        else:
+            os.replace(tmp, target)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return name, digest